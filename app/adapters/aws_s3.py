@@ -1,15 +1,88 @@
 import logging
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from typing import IO
 from typing import Any
 
+from botocore.exceptions import ClientError
+
 from app import settings
 from app import state
+from app.byte_ranges import ContentRange
+from app.byte_ranges import parse_content_range_header
+
+# How much of a streamed object body to hold in memory at once
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class S3ObjectStream:
+    content_length: int | None
+    # Set when only part of the object was requested
+    content_range: ContentRange | None
+    content_type: str | None
+    chunks: AsyncIterator[bytes]
+
+
+@dataclass
+class S3ObjectMetadata:
+    content_length: int
+    # Changes whenever the object's content does
+    etag: str
+    last_modified: int  # unix time
+
 
+async def get_object_metadata(key: str) -> S3ObjectMetadata | None:
+    try:
+        s3_object = await state.s3_client.head_object(
+            Bucket=settings.AWS_S3_BUCKET_NAME,
+            Key=key,
+        )
+    except ClientError as exc:
+        # HEAD responses have no body, so s3 can't tell us "NoSuchKey"
+        if exc.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+            return None
+        logging.exception(
+            "Unexpected error when fetching object metadata from S3",
+            exc_info=True,
+            extra={"object_key": key},
+        )
+        return None
+    except Exception:
+        logging.exception(
+            "Unexpected error when fetching object metadata from S3",
+            exc_info=True,
+            extra={"object_key": key},
+        )
+        return None
+
+    return S3ObjectMetadata(
+        content_length=s3_object["ContentLength"],
+        etag=s3_object["ETag"].strip('"'),
+        last_modified=int(s3_object["LastModified"].timestamp()),
+    )
+
+
+async def get_object_data(
+    key: str,
+    *,
+    byte_range: tuple[int, int] | None = None,
+) -> bytes | None:
+    """\
+    Fetch an object's data from S3.
 
-async def get_object_data(key: str) -> bytes | None:
+    If a `byte_range` (of inclusive offsets) is given, only that part of
+    the object is fetched; it must be satisfiable for the object's size.
+    """
     try:
+        params: dict[str, Any] = {}
+        if byte_range is not None:
+            params["Range"] = f"bytes={byte_range[0]}-{byte_range[1]}"
+
         s3_object = await state.s3_client.get_object(
             Bucket=settings.AWS_S3_BUCKET_NAME,
             Key=key,
+            **params,
         )
     except state.s3_client.exceptions.NoSuchKey:
         return None
@@ -24,16 +97,67 @@ async def get_object_data(key: str) -> bytes | None:
     return await s3_object["Body"].read()
 
 
+async def stream_object_data(
+    key: str,
+    *,
+    byte_range: tuple[int, int] | None = None,
+) -> S3ObjectStream | None:
+    """\
+    Stream an object's data from S3.
+
+    If a `byte_range` (of inclusive offsets) is given, only that part of
+    the object is streamed; it must be satisfiable for the object's size.
+    """
+    try:
+        params: dict[str, Any] = {}
+        if byte_range is not None:
+            params["Range"] = f"bytes={byte_range[0]}-{byte_range[1]}"
+
+        s3_object = await state.s3_client.get_object(
+            Bucket=settings.AWS_S3_BUCKET_NAME,
+            Key=key,
+            **params,
+        )
+    except state.s3_client.exceptions.NoSuchKey:
+        return None
+    except Exception:
+        logging.exception(
+            "Unexpected error when streaming object data from S3",
+            exc_info=True,
+            extra={"object_key": key},
+        )
+        return None
+
+    body = s3_object["Body"]
+
+    async def iter_chunks() -> AsyncIterator[bytes]:
+        try:
+            async for chunk in body.iter_chunks(STREAM_CHUNK_SIZE):
+                yield chunk
+        finally:
+            body.close()
+
+    return S3ObjectStream(
+        content_length=s3_object.get("ContentLength"),
+        content_range=parse_content_range_header(s3_object.get("ContentRange")),
+        content_type=s3_object.get("ContentType"),
+        chunks=iter_chunks(),
+    )
+
+
 async def save_object_data(
     key: str,
-    data: bytes,
+    data: bytes | IO[bytes],
     *,
     max_age: int | None = None,
+    content_type: str | None = None,
 ) -> None:
     try:
         params: dict[str, Any] = {}
         if max_age is not None:
             params["CacheControl"] = f"max-age={max_age}"
+        if content_type is not None:
+            params["ContentType"] = content_type
 
         await state.s3_client.put_object(
             Bucket=settings.AWS_S3_BUCKET_NAME,
@@ -45,7 +169,10 @@ async def save_object_data(
         logging.exception(
             "Unexpected error when saving object data from S3",
             exc_info=True,
-            extra={"object_key": key, "data_size": len(data)},
+            extra={
+                "object_key": key,
+                "data_size": len(data) if isinstance(data, bytes) else None,
+            },
         )
         return None
 
@@ -5,15 +5,20 @@ from typing import TYPE_CHECKING
 from typing import Any
 from typing import Literal
 
-import httpx
-
 from app import job_scheduling
 from app import settings
+from app.adapters.http_clients import HttpClientConfig
+from app.adapters.http_clients import http_client_manager
 
 if TYPE_CHECKING:
     from app.repositories.akatsuki_beatmaps import AkatsukiBeatmap
 
-discord_webhooks_http_client = httpx.AsyncClient()
+DISCORD_WEBHOOKS_HTTP_CLIENT_NAME = "discord_webhooks"
+
+http_client_manager.register(
+    DISCORD_WEBHOOKS_HTTP_CLIENT_NAME,
+    HttpClientConfig(max_connections=5, max_keepalive_connections=5),
+)
 
 
 EDIT_COL = "4360181"
@@ -166,7 +171,9 @@ class Webhook:
 
     async def post(self) -> None:
         """Post the webhook in JSON format."""
-        response = await discord_webhooks_http_client.post(
+        response = await http_client_manager.get(
+            DISCORD_WEBHOOKS_HTTP_CLIENT_NAME,
+        ).post(
             self.url,
             json=self.json,
         )
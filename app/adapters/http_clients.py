@@ -0,0 +1,159 @@
+"""\
+A single owner for the HTTP clients used to talk to upstream services.
+
+Adapters register how their client should be configured at import time,
+and look the client up by name when making requests. Clients are created
+and pre-warmed during app startup, and closed during shutdown.
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from dataclasses import field
+
+import httpcore
+import httpx
+from pydantic import BaseModel
+
+from app import settings
+
+# Each client talks to a single host, so its limits are effectively per-host
+DEFAULT_MAX_CONNECTIONS = 50
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 20
+
+PREWARM_TIMEOUT_SECONDS = 5.0
+
+
+@dataclass
+class HttpClientConfig:
+    base_url: str = ""
+    headers: dict[str, str] = field(default_factory=dict)
+    timeout: httpx.Timeout = field(default_factory=lambda: httpx.Timeout(15))
+    follow_redirects: bool = False
+    auth: httpx.Auth | None = None
+    max_connections: int = DEFAULT_MAX_CONNECTIONS
+    max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE_CONNECTIONS
+    # If set, a connection is opened to this url during startup
+    prewarm_url: str | None = None
+
+
+class HttpClientStats(BaseModel):
+    name: str
+    http2: bool
+    max_connections: int
+    # Unknown if the client's connection pool can't be inspected
+    open_connections: int | None
+    idle_connections: int | None
+    active_connections: int | None
+
+
+class HttpClientManager:
+    def __init__(self, *, keepalive_expiry_seconds: float, http2: bool) -> None:
+        self.keepalive_expiry_seconds = keepalive_expiry_seconds
+        self.http2 = http2
+
+        self._configs: dict[str, HttpClientConfig] = {}
+        self._clients: dict[str, httpx.AsyncClient] = {}
+
+    def register(self, name: str, config: HttpClientConfig) -> None:
+        self._configs[name] = config
+
+    def _create_client(self, config: HttpClientConfig) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=config.base_url,
+            headers=config.headers,
+            timeout=config.timeout,
+            follow_redirects=config.follow_redirects,
+            auth=config.auth,
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=config.max_connections,
+                max_keepalive_connections=config.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry_seconds,
+            ),
+        )
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        """\
+        Get the client registered under a name.
+
+        Clients are normally created at startup, but will be created on
+        first use if needed (e.g. when used outside of the app lifespan).
+        """
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._create_client(self._configs[name])
+            self._clients[name] = client
+        return client
+
+    async def _prewarm(self, name: str, url: str) -> None:
+        try:
+            # Any response at all means the connection is established;
+            # skip auth so that we don't go fetching access tokens here
+            await self.get(name).head(
+                url,
+                auth=httpx.Auth(),
+                timeout=PREWARM_TIMEOUT_SECONDS,
+            )
+        except Exception:
+            logging.warning(
+                "Failed to pre-warm http client connection",
+                extra={"client_name": name, "url": url},
+            )
+
+    async def start(self) -> None:
+        """Create all registered clients and pre-warm their connections."""
+        for name in self._configs:
+            self.get(name)
+
+        await asyncio.gather(
+            *[
+                self._prewarm(name, config.prewarm_url)
+                for name, config in self._configs.items()
+                if config.prewarm_url is not None
+            ],
+        )
+        logging.info(
+            "Started http clients",
+            extra={"client_count": len(self._clients), "http2": self.http2},
+        )
+
+    async def aclose(self) -> None:
+        clients = list(self._clients.values())
+        self._clients.clear()
+        await asyncio.gather(*[client.aclose() for client in clients])
+
+    def get_stats(self) -> list[HttpClientStats]:
+        stats: list[HttpClientStats] = []
+        for name, client in self._clients.items():
+            open_connections: int | None = None
+            idle_connections: int | None = None
+            active_connections: int | None = None
+
+            # httpx doesn't expose its connection pool publicly; only
+            # report on it if it's the httpcore pool we expect it to be
+            transport = getattr(client, "_transport", None)
+            pool = getattr(transport, "_pool", None)
+            if isinstance(pool, httpcore.AsyncConnectionPool):
+                connections = pool.connections
+                open_connections = len(connections)
+                idle_connections = sum(1 for c in connections if c.is_idle())
+                active_connections = open_connections - idle_connections
+
+            stats.append(
+                HttpClientStats(
+                    name=name,
+                    http2=self.http2,
+                    max_connections=self._configs[name].max_connections,
+                    open_connections=open_connections,
+                    idle_connections=idle_connections,
+                    active_connections=active_connections,
+                ),
+            )
+        return stats
+
+
+http_client_manager = HttpClientManager(
+    keepalive_expiry_seconds=settings.HTTP_CLIENT_KEEPALIVE_EXPIRY_SECONDS,
+    http2=settings.HTTP_CLIENT_HTTP2_ENABLED,
+)
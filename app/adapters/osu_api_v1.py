@@ -6,12 +6,21 @@ from typing import Any
 import httpx
 from pydantic import BaseModel
 
+from app import request_coalescing
 from app import settings
+from app.adapters.http_clients import HttpClientConfig
+from app.adapters.http_clients import http_client_manager
 from app.common_models import GameMode
 
-osu_api_v1_http_client = httpx.AsyncClient(
-    base_url="https://old.ppy.sh/",
-    timeout=httpx.Timeout(15),
+OSU_API_V1_HTTP_CLIENT_NAME = "osu_api_v1"
+
+http_client_manager.register(
+    OSU_API_V1_HTTP_CLIENT_NAME,
+    HttpClientConfig(
+        base_url="https://old.ppy.sh/",
+        timeout=httpx.Timeout(15),
+        prewarm_url="https://old.ppy.sh/",
+    ),
 )
 
 
@@ -64,10 +73,27 @@ async def fetch_one_beatmap(
 ) -> Beatmap | None:
     assert [beatmap_id, beatmap_md5].count(None) == 1
 
+    if beatmap_id is not None:
+        key: request_coalescing.CoalescingKey = ("osu_api_v1", "beatmap", beatmap_id)
+    else:
+        assert beatmap_md5 is not None
+        key = ("osu_api_v1", "beatmap_by_md5", beatmap_md5)
+
+    return await request_coalescing.coalesce(
+        key,
+        lambda: _fetch_one_beatmap(beatmap_id=beatmap_id, beatmap_md5=beatmap_md5),
+    )
+
+
+async def _fetch_one_beatmap(
+    *,
+    beatmap_id: int | None,
+    beatmap_md5: str | None,
+) -> Beatmap | None:
     osu_api_response_data: list[dict[str, Any]] | None = None
     try:
         osu_api_v1_key = random.choice(settings.OSU_API_V1_API_KEYS_POOL)
-        response = await osu_api_v1_http_client.get(
+        response = await http_client_manager.get(OSU_API_V1_HTTP_CLIENT_NAME).get(
             "api/get_beatmaps",
             params={
                 "k": osu_api_v1_key,
@@ -103,9 +129,60 @@ async def fetch_one_beatmap(
         raise
 
 
+async def fetch_many_beatmaps_by_beatmapset_id(beatmapset_id: int) -> list[Beatmap]:
+    return await request_coalescing.coalesce(
+        ("osu_api_v1", "beatmapset", beatmapset_id),
+        lambda: _fetch_many_beatmaps_by_beatmapset_id(beatmapset_id),
+    )
+
+
+async def _fetch_many_beatmaps_by_beatmapset_id(beatmapset_id: int) -> list[Beatmap]:
+    osu_api_response_data: list[dict[str, Any]] | None = None
+    try:
+        osu_api_v1_key = random.choice(settings.OSU_API_V1_API_KEYS_POOL)
+        response = await http_client_manager.get(OSU_API_V1_HTTP_CLIENT_NAME).get(
+            "api/get_beatmaps",
+            params={"k": osu_api_v1_key, "s": beatmapset_id},
+        )
+        logging.debug(
+            "Made request to the v1 osu! api",
+            extra={
+                "endpoint": "get_beatmaps",
+                "api_key_last4": osu_api_v1_key[-4:],
+                "authorized": True,
+            },
+        )
+        if response.status_code in (404, 451):
+            return []
+        if response.status_code == 403:
+            raise ValueError("osu api is down") from None
+        response.raise_for_status()
+        osu_api_response_data = response.json()
+        assert osu_api_response_data is not None
+        return [Beatmap(**beatmap_data) for beatmap_data in osu_api_response_data]
+    except Exception:
+        logging.exception(
+            "Failed to fetch beatmapset from osu! API v1",
+            extra={
+                "beatmapset_id": beatmapset_id,
+                "osu_api_response_data": osu_api_response_data,
+            },
+        )
+        raise
+
+
 async def fetch_beatmap_osu_file_data(beatmap_id: int) -> bytes | None:
+    return await request_coalescing.coalesce(
+        ("osu_api_v1", "osu_file", beatmap_id),
+        lambda: _fetch_beatmap_osu_file_data(beatmap_id),
+    )
+
+
+async def _fetch_beatmap_osu_file_data(beatmap_id: int) -> bytes | None:
     try:
-        response = await osu_api_v1_http_client.get(f"osu/{beatmap_id}")
+        response = await http_client_manager.get(OSU_API_V1_HTTP_CLIENT_NAME).get(
+            f"osu/{beatmap_id}"
+        )
         logging.debug(
             "Made request to the v1 osu! api",
             extra={
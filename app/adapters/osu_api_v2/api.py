@@ -4,7 +4,10 @@ from typing import Any
 import httpx
 
 from app import oauth
+from app import request_coalescing
 from app import settings
+from app.adapters.http_clients import HttpClientConfig
+from app.adapters.http_clients import http_client_manager
 from app.adapters.osu_api_v2.models import BeatmapExtended
 from app.adapters.osu_api_v2.models import BeatmapsetExtended
 from app.adapters.osu_api_v2.models import BeatmapsetSearchResponse
@@ -19,25 +22,40 @@ from app.common_models import GameMode
 OSU_API_V2_TOKEN_ENDPOINT = "https://osu.ppy.sh/oauth/token"
 
 
-osu_api_v2_http_client = httpx.AsyncClient(
-    base_url="https://osu.ppy.sh/api/v2/",
-    auth=oauth.AsyncOAuth(
-        client_credential_sets=[
-            oauth.OAuthClientCredentials(
-                client_id=settings.OSU_API_V2_CLIENT_ID,
-                client_secret=settings.OSU_API_V2_CLIENT_SECRET,
-            ),
-        ],
-        token_endpoint=OSU_API_V2_TOKEN_ENDPOINT,
+OSU_API_V2_HTTP_CLIENT_NAME = "osu_api_v2"
+
+http_client_manager.register(
+    OSU_API_V2_HTTP_CLIENT_NAME,
+    HttpClientConfig(
+        base_url="https://osu.ppy.sh/api/v2/",
+        auth=oauth.AsyncOAuth(
+            client_credential_sets=[
+                oauth.OAuthClientCredentials(
+                    client_id=settings.OSU_API_V2_CLIENT_ID,
+                    client_secret=settings.OSU_API_V2_CLIENT_SECRET,
+                ),
+            ],
+            token_endpoint=OSU_API_V2_TOKEN_ENDPOINT,
+        ),
+        timeout=httpx.Timeout(15),
+        prewarm_url="https://osu.ppy.sh/",
     ),
-    timeout=httpx.Timeout(15),
 )
 
 
 async def get_beatmap(beatmap_id: int) -> BeatmapExtended | None:
+    return await request_coalescing.coalesce(
+        ("osu_api_v2", "beatmap", beatmap_id),
+        lambda: _get_beatmap(beatmap_id),
+    )
+
+
+async def _get_beatmap(beatmap_id: int) -> BeatmapExtended | None:
     osu_api_response_data: dict[str, Any] | None = None
     try:
-        response = await osu_api_v2_http_client.get(f"beatmaps/{beatmap_id}")
+        response = await http_client_manager.get(OSU_API_V2_HTTP_CLIENT_NAME).get(
+            f"beatmaps/{beatmap_id}"
+        )
         if response.status_code in (404, 451):
             return None
         response.raise_for_status()
@@ -56,9 +74,18 @@ async def get_beatmap(beatmap_id: int) -> BeatmapExtended | None:
 
 
 async def get_beatmapset(beatmapset_id: int) -> BeatmapsetExtended | None:
+    return await request_coalescing.coalesce(
+        ("osu_api_v2", "beatmapset", beatmapset_id),
+        lambda: _get_beatmapset(beatmapset_id),
+    )
+
+
+async def _get_beatmapset(beatmapset_id: int) -> BeatmapsetExtended | None:
     osu_api_response_data: dict[str, Any] | None = None
     try:
-        response = await osu_api_v2_http_client.get(f"beatmapsets/{beatmapset_id}")
+        response = await http_client_manager.get(OSU_API_V2_HTTP_CLIENT_NAME).get(
+            f"beatmapsets/{beatmapset_id}"
+        )
         if response.status_code in (404, 451):
             return None
         response.raise_for_status()
@@ -95,7 +122,7 @@ async def search_beatmapsets(
 
     osu_api_response_data: dict[str, Any] | None = None
     try:
-        response = await osu_api_v2_http_client.get(
+        response = await http_client_manager.get(OSU_API_V2_HTTP_CLIENT_NAME).get(
             "beatmapsets/search",
             params={
                 "e": ".".join(extras) if extras else "",
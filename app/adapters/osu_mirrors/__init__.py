@@ -1,30 +1,100 @@
 import asyncio
+import functools
 import logging
+import random
 import time
 from collections.abc import Awaitable
 from collections.abc import Callable
+from dataclasses import dataclass
 from datetime import datetime
+from enum import StrEnum
+from typing import Any
 from typing import TypeVar
 
+from pydantic import BaseModel
+
+from app import job_scheduling
+from app import request_coalescing
 from app.adapters.osu_mirrors.backends import AbstractBeatmapMirror
 from app.adapters.osu_mirrors.backends import BeatmapMirrorResponse
+from app.adapters.osu_mirrors.backends import BeatmapMirrorStream
 from app.adapters.osu_mirrors.backends.mino import MinoCentralMirror
 from app.adapters.osu_mirrors.backends.mino import MinoSingaporeMirror
 from app.adapters.osu_mirrors.backends.mino import MinoUSMirror
 from app.adapters.osu_mirrors.backends.nerinyan import NerinyanMirror
 from app.adapters.osu_mirrors.backends.osu_direct import OsuDirectMirror
+from app.adapters.osu_mirrors.request_log import mirror_request_log
+from app.adapters.osu_mirrors.scoreboard import calculate_mirror_weight
+from app.adapters.osu_mirrors.scoreboard import mirror_scoreboard
+from app.byte_ranges import ByteRange
 from app.common_models import CheesegullBeatmap
 from app.common_models import CheesegullBeatmapset
-from app.repositories import beatmap_mirror_requests
+from app.repositories.beatmap_mirror_requests import BeatmapMirrorRequest
 from app.repositories.beatmap_mirror_requests import MirrorResource
 
 T = TypeVar("T")
 
 ZIP_FILE_HEADER = b"PK\x03\x04"
+# mp3 files with an id3 tag, and ogg files
+AUDIO_FILE_HEADERS = (b"ID3", b"OggS")
 
 # How many mirrors to race simultaneously
 HEDGE_COUNT = 2
 
+
+class HedgePolicy(StrEnum):
+    # Race all hedged mirrors from the start
+    IMMEDIATE = "immediate"
+    # Only race another mirror once the one(s) in flight are slower than usual
+    DELAYED = "delayed"
+
+
+HEDGE_POLICIES: dict[MirrorResource, HedgePolicy] = {
+    MirrorResource.OSZ_FILE: HedgePolicy.DELAYED,
+    MirrorResource.BACKGROUND_IMAGE: HedgePolicy.DELAYED,
+    MirrorResource.AUDIO: HedgePolicy.DELAYED,
+    MirrorResource.AUDIO_PREVIEW: HedgePolicy.DELAYED,
+}
+
+# With the delayed policy, a mirror is considered "slower than usual"
+# once it exceeds this percentile of its own latency for the resource
+HEDGE_DELAY_LATENCY_PERCENTILE = 0.9
+HEDGE_DELAY_MIN_SAMPLE_COUNT = 20
+
+# Used until enough samples have been observed for the mirror & resource
+DEFAULT_HEDGE_DELAY_SECONDS = 1.0
+MIN_HEDGE_DELAY_SECONDS = 0.05
+MAX_HEDGE_DELAY_SECONDS = 5.0
+
+
+@dataclass
+class ThroughputRankingConfig:
+    # The throughput percentile a mirror is ranked on; a low one
+    # favours mirrors which are consistently fast over bursty ones
+    throughput_percentile: float
+    # The size of a typical body, for estimating its transfer time
+    typical_size_bytes: int
+    min_sample_count: int = 5
+
+
+# For resources whose bodies are large enough that transfer time matters,
+# mirrors are ranked on latency plus a typical body's transfer time
+THROUGHPUT_RANKING_CONFIGS: dict[MirrorResource, ThroughputRankingConfig] = {
+    MirrorResource.OSZ_FILE: ThroughputRankingConfig(
+        throughput_percentile=0.25,
+        typical_size_bytes=10 * 1024 * 1024,
+    ),
+    MirrorResource.AUDIO: ThroughputRankingConfig(
+        throughput_percentile=0.25,
+        typical_size_bytes=4 * 1024 * 1024,
+    ),
+}
+
+
+# How long a request may queue for a mirror's rate limit, rather
+# than skipping over the mirror to another (likely slower) mirror
+RATE_LIMIT_MAX_WAIT_SECONDS = 0.5
+
 # Max length for varchar(255) columns in database
 MAX_VARCHAR_LENGTH = 255
 
@@ -55,15 +125,95 @@ def is_valid_zip_file(content: bytes | None) -> bool:
     return content.startswith(ZIP_FILE_HEADER)
 
 
+def is_valid_audio_file(content: bytes | None) -> bool:
+    if content is None:
+        return False
+    return content.startswith(AUDIO_FILE_HEADERS) or (
+        # mp3 files without an id3 tag begin straight away with a frame sync
+        len(content) >= 2
+        and content[0] == 0xFF
+        and content[1] & 0xE0 == 0xE0
+    )
+
+
+def is_valid_audio_stream(stream: BeatmapMirrorStream | None) -> bool:
+    if stream is None:
+        return False
+    return is_valid_audio_file(stream.first_chunk)
+
+
+def is_valid_zip_stream(stream: BeatmapMirrorStream | None) -> bool:
+    if stream is None:
+        return False
+    if stream.content_range is not None and stream.content_range.start != 0:
+        # Only the start of the archive has a recognisable signature
+        return len(stream.first_chunk) > 0
+    return is_valid_zip_file(stream.first_chunk)
+
+
+async def close_stream(stream: BeatmapMirrorStream | None) -> None:
+    if stream is not None:
+        await stream.aclose()
+
+
 def get_data_size(data: object) -> int:
     """Get the size of response data, returning 0 if not applicable."""
     if data is None:
         return 0
     if isinstance(data, (bytes, str)):
         return len(data)
+    if isinstance(data, BeatmapMirrorStream):
+        if data.content_length is not None:
+            return data.content_length
+        return len(data.first_chunk)
     return 0
 
 
+async def _discard_abandoned_responses(
+    tasks: set[asyncio.Task[Any]],
+    discard_func: Callable[[T], Awaitable[None]],
+) -> None:
+    """Release the data of any hedged requests which completed after a winner."""
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    for result in results:
+        if result is None or isinstance(result, BaseException):
+            continue
+        _, response, _ = result
+        if response.data is not None:
+            await discard_func(response.data)
+
+
+def get_mirror_weight(
+    mirror: AbstractBeatmapMirror,
+    resource: MirrorResource,
+) -> int:
+    """\
+    Get a mirror's weight in mirror selection for a resource.
+
+    This is the scoreboard's weight, from its latency & failure rate, with
+    a typical body's transfer time at the mirror's configured throughput
+    percentile added to the latency where the resource has a config. Until
+    a mirror's throughput has been measured, it's weighted on latency alone.
+    """
+    score = mirror_scoreboard.get_score(mirror.name, resource)
+    ranking_config = THROUGHPUT_RANKING_CONFIGS.get(resource)
+    if ranking_config is None:
+        return score.weight()
+
+    throughput = mirror.health.throughput_percentile(
+        resource,
+        ranking_config.throughput_percentile,
+        min_sample_count=ranking_config.min_sample_count,
+    )
+    latency_ms = score.latency_ms()
+    failure_rate = score.failure_rate()
+    if throughput is None or latency_ms is None or failure_rate is None:
+        return score.weight()
+
+    transfer_time_ms = ranking_config.typical_size_bytes / throughput * 1000
+    return calculate_mirror_weight(latency_ms + transfer_time_ms, failure_rate)
+
+
 def get_available_mirrors(
     resource: MirrorResource,
 ) -> list[AbstractBeatmapMirror]:
@@ -73,32 +223,80 @@ def get_available_mirrors(
     Filters by:
     - Resource support
     - Circuit breaker state (not open)
-    - Rate limiter (has capacity)
+    - Rate limiter (has capacity, or will within `RATE_LIMIT_MAX_WAIT_SECONDS`)
+
+    No rate limit is consumed here; it is reserved as requests are sent.
 
-    Returns mirrors sorted by latency EMA (fastest first).
+    Returns mirrors in a weighted random order, where each mirror's weight
+    is based on its recent latency, throughput and failure rate for the
+    resource (see `get_mirror_weight`). The best mirrors are usually first,
+    while others still see some traffic.
     """
     available = [
         mirror
         for mirror in BEATMAP_MIRRORS
-        if resource in mirror.supported_resources and mirror.health.is_available()
+        if resource in mirror.supported_resources
+        and mirror.health.is_available(
+            max_rate_limit_wait=RATE_LIMIT_MAX_WAIT_SECONDS,
+        )
     ]
-    # Sort by latency (fastest first)
-    available.sort(key=lambda m: m.health.latency_ema)
+    # Weighted random sampling without replacement (Efraimidis-Spirakis)
+    available.sort(
+        key=lambda m: random.random() ** (1 / get_mirror_weight(m, resource)),
+        reverse=True,
+    )
     return available
 
 
+def _record_mirror_request(request: BeatmapMirrorRequest) -> None:
+    mirror_scoreboard.record(request)
+    mirror_request_log.record(request)
+
+
+def _record_throughput(
+    mirror: AbstractBeatmapMirror,
+    resource: MirrorResource,
+    data: object,
+    elapsed: float,
+) -> None:
+    if isinstance(data, BeatmapMirrorStream):
+        # The body has not been read yet; record once it has been
+        data.on_complete = functools.partial(
+            mirror.health.record_throughput,
+            resource,
+        )
+    else:
+        mirror.health.record_throughput(resource, get_data_size(data), elapsed)
+
+
+def get_hedge_delay(mirror: AbstractBeatmapMirror, resource: MirrorResource) -> float:
+    """Get how long to wait on a mirror before racing another mirror against it."""
+    latency = mirror.health.latency_percentile(
+        resource,
+        HEDGE_DELAY_LATENCY_PERCENTILE,
+        min_sample_count=HEDGE_DELAY_MIN_SAMPLE_COUNT,
+    )
+    if latency is None:
+        return DEFAULT_HEDGE_DELAY_SECONDS
+    return min(max(latency, MIN_HEDGE_DELAY_SECONDS), MAX_HEDGE_DELAY_SECONDS)
+
+
 async def hedged_fetch(
     mirrors: list[AbstractBeatmapMirror],
     fetch_func: Callable[[AbstractBeatmapMirror], Awaitable[BeatmapMirrorResponse[T]]],
     resource: MirrorResource,
     resource_id: int,
     validate_func: Callable[[T], bool] | None = None,
+    discard_func: Callable[[T], Awaitable[None]] | None = None,
 ) -> tuple[AbstractBeatmapMirror, BeatmapMirrorResponse[T]] | None:
     """
     Race multiple mirrors and return the first successful response.
 
-    Sends requests to multiple mirrors simultaneously and returns as soon as
-    one succeeds. Updates circuit breaker state based on results.
+    Sends requests to multiple mirrors and returns as soon as one succeeds.
+    Depending on the resource's `HedgePolicy`, either all mirrors are sent
+    requests at once, or each further mirror is only sent a request once
+    the previous has been slower than usual (or has failed).
+    Updates circuit breaker state based on results.
 
     Args:
         mirrors: List of mirrors to try (should be pre-filtered for availability)
@@ -106,6 +304,8 @@ async def hedged_fetch(
         resource: The type of resource being fetched (for logging)
         resource_id: The ID of the resource being fetched (for logging)
         validate_func: Optional validation function for the response data
+        discard_func: Optional function to release response data which will
+            not be returned, e.g. open streams from mirrors that lost the race
 
     Returns:
         Tuple of (mirror, response) on success, None if all mirrors failed
@@ -119,43 +319,86 @@ async def hedged_fetch(
 
     async def fetch_with_tracking(
         mirror: AbstractBeatmapMirror,
-    ) -> tuple[AbstractBeatmapMirror, BeatmapMirrorResponse[T], float]:
+    ) -> tuple[AbstractBeatmapMirror, BeatmapMirrorResponse[T], float] | None:
+        if not await mirror.health.acquire_request_slot(
+            timeout=RATE_LIMIT_MAX_WAIT_SECONDS,
+        ):
+            # Other requests got to the mirror's rate limit first
+            return None
+
         started_at = time.time()
         response = await fetch_func(mirror)
         elapsed = time.time() - started_at
         return mirror, response, elapsed
 
-    # Create tasks for all mirrors
-    tasks = [
-        asyncio.create_task(fetch_with_tracking(mirror))
-        for mirror in mirrors[:HEDGE_COUNT]
-    ]
+    hedged_mirrors = mirrors[:HEDGE_COUNT]
+    hedge_policy = HEDGE_POLICIES.get(resource, HedgePolicy.IMMEDIATE)
 
     result: tuple[AbstractBeatmapMirror, BeatmapMirrorResponse[T]] | None = None
-    pending = set(tasks)
+    pending: set[
+        asyncio.Task[
+            tuple[AbstractBeatmapMirror, BeatmapMirrorResponse[T], float] | None
+        ]
+    ] = set()
+
+    def launch_next_mirror() -> None:
+        mirror = hedged_mirrors[len(launched_mirrors)]
+        launched_mirrors.append(mirror)
+        pending.add(asyncio.create_task(fetch_with_tracking(mirror)))
+
+    launched_mirrors: list[AbstractBeatmapMirror] = []
+    if hedge_policy is HedgePolicy.IMMEDIATE:
+        for _ in hedged_mirrors:
+            launch_next_mirror()
+    else:
+        launch_next_mirror()
 
     try:
         while pending:
+            hedge_delay: float | None = None
+            if len(launched_mirrors) < len(hedged_mirrors):
+                hedge_delay = get_hedge_delay(launched_mirrors[-1], resource)
+
             done, pending = await asyncio.wait(
                 pending,
+                timeout=hedge_delay,
                 return_when=asyncio.FIRST_COMPLETED,
             )
+            if not done:
+                # The mirror is slower than usual; race another against it
+                launch_next_mirror()
+                continue
 
             for task in done:
-                mirror, response, elapsed = task.result()
+                tracked_response = task.result()
+                if tracked_response is None:
+                    continue
+
+                if result is not None:
+                    # Another mirror in this batch already won the race
+                    _, response, _ = tracked_response
+                    if discard_func is not None and response.data is not None:
+                        await discard_func(response.data)
+                    continue
+
+                mirror, response, elapsed = tracked_response
 
                 # Log the request for metrics
-                await beatmap_mirror_requests.create(
-                    request_url=truncate_string(response.request_url) or "unavailable",
-                    api_key_id=None,
-                    mirror_name=mirror.name,
-                    success=response.is_success,
-                    started_at=datetime.fromtimestamp(time.time() - elapsed),
-                    ended_at=datetime.now(),
-                    response_status_code=response.status_code,
-                    response_size=get_data_size(response.data),
-                    response_error=truncate_string(response.error_message),
-                    resource=resource,
+                _record_mirror_request(
+                    BeatmapMirrorRequest(
+                        request_url=(
+                            truncate_string(response.request_url) or "unavailable"
+                        ),
+                        api_key_id=None,
+                        mirror_name=mirror.name,
+                        success=response.is_success,
+                        started_at=datetime.fromtimestamp(time.time() - elapsed),
+                        ended_at=datetime.now(),
+                        response_status_code=response.status_code,
+                        response_size=get_data_size(response.data),
+                        response_error=truncate_string(response.error_message),
+                        resource=resource,
+                    ),
                 )
 
                 # Validate response if needed
@@ -165,17 +408,16 @@ async def hedged_fetch(
                         is_valid = False
                         response.is_success = False
                         response.error_message = "Validation failed"
+                        if discard_func is not None:
+                            await discard_func(response.data)
 
                 # Update circuit breaker state
                 if is_valid:
-                    mirror.health.record_success(elapsed)
+                    mirror.health.record_success(elapsed, resource)
                     if response.data is not None:
-                        # Found valid data - cancel remaining tasks and return
+                        _record_throughput(mirror, resource, response.data, elapsed)
+                        # Found valid data - remaining tasks are cancelled below
                         result = (mirror, response)
-                        for t in pending:
-                            t.cancel()
-                        pending = set()
-                        break
                 else:
                     mirror.health.record_failure()
                     logging.warning(
@@ -189,11 +431,24 @@ async def hedged_fetch(
                             "circuit_state": mirror.health.circuit.state,
                         },
                     )
+            if result is not None:
+                break
+
+            # No usable data yet; don't wait out the delay to try another mirror
+            if len(launched_mirrors) < len(hedged_mirrors):
+                launch_next_mirror()
     finally:
         # Ensure all remaining tasks are cancelled
         for task in pending:
             task.cancel()
 
+        # A cancelled task may have already completed; make sure that
+        # anything it holds open (e.g. a connection) is released
+        if pending and discard_func is not None:
+            job_scheduling.schedule_job(
+                _discard_abandoned_responses(pending, discard_func),
+            )
+
     return result
 
 
@@ -202,6 +457,8 @@ async def fetch_with_fallback(
     resource_id: int,
     fetch_func: Callable[[AbstractBeatmapMirror], Awaitable[BeatmapMirrorResponse[T]]],
     validate_func: Callable[[T], bool] | None = None,
+    discard_func: Callable[[T], Awaitable[None]] | None = None,
+    coalescing_name: str | None = None,
 ) -> T | None:
     """
     Fetch a resource using hedged requests with fallback.
@@ -209,8 +466,40 @@ async def fetch_with_fallback(
     First tries racing the top mirrors. If all fail, tries remaining mirrors
     one at a time as a fallback.
 
+    If a `coalescing_name` is given, concurrent calls with the same name and
+    resource id will share a single set of mirror requests and its result.
+    This must not be used for data which can only be consumed once (streams).
+
     Returns the data on success, None if all mirrors failed.
     """
+    if coalescing_name is None:
+        return await _fetch_with_fallback(
+            resource,
+            resource_id,
+            fetch_func,
+            validate_func,
+            discard_func,
+        )
+
+    return await request_coalescing.coalesce(
+        ("osu_mirrors", coalescing_name, resource_id),
+        lambda: _fetch_with_fallback(
+            resource,
+            resource_id,
+            fetch_func,
+            validate_func,
+            discard_func,
+        ),
+    )
+
+
+async def _fetch_with_fallback(
+    resource: MirrorResource,
+    resource_id: int,
+    fetch_func: Callable[[AbstractBeatmapMirror], Awaitable[BeatmapMirrorResponse[T]]],
+    validate_func: Callable[[T], bool] | None,
+    discard_func: Callable[[T], Awaitable[None]] | None,
+) -> T | None:
     available = get_available_mirrors(resource)
 
     if not available:
@@ -227,6 +516,7 @@ async def fetch_with_fallback(
         resource=resource,
         resource_id=resource_id,
         validate_func=validate_func,
+        discard_func=discard_func,
     )
 
     if result is not None:
@@ -237,14 +527,20 @@ async def fetch_with_fallback(
                 "mirror_name": mirror.name,
                 "resource": resource,
                 "resource_id": resource_id,
-                "latency_ema": mirror.health.latency_ema,
+                "mirror_weight": get_mirror_weight(mirror, resource),
             },
         )
         return response.data
 
     # Hedged request failed, try remaining mirrors sequentially
     for mirror in available[HEDGE_COUNT:]:
-        if not mirror.health.is_available():
+        if not mirror.health.is_available(
+            max_rate_limit_wait=RATE_LIMIT_MAX_WAIT_SECONDS,
+        ):
+            continue
+        if not await mirror.health.acquire_request_slot(
+            timeout=RATE_LIMIT_MAX_WAIT_SECONDS,
+        ):
             continue
 
         started_at = time.time()
@@ -252,17 +548,19 @@ async def fetch_with_fallback(
         elapsed = time.time() - started_at
 
         # Log the request
-        await beatmap_mirror_requests.create(
-            request_url=truncate_string(response.request_url) or "unavailable",
-            api_key_id=None,
-            mirror_name=mirror.name,
-            success=response.is_success,
-            started_at=datetime.fromtimestamp(started_at),
-            ended_at=datetime.now(),
-            response_status_code=response.status_code,
-            response_size=get_data_size(response.data),
-            response_error=truncate_string(response.error_message),
-            resource=resource,
+        _record_mirror_request(
+            BeatmapMirrorRequest(
+                request_url=truncate_string(response.request_url) or "unavailable",
+                api_key_id=None,
+                mirror_name=mirror.name,
+                success=response.is_success,
+                started_at=datetime.fromtimestamp(started_at),
+                ended_at=datetime.now(),
+                response_status_code=response.status_code,
+                response_size=get_data_size(response.data),
+                response_error=truncate_string(response.error_message),
+                resource=resource,
+            ),
         )
 
         # Validate
@@ -270,10 +568,13 @@ async def fetch_with_fallback(
         if is_valid and response.data is not None and validate_func:
             if not validate_func(response.data):
                 is_valid = False
+                if discard_func is not None:
+                    await discard_func(response.data)
 
         if is_valid:
-            mirror.health.record_success(elapsed)
+            mirror.health.record_success(elapsed, resource)
             if response.data is not None:
+                _record_throughput(mirror, resource, response.data, elapsed)
                 logging.debug(
                     "Served resource from mirror (fallback)",
                     extra={
@@ -309,6 +610,7 @@ async def fetch_one_cheesegull_beatmap(beatmap_id: int) -> CheesegullBeatmap | N
         resource=MirrorResource.OSZ_FILE,  # Using OSZ_FILE for compatibility
         resource_id=beatmap_id,
         fetch_func=lambda m: m.fetch_one_cheesegull_beatmap(beatmap_id),
+        coalescing_name="cheesegull_beatmap",
     )
 
 
@@ -320,6 +622,7 @@ async def fetch_one_cheesegull_beatmapset(
         resource=MirrorResource.OSZ_FILE,  # Using OSZ_FILE for compatibility
         resource_id=beatmapset_id,
         fetch_func=lambda m: m.fetch_one_cheesegull_beatmapset(beatmapset_id),
+        coalescing_name="cheesegull_beatmapset",
     )
 
 
@@ -335,6 +638,34 @@ async def fetch_beatmap_zip_data(beatmapset_id: int) -> bytes | None:
         resource_id=beatmapset_id,
         fetch_func=lambda m: m.fetch_beatmap_zip_data(beatmapset_id),
         validate_func=is_valid_zip_file,
+        coalescing_name="osz_file",
+    )
+
+
+async def stream_beatmap_zip_data(
+    beatmapset_id: int,
+    *,
+    byte_range: ByteRange | None = None,
+) -> BeatmapMirrorStream | None:
+    """
+    Open a streamed beatmapset .osz file download using hedged requests.
+
+    Only the first chunk of each mirror's response is read before choosing
+    a winner, so memory use is bounded regardless of the archive's size.
+    The caller is responsible for consuming or closing the returned stream.
+
+    If a `byte_range` is given, mirrors may respond with either that part
+    of the archive or the whole of it; check the stream's `content_range`.
+    """
+    return await fetch_with_fallback(
+        resource=MirrorResource.OSZ_FILE,
+        resource_id=beatmapset_id,
+        fetch_func=lambda m: m.stream_beatmap_zip_data(
+            beatmapset_id,
+            byte_range=byte_range,
+        ),
+        validate_func=is_valid_zip_stream,
+        discard_func=close_stream,
     )
 
 
@@ -349,4 +680,97 @@ async def fetch_beatmap_background_image(beatmap_id: int) -> bytes | None:
         resource=MirrorResource.BACKGROUND_IMAGE,
         resource_id=beatmap_id,
         fetch_func=lambda m: m.fetch_beatmap_background_image(beatmap_id),
+        coalescing_name="background_image",
+    )
+
+
+async def stream_beatmap_audio(beatmap_id: int) -> BeatmapMirrorStream | None:
+    """\
+    Open a streamed download of a beatmap's full audio track.
+
+    The caller is responsible for consuming or closing the returned stream.
+    """
+    return await fetch_with_fallback(
+        resource=MirrorResource.AUDIO,
+        resource_id=beatmap_id,
+        fetch_func=lambda m: m.stream_beatmap_audio(beatmap_id),
+        validate_func=is_valid_audio_stream,
+        discard_func=close_stream,
     )
+
+
+async def stream_beatmap_audio_preview(beatmap_id: int) -> BeatmapMirrorStream | None:
+    """\
+    Open a streamed download of a beatmap's audio preview clip.
+
+    The caller is responsible for consuming or closing the returned stream.
+    """
+    return await fetch_with_fallback(
+        resource=MirrorResource.AUDIO_PREVIEW,
+        resource_id=beatmap_id,
+        fetch_func=lambda m: m.stream_beatmap_audio_preview(beatmap_id),
+        validate_func=is_valid_audio_stream,
+        discard_func=close_stream,
+    )
+
+
+class MirrorResourceStats(BaseModel):
+    resource: MirrorResource
+    weight: int
+    window_latency_ms: float | None
+    window_failure_rate: float | None
+    latency_sample_count: float
+    latency_p50: float | None
+    latency_p75: float | None
+    latency_p90: float | None
+    latency_p99: float | None
+    throughput_sample_count: float
+    throughput_p25: float | None
+    throughput_p50: float | None
+
+
+class MirrorStats(BaseModel):
+    mirror_name: str
+    circuit_state: str
+    consecutive_failures: int
+    resources: list[MirrorResourceStats]
+
+
+def get_mirror_stats() -> list[MirrorStats]:
+    """Describe the health of each mirror, to see why mirrors are chosen."""
+    mirror_stats: list[MirrorStats] = []
+    for mirror in BEATMAP_MIRRORS:
+        resource_stats: list[MirrorResourceStats] = []
+        for resource in sorted(mirror.supported_resources):
+            score = mirror_scoreboard.get_score(mirror.name, resource)
+            latency_histogram = mirror.health.latency_histograms.get(resource)
+            throughput_histogram = mirror.health.throughput_histograms.get(resource)
+            resource_stats.append(
+                MirrorResourceStats(
+                    resource=resource,
+                    weight=get_mirror_weight(mirror, resource),
+                    window_latency_ms=score.latency_ms(),
+                    window_failure_rate=score.failure_rate(),
+                    latency_sample_count=(
+                        latency_histogram.total_count if latency_histogram else 0
+                    ),
+                    latency_p50=mirror.health.latency_percentile(resource, 0.5),
+                    latency_p75=mirror.health.latency_percentile(resource, 0.75),
+                    latency_p90=mirror.health.latency_percentile(resource, 0.9),
+                    latency_p99=mirror.health.latency_percentile(resource, 0.99),
+                    throughput_sample_count=(
+                        throughput_histogram.total_count if throughput_histogram else 0
+                    ),
+                    throughput_p25=mirror.health.throughput_percentile(resource, 0.25),
+                    throughput_p50=mirror.health.throughput_percentile(resource, 0.5),
+                ),
+            )
+        mirror_stats.append(
+            MirrorStats(
+                mirror_name=mirror.name,
+                circuit_state=mirror.health.circuit.state,
+                consecutive_failures=mirror.health.circuit.consecutive_failures,
+                resources=resource_stats,
+            ),
+        )
+    return mirror_stats
@@ -1,5 +1,9 @@
+import time
 from abc import ABC
+from collections.abc import AsyncIterator
+from collections.abc import Callable
 from dataclasses import dataclass
+from dataclasses import field
 from typing import Any
 from typing import ClassVar
 from typing import Generic
@@ -7,14 +11,22 @@ from typing import TypeVar
 
 import httpx
 
+from app.adapters.http_clients import HttpClientConfig
+from app.adapters.http_clients import http_client_manager
 from app.adapters.osu_mirrors.resilience import MirrorHealth
 from app.adapters.osu_mirrors.resilience import TokenBucket
+from app.byte_ranges import ByteRange
+from app.byte_ranges import ContentRange
+from app.byte_ranges import parse_content_range_header
 from app.common_models import CheesegullBeatmap
 from app.common_models import CheesegullBeatmapset
 from app.repositories.beatmap_mirror_requests import MirrorResource
 
 T = TypeVar("T", covariant=True)
 
+# How much of a streamed response body to hold in memory at once
+STREAM_CHUNK_SIZE = 64 * 1024
+
 
 @dataclass
 class BeatmapMirrorResponse(Generic[T]):
@@ -25,17 +37,78 @@ class BeatmapMirrorResponse(Generic[T]):
     error_message: str | None = None
 
 
+@dataclass
+class BeatmapMirrorStream:
+    """\
+    An open response body from a beatmap mirror.
+
+    Only the first chunk has been read from the connection; the remainder
+    is read lazily as the stream is iterated. The stream must either be
+    fully iterated, or explicitly closed with `aclose`.
+    """
+
+    first_chunk: bytes
+    content_length: int | None
+    # Set when the mirror responded with only part of the body
+    content_range: ContentRange | None
+    response: httpx.Response
+    chunks: AsyncIterator[bytes]
+    started_at: float
+
+    # Called with (size_bytes, elapsed_seconds) once the body is fully read
+    on_complete: Callable[[int, float], None] | None = field(default=None)
+
+    async def iter_bytes(self) -> AsyncIterator[bytes]:
+        try:
+            size_bytes = len(self.first_chunk)
+            if self.first_chunk:
+                yield self.first_chunk
+            async for chunk in self.chunks:
+                size_bytes += len(chunk)
+                yield chunk
+
+            if self.on_complete is not None:
+                self.on_complete(size_bytes, time.time() - self.started_at)
+        finally:
+            await self.aclose()
+
+    async def aclose(self) -> None:
+        await self.response.aclose()
+
+
 class AbstractBeatmapMirror(ABC):
     name: ClassVar[str]
     base_url: ClassVar[str]
     supported_resources: ClassVar[set[MirrorResource]]
     requests_per_second: ClassVar[float | None] = None  # Rate limit, if known
+    max_connections: ClassVar[int] = 20
+    # Streamed downloads hold their connection for as long as the client
+    # takes to receive the body, so they get a separate, larger pool;
+    # otherwise a few slow clients would starve every other request
+    max_stream_connections: ClassVar[int] = 100
 
     def __init__(self, *args: Any, **kwargs: Any) -> None:
-        self.http_client = httpx.AsyncClient(
-            headers={"User-Agent": "Akatsuki-Beatmaps-Service/1.0"},
-            timeout=httpx.Timeout(10.0, connect=5.0),
-            follow_redirects=True,
+        http_client_manager.register(
+            self.http_client_name,
+            HttpClientConfig(
+                headers={"User-Agent": "Akatsuki-Beatmaps-Service/1.0"},
+                timeout=httpx.Timeout(10.0, connect=5.0),
+                follow_redirects=True,
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+                prewarm_url=self.base_url,
+            ),
+        )
+        http_client_manager.register(
+            self.stream_http_client_name,
+            HttpClientConfig(
+                headers={"User-Agent": "Akatsuki-Beatmaps-Service/1.0"},
+                timeout=httpx.Timeout(10.0, connect=5.0),
+                follow_redirects=True,
+                max_connections=self.max_stream_connections,
+                max_keepalive_connections=self.max_connections,
+                prewarm_url=self.base_url,
+            ),
         )
         # Initialize health tracking with optional rate limiter
         rate_limiter = None
@@ -47,6 +120,101 @@ class AbstractBeatmapMirror(ABC):
         self.health = MirrorHealth(rate_limiter=rate_limiter)
         super().__init__(*args, **kwargs)
 
+    @property
+    def http_client_name(self) -> str:
+        return f"mirror:{self.name}"
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        return http_client_manager.get(self.http_client_name)
+
+    @property
+    def stream_http_client_name(self) -> str:
+        return f"mirror:{self.name}:streams"
+
+    @property
+    def stream_http_client(self) -> httpx.AsyncClient:
+        return http_client_manager.get(self.stream_http_client_name)
+
+    async def _open_stream(
+        self,
+        url: str,
+        *,
+        headers: dict[str, str] | None = None,
+        byte_range: ByteRange | None = None,
+    ) -> BeatmapMirrorResponse[BeatmapMirrorStream | None]:
+        """\
+        Send a request and read only the first chunk of the response body.
+
+        The connection is released on any failure, or if the mirror responds
+        that the resource does not exist; otherwise ownership of the open
+        response passes to the returned stream.
+
+        If a `byte_range` is given it is passed through to the mirror, which
+        may or may not honour it; check the stream's `content_range`.
+        """
+        response: httpx.Response | None = None
+        handed_off = False
+        started_at = time.time()
+        try:
+            headers = dict(headers or {})
+            if byte_range is not None:
+                headers["Range"] = byte_range.to_header_value()
+
+            request = self.stream_http_client.build_request("GET", url, headers=headers)
+            response = await self.stream_http_client.send(request, stream=True)
+            if response.status_code in (404, 451):
+                return BeatmapMirrorResponse(
+                    data=None,
+                    is_success=True,
+                    request_url=str(response.request.url),
+                    status_code=response.status_code,
+                )
+            response.raise_for_status()
+
+            chunks = response.aiter_bytes(STREAM_CHUNK_SIZE)
+            first_chunk = await anext(chunks, b"")
+
+            # httpx transparently decodes compressed bodies, in which case
+            # the upstream content length does not describe what we'll send
+            content_length: int | None = None
+            if response.headers.get("Content-Encoding", "identity") == "identity":
+                raw_content_length = response.headers.get("Content-Length")
+                if raw_content_length is not None and raw_content_length.isdigit():
+                    content_length = int(raw_content_length)
+
+            handed_off = True
+            return BeatmapMirrorResponse(
+                data=BeatmapMirrorStream(
+                    first_chunk=first_chunk,
+                    content_length=content_length,
+                    content_range=(
+                        parse_content_range_header(
+                            response.headers.get("Content-Range")
+                        )
+                        if response.status_code == 206
+                        else None
+                    ),
+                    response=response,
+                    chunks=chunks,
+                    started_at=started_at,
+                ),
+                is_success=True,
+                request_url=str(response.request.url),
+                status_code=response.status_code,
+            )
+        except Exception as exc:
+            return BeatmapMirrorResponse(
+                data=None,
+                is_success=False,
+                request_url=str(response.request.url) if response else None,
+                status_code=response.status_code if response else None,
+                error_message=str(exc),
+            )
+        finally:
+            if response is not None and not handed_off:
+                await response.aclose()
+
     async def fetch_one_cheesegull_beatmap(
         self,
         beatmap_id: int,
@@ -68,9 +236,32 @@ class AbstractBeatmapMirror(ABC):
         """Fetch a beatmap's .osz file content from a beatmap mirror."""
         raise NotImplementedError()
 
+    async def stream_beatmap_zip_data(
+        self,
+        beatmapset_id: int,
+        *,
+        byte_range: ByteRange | None = None,
+    ) -> BeatmapMirrorResponse[BeatmapMirrorStream | None]:
+        """Open a streamed beatmap .osz file download from a beatmap mirror."""
+        raise NotImplementedError()
+
     async def fetch_beatmap_background_image(
         self,
         beatmap_id: int,
     ) -> BeatmapMirrorResponse[bytes | None]:
         """Fetch a beatmap's background image from a beatmap mirror."""
         raise NotImplementedError()
+
+    async def stream_beatmap_audio(
+        self,
+        beatmap_id: int,
+    ) -> BeatmapMirrorResponse[BeatmapMirrorStream | None]:
+        """Open a streamed download of a beatmap's full audio track."""
+        raise NotImplementedError()
+
+    async def stream_beatmap_audio_preview(
+        self,
+        beatmap_id: int,
+    ) -> BeatmapMirrorResponse[BeatmapMirrorStream | None]:
+        """Open a streamed download of a beatmap's audio preview clip."""
+        raise NotImplementedError()
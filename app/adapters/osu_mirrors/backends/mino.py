@@ -6,13 +6,19 @@ from typing_extensions import override
 from app import settings
 from app.adapters.osu_mirrors.backends import AbstractBeatmapMirror
 from app.adapters.osu_mirrors.backends import BeatmapMirrorResponse
+from app.adapters.osu_mirrors.backends import BeatmapMirrorStream
+from app.byte_ranges import ByteRange
 from app.repositories.beatmap_mirror_requests import MirrorResource
 
 
 class MinoMirror(AbstractBeatmapMirror):
     name = "mino"
     base_url = "https://catboy.best"
-    supported_resources = {MirrorResource.OSZ_FILE, MirrorResource.BACKGROUND_IMAGE}
+    supported_resources = {
+        MirrorResource.OSZ_FILE,
+        MirrorResource.BACKGROUND_IMAGE,
+        MirrorResource.AUDIO_PREVIEW,
+    }
 
     @override
     async def fetch_beatmap_zip_data(
@@ -48,6 +54,19 @@ class MinoMirror(AbstractBeatmapMirror):
                 error_message=str(exc),
             )
 
+    @override
+    async def stream_beatmap_zip_data(
+        self,
+        beatmapset_id: int,
+        *,
+        byte_range: ByteRange | None = None,
+    ) -> BeatmapMirrorResponse[BeatmapMirrorStream | None]:
+        return await self._open_stream(
+            f"{self.base_url}/d/{beatmapset_id}",
+            headers={"x-ratelimit-key": settings.MINO_INCREASED_RATELIMIT_KEY},
+            byte_range=byte_range,
+        )
+
     @override
     async def fetch_beatmap_background_image(
         self,
@@ -85,6 +104,16 @@ class MinoMirror(AbstractBeatmapMirror):
                 error_message=str(exc),
             )
 
+    @override
+    async def stream_beatmap_audio_preview(
+        self,
+        beatmap_id: int,
+    ) -> BeatmapMirrorResponse[BeatmapMirrorStream | None]:
+        return await self._open_stream(
+            f"{self.base_url}/preview/audio/{beatmap_id}",
+            headers={"x-ratelimit-key": settings.MINO_INCREASED_RATELIMIT_KEY},
+        )
+
 
 class MinoCentralMirror(MinoMirror):
     name = "mino-germany"
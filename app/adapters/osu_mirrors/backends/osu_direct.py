@@ -3,6 +3,8 @@ from typing_extensions import override
 
 from app.adapters.osu_mirrors.backends import AbstractBeatmapMirror
 from app.adapters.osu_mirrors.backends import BeatmapMirrorResponse
+from app.adapters.osu_mirrors.backends import BeatmapMirrorStream
+from app.byte_ranges import ByteRange
 from app.common_models import CheesegullBeatmap
 from app.common_models import CheesegullBeatmapset
 from app.repositories.beatmap_mirror_requests import MirrorResource
@@ -11,7 +13,12 @@ from app.repositories.beatmap_mirror_requests import MirrorResource
 class OsuDirectMirror(AbstractBeatmapMirror):
     name = "osu_direct"
     base_url = "https://osu.direct"
-    supported_resources = {MirrorResource.OSZ_FILE, MirrorResource.BACKGROUND_IMAGE}
+    supported_resources = {
+        MirrorResource.OSZ_FILE,
+        MirrorResource.BACKGROUND_IMAGE,
+        MirrorResource.AUDIO,
+        MirrorResource.AUDIO_PREVIEW,
+    }
 
     @override
     async def fetch_one_cheesegull_beatmap(
@@ -112,6 +119,18 @@ class OsuDirectMirror(AbstractBeatmapMirror):
                 error_message=str(exc),
             )
 
+    @override
+    async def stream_beatmap_zip_data(
+        self,
+        beatmapset_id: int,
+        *,
+        byte_range: ByteRange | None = None,
+    ) -> BeatmapMirrorResponse[BeatmapMirrorStream | None]:
+        return await self._open_stream(
+            f"{self.base_url}/api/d/{beatmapset_id}",
+            byte_range=byte_range,
+        )
+
     @override
     async def fetch_beatmap_background_image(
         self,
@@ -144,3 +163,21 @@ class OsuDirectMirror(AbstractBeatmapMirror):
                 status_code=response.status_code if response else None,
                 error_message=str(exc),
             )
+
+    @override
+    async def stream_beatmap_audio(
+        self,
+        beatmap_id: int,
+    ) -> BeatmapMirrorResponse[BeatmapMirrorStream | None]:
+        return await self._open_stream(
+            f"{self.base_url}/api/media/audio/{beatmap_id}",
+        )
+
+    @override
+    async def stream_beatmap_audio_preview(
+        self,
+        beatmap_id: int,
+    ) -> BeatmapMirrorResponse[BeatmapMirrorStream | None]:
+        return await self._open_stream(
+            f"{self.base_url}/api/media/preview/{beatmap_id}",
+        )
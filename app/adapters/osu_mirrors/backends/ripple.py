@@ -3,6 +3,8 @@ from typing_extensions import override
 
 from app.adapters.osu_mirrors.backends import AbstractBeatmapMirror
 from app.adapters.osu_mirrors.backends import BeatmapMirrorResponse
+from app.adapters.osu_mirrors.backends import BeatmapMirrorStream
+from app.byte_ranges import ByteRange
 from app.repositories.beatmap_mirror_requests import MirrorResource
 
 
@@ -43,3 +45,15 @@ class RippleMirror(AbstractBeatmapMirror):
                 status_code=response.status_code if response else None,
                 error_message=str(exc),
             )
+
+    @override
+    async def stream_beatmap_zip_data(
+        self,
+        beatmapset_id: int,
+        *,
+        byte_range: ByteRange | None = None,
+    ) -> BeatmapMirrorResponse[BeatmapMirrorStream | None]:
+        return await self._open_stream(
+            f"{self.base_url}/d/{beatmapset_id}",
+            byte_range=byte_range,
+        )
@@ -0,0 +1,131 @@
+"""\
+Records beatmap mirror requests to the database, off the request path.
+
+Requests are buffered in memory and written in batches by a background task,
+either once enough have accumulated or after a time interval has elapsed.
+"""
+
+import asyncio
+import logging
+import random
+
+from pydantic import BaseModel
+
+from app import settings
+from app.repositories import beatmap_mirror_requests
+from app.repositories.beatmap_mirror_requests import BeatmapMirrorRequest
+
+
+class MirrorRequestLogStats(BaseModel):
+    queued: int
+    written: int
+    sampled_out: int
+    dropped: int
+    failed: int
+
+
+class MirrorRequestLog:
+    def __init__(
+        self,
+        *,
+        max_queue_size: int,
+        batch_size: int,
+        flush_interval_seconds: float,
+        success_sample_rate: float,
+    ) -> None:
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.success_sample_rate = success_sample_rate
+
+        self._queue: list[BeatmapMirrorRequest] = []
+        self._batch_ready = asyncio.Event()
+        self._flush_task: asyncio.Task[None] | None = None
+        self._batch_write: asyncio.Future[None] | None = None
+
+        self._written_count = 0
+        self._sampled_out_count = 0
+        self._dropped_count = 0
+        self._failed_count = 0
+
+    def record(self, request: BeatmapMirrorRequest) -> None:
+        """Queue a request to be written. Never blocks."""
+        if request.success and random.random() >= self.success_sample_rate:
+            self._sampled_out_count += 1
+            return None
+
+        if len(self._queue) >= self.max_queue_size:
+            self._dropped_count += 1
+            return None
+
+        self._queue.append(request)
+        if len(self._queue) >= self.batch_size:
+            self._batch_ready.set()
+
+    async def _write_batch(self, batch: list[BeatmapMirrorRequest]) -> None:
+        try:
+            await beatmap_mirror_requests.create_many(batch)
+        except Exception:
+            self._failed_count += len(batch)
+            logging.exception(
+                "Failed to write beatmap mirror requests",
+                extra={"batch_size": len(batch)},
+            )
+        else:
+            self._written_count += len(batch)
+
+    async def flush(self) -> None:
+        """Write all queued requests to the database."""
+        self._batch_ready.clear()
+        while self._queue:
+            batch = self._queue[: self.batch_size]
+            del self._queue[: self.batch_size]
+            # Shielded, so that a batch already taken off the queue is still
+            # written if we're cancelled (e.g. on shutdown); `stop` awaits it
+            self._batch_write = asyncio.ensure_future(self._write_batch(batch))
+            await asyncio.shield(self._batch_write)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._batch_ready.wait(),
+                    timeout=self.flush_interval_seconds,
+                )
+            except TimeoutError:
+                pass
+            await self.flush()
+
+    def start(self) -> None:
+        self._flush_task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background writer, writing anything still queued."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        if self._batch_write is not None:
+            await self._batch_write
+            self._batch_write = None
+        await self.flush()
+
+    def get_stats(self) -> MirrorRequestLogStats:
+        return MirrorRequestLogStats(
+            queued=len(self._queue),
+            written=self._written_count,
+            sampled_out=self._sampled_out_count,
+            dropped=self._dropped_count,
+            failed=self._failed_count,
+        )
+
+
+mirror_request_log = MirrorRequestLog(
+    max_queue_size=settings.MIRROR_REQUEST_LOG_MAX_QUEUE_SIZE,
+    batch_size=settings.MIRROR_REQUEST_LOG_BATCH_SIZE,
+    flush_interval_seconds=settings.MIRROR_REQUEST_LOG_FLUSH_INTERVAL_SECONDS,
+    success_sample_rate=settings.MIRROR_REQUEST_LOG_SUCCESS_SAMPLE_RATE,
+)
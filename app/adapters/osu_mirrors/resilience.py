@@ -1,8 +1,12 @@
+import asyncio
+import bisect
 import time
 from dataclasses import dataclass
 from dataclasses import field
 from enum import StrEnum
 
+from app.repositories.beatmap_mirror_requests import MirrorResource
+
 
 class CircuitState(StrEnum):
     CLOSED = "closed"  # Normal operation, requests allowed
@@ -39,6 +43,20 @@ class CircuitBreaker:
             self.state = CircuitState.OPEN
             self.opened_at = time.time()
 
+    def trip(self, opened_at: float) -> None:
+        """\
+        Open the circuit based on failures observed elsewhere.
+
+        Has no effect unless the circuit is currently closed; a circuit
+        which is already open or probing for recovery is left to run its course.
+        """
+        if self.state != CircuitState.CLOSED:
+            return None
+        if time.time() - opened_at >= self.cooldown_seconds:
+            return None
+        self.state = CircuitState.OPEN
+        self.opened_at = opened_at
+
     def should_allow_request(self) -> bool:
         """Check if a request should be allowed through the circuit."""
         if self.state == CircuitState.CLOSED:
@@ -65,6 +83,9 @@ class TokenBucket:
 
     Allows requests up to a certain rate, with burst capacity.
     Tokens regenerate over time at a fixed rate.
+
+    Tokens may be reserved ahead of time; the balance then goes negative,
+    and later callers must wait for the debt to be regenerated first.
     """
 
     tokens_per_second: float
@@ -91,6 +112,13 @@ class TokenBucket:
         )
         self.last_update = now
 
+    def set_rate(self, tokens_per_second: float, bucket_size: float) -> None:
+        """Change the rate limit, keeping any tokens already accrued or owed."""
+        self._refill()
+        self.tokens_per_second = tokens_per_second
+        self.bucket_size = bucket_size
+        self.tokens = min(self.tokens, bucket_size)
+
     def try_acquire(self, tokens: float = 1.0) -> bool:
         """Try to acquire tokens. Returns True if successful."""
         self._refill()
@@ -99,6 +127,34 @@ class TokenBucket:
             return True
         return False
 
+    async def acquire(self, tokens: float = 1.0, *, timeout: float = 0.0) -> bool:
+        """\
+        Acquire tokens, waiting up to `timeout` seconds for them to regenerate.
+
+        The tokens are reserved immediately, so concurrent callers queue up
+        behind each other fairly. Returns False (without reserving anything)
+        if the tokens would not be available within the timeout.
+        """
+        wait_seconds = self.time_until_available(tokens)
+        if wait_seconds > timeout:
+            return False
+
+        self.tokens -= tokens
+        if wait_seconds > 0:
+            try:
+                await asyncio.sleep(wait_seconds)
+            except asyncio.CancelledError:
+                # e.g. a hedged request which lost the race; it never
+                # got to make its request, so give the tokens back
+                self._refund(tokens)
+                raise
+        return True
+
+    def _refund(self, tokens: float) -> None:
+        self._refill()
+        assert self.bucket_size is not None
+        self.tokens = min(self.bucket_size, self.tokens + tokens)
+
     def time_until_available(self, tokens: float = 1.0) -> float:
         """Returns seconds until the requested tokens will be available."""
         self._refill()
@@ -108,37 +164,193 @@ class TokenBucket:
         return needed / self.tokens_per_second
 
 
+@dataclass
+class Histogram:
+    """\
+    A bounded-memory histogram of observations over log-spaced buckets.
+
+    Counts are periodically halved, so that percentiles reflect
+    recent behaviour more than long-past behaviour.
+    """
+
+    min_value: float
+    max_value: float
+    bucket_growth_factor: float = 1.25
+    observations_per_decay: int = 500
+
+    bucket_upper_bounds: list[float] = field(init=False)
+    bucket_counts: list[float] = field(init=False)
+    total_count: float = field(init=False, default=0.0)
+    observations_since_decay: int = field(init=False, default=0)
+
+    def __post_init__(self) -> None:
+        self.bucket_upper_bounds = []
+        bound = self.min_value
+        while bound < self.max_value:
+            self.bucket_upper_bounds.append(bound)
+            bound *= self.bucket_growth_factor
+        self.bucket_upper_bounds.append(self.max_value)
+        self.bucket_counts = [0.0] * len(self.bucket_upper_bounds)
+
+    def record(self, value: float) -> None:
+        """Record an observation. Values beyond the range are clamped."""
+        bucket = min(
+            bisect.bisect_left(self.bucket_upper_bounds, value),
+            len(self.bucket_counts) - 1,
+        )
+        self.bucket_counts[bucket] += 1
+        self.total_count += 1
+
+        self.observations_since_decay += 1
+        if self.observations_since_decay >= self.observations_per_decay:
+            self.bucket_counts = [count / 2 for count in self.bucket_counts]
+            self.total_count /= 2
+            self.observations_since_decay = 0
+
+    def percentile(self, quantile: float) -> float | None:
+        """\
+        Estimate the value at a quantile (0.0-1.0) of the observations.
+
+        Estimates are the upper bound of the bucket the quantile falls in.
+        Returns None if there have been no observations.
+        """
+        if self.total_count == 0:
+            return None
+
+        target_count = quantile * self.total_count
+        cumulative_count = 0.0
+        for upper_bound, count in zip(self.bucket_upper_bounds, self.bucket_counts):
+            cumulative_count += count
+            if count and cumulative_count >= target_count:
+                return upper_bound
+
+        return self.max_value
+
+
+def _create_latency_histogram() -> Histogram:
+    # 10ms to 2 minutes
+    return Histogram(min_value=0.01, max_value=120.0)
+
+
+def _create_throughput_histogram() -> Histogram:
+    # 10KB/s to 1GB/s
+    return Histogram(min_value=10_000.0, max_value=1_000_000_000.0)
+
+
+# Throughput is only meaningful for bodies large enough that
+# transfer time dominates over connection setup & server time
+MIN_THROUGHPUT_SAMPLE_SIZE = 1024 * 1024
+
+
 @dataclass
 class MirrorHealth:
     """
     Tracks health metrics for a single mirror.
 
-    Combines circuit breaker, rate limiting, and latency tracking.
+    Combines circuit breaker, rate limiting, and latency & throughput tracking.
     """
 
     circuit: CircuitBreaker = field(default_factory=CircuitBreaker)
     rate_limiter: TokenBucket | None = field(default=None)
 
-    # Exponential moving average of successful request latency (seconds)
-    latency_ema: float = field(default=1.0)
-    latency_ema_alpha: float = field(default=0.3)  # Weight for new observations
+    # Distribution of successful request latency (seconds), per resource
+    latency_histograms: dict[MirrorResource, Histogram] = field(default_factory=dict)
 
-    def is_available(self) -> bool:
-        """Check if this mirror is available for requests."""
+    # Distribution of response body throughput (bytes/second), per resource
+    throughput_histograms: dict[MirrorResource, Histogram] = field(
+        default_factory=dict,
+    )
+
+    def is_available(self, *, max_rate_limit_wait: float = 0.0) -> bool:
+        """\
+        Check if this mirror is available for requests.
+
+        This does not consume any rate limit; see `acquire_request_slot`.
+        """
         if not self.circuit.should_allow_request():
             return False
-        if self.rate_limiter is not None and not self.rate_limiter.try_acquire():
+        if (
+            self.rate_limiter is not None
+            and self.rate_limiter.time_until_available() > max_rate_limit_wait
+        ):
             return False
         return True
 
-    def record_success(self, latency_seconds: float) -> None:
+    async def acquire_request_slot(self, *, timeout: float = 0.0) -> bool:
+        """Reserve rate limit for a request which is about to be sent."""
+        if self.rate_limiter is None:
+            return True
+        return await self.rate_limiter.acquire(timeout=timeout)
+
+    def record_success(
+        self,
+        latency_seconds: float,
+        resource: MirrorResource,
+    ) -> None:
         """Record a successful request with its latency."""
         self.circuit.record_success()
-        # Update EMA: new_ema = alpha * observation + (1 - alpha) * old_ema
-        self.latency_ema = (
-            self.latency_ema_alpha * latency_seconds
-            + (1 - self.latency_ema_alpha) * self.latency_ema
-        )
+
+        latency_histogram = self.latency_histograms.get(resource)
+        if latency_histogram is None:
+            latency_histogram = _create_latency_histogram()
+            self.latency_histograms[resource] = latency_histogram
+        latency_histogram.record(latency_seconds)
+
+    def record_throughput(
+        self,
+        resource: MirrorResource,
+        size_bytes: int,
+        elapsed_seconds: float,
+    ) -> None:
+        """Record the transfer rate of a response body, if it was large enough."""
+        if size_bytes < MIN_THROUGHPUT_SAMPLE_SIZE or elapsed_seconds <= 0:
+            return None
+
+        throughput_histogram = self.throughput_histograms.get(resource)
+        if throughput_histogram is None:
+            throughput_histogram = _create_throughput_histogram()
+            self.throughput_histograms[resource] = throughput_histogram
+        throughput_histogram.record(size_bytes / elapsed_seconds)
+
+    def latency_percentile(
+        self,
+        resource: MirrorResource,
+        quantile: float,
+        *,
+        min_sample_count: int = 1,
+    ) -> float | None:
+        """\
+        Estimate a percentile of successful request latency for a resource.
+
+        Returns None if fewer than `min_sample_count` (decayed) samples exist.
+        """
+        latency_histogram = self.latency_histograms.get(resource)
+        if (
+            latency_histogram is None
+            or latency_histogram.total_count < min_sample_count
+        ):
+            return None
+        return latency_histogram.percentile(quantile)
+
+    def throughput_percentile(
+        self,
+        resource: MirrorResource,
+        quantile: float,
+        *,
+        min_sample_count: int = 1,
+    ) -> float | None:
+        """\
+        Estimate a percentile of response body throughput for a resource.
+
+        Returns None if fewer than `min_sample_count` (decayed) samples exist.
+        """
+        throughput_histogram = self.throughput_histograms.get(resource)
+        if (
+            throughput_histogram is None
+            or throughput_histogram.total_count < min_sample_count
+        ):
+            return None
+        return throughput_histogram.percentile(quantile)
 
     def record_failure(self) -> None:
         """Record a failed request."""
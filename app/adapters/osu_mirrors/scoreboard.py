@@ -0,0 +1,231 @@
+"""\
+An in-process scoreboard of how well each mirror serves each resource.
+
+Tracks latency percentiles & failure rates over a rolling window, maintained
+incrementally as requests are made, and derives a weight for each mirror
+to be used in weighted mirror selection.
+"""
+
+import logging
+import math
+import time
+from collections import deque
+from dataclasses import dataclass
+from dataclasses import field
+
+from app import settings
+from app.repositories import beatmap_mirror_requests
+from app.repositories.beatmap_mirror_requests import BeatmapMirrorRequest
+from app.repositories.beatmap_mirror_requests import MirrorResource
+
+# Give new mirrors a fair shot
+# to get their foot in the race
+MIRROR_INITIAL_WEIGHT = 100
+
+WINDOW_SECONDS = 4 * 60 * 60
+TIME_SLICE_SECONDS = 15 * 60
+
+# Latency buckets are quarter-doublings of milliseconds, up to ~2 minutes
+LATENCY_BUCKETS_PER_DOUBLING = 4
+LATENCY_BUCKET_COUNT = 17 * LATENCY_BUCKETS_PER_DOUBLING
+
+DEFAULT_LATENCY_PERCENTILE = 0.75
+
+
+def _latency_bucket(latency_ms: float) -> int:
+    bucket = int(math.log2(max(latency_ms, 1)) * LATENCY_BUCKETS_PER_DOUBLING)
+    return min(max(bucket, 0), LATENCY_BUCKET_COUNT - 1)
+
+
+def _latency_bucket_upper_bound_ms(bucket: int) -> float:
+    return float(2 ** ((bucket + 1) / LATENCY_BUCKETS_PER_DOUBLING))
+
+
+def calculate_mirror_weight(latency_ms: float, failure_rate: float) -> int:
+    # https://www.desmos.com/calculator/wxpsjhdby9
+    latency_weight = 1000 * math.exp(-1 / 1000 * latency_ms)
+    failure_weight = math.exp(-30 * failure_rate)
+    return max(1, int(latency_weight * failure_weight))
+
+
+@dataclass
+class _TimeSlice:
+    time_slice: int
+    success_count: float = 0.0
+    failure_count: float = 0.0
+    latency_bucket_counts: list[float] = field(
+        default_factory=lambda: [0.0] * LATENCY_BUCKET_COUNT,
+    )
+
+
+@dataclass
+class MirrorResourceScore:
+    """\
+    Rolling window of request outcomes for a single mirror & resource.
+
+    Totals across the window are kept up to date as requests are recorded
+    and as time slices fall out of the window, rather than being recomputed.
+    """
+
+    latency_percentile: float
+
+    time_slices: deque[_TimeSlice] = field(default_factory=deque)
+    success_count: float = 0.0
+    failure_count: float = 0.0
+    latency_bucket_counts: list[float] = field(
+        default_factory=lambda: [0.0] * LATENCY_BUCKET_COUNT,
+    )
+
+    _weight: int | None = None
+
+    def _expire_time_slices(self, current_time_slice: int) -> None:
+        oldest_time_slice = current_time_slice - WINDOW_SECONDS // TIME_SLICE_SECONDS
+        while self.time_slices and self.time_slices[0].time_slice <= oldest_time_slice:
+            expired = self.time_slices.popleft()
+            self.success_count -= expired.success_count
+            self.failure_count -= expired.failure_count
+            for bucket, count in enumerate(expired.latency_bucket_counts):
+                if count:
+                    self.latency_bucket_counts[bucket] -= count
+            self._weight = None
+
+    def _get_time_slice(self, time_slice: int) -> _TimeSlice | None:
+        # Requests almost always land in the newest slice; search from the end
+        for existing in reversed(self.time_slices):
+            if existing.time_slice == time_slice:
+                return existing
+            if existing.time_slice < time_slice:
+                break
+
+        if self.time_slices and self.time_slices[-1].time_slice > time_slice:
+            # Too far out of order to be worth inserting
+            return None
+
+        new_time_slice = _TimeSlice(time_slice=time_slice)
+        self.time_slices.append(new_time_slice)
+        return new_time_slice
+
+    def record(
+        self,
+        *,
+        started_at: float,
+        success: bool,
+        latency_bucket: int,
+        count: float = 1.0,
+    ) -> None:
+        time_slice_index = int(started_at // TIME_SLICE_SECONDS)
+        self._expire_time_slices(int(time.time() // TIME_SLICE_SECONDS))
+
+        time_slice = self._get_time_slice(time_slice_index)
+        if time_slice is None:
+            return None
+
+        if success:
+            time_slice.success_count += count
+            time_slice.latency_bucket_counts[latency_bucket] += count
+            self.success_count += count
+            self.latency_bucket_counts[latency_bucket] += count
+        else:
+            time_slice.failure_count += count
+            self.failure_count += count
+        self._weight = None
+
+    def latency_ms(self) -> float | None:
+        """Estimate the configured percentile of successful request latency."""
+        if self.success_count <= 0:
+            return None
+
+        target_count = self.latency_percentile * self.success_count
+        cumulative_count = 0.0
+        for bucket, count in enumerate(self.latency_bucket_counts):
+            cumulative_count += count
+            if count and cumulative_count >= target_count:
+                return _latency_bucket_upper_bound_ms(bucket)
+        return _latency_bucket_upper_bound_ms(LATENCY_BUCKET_COUNT - 1)
+
+    def failure_rate(self) -> float | None:
+        total_count = self.success_count + self.failure_count
+        if total_count <= 0:
+            return None
+        return self.failure_count / total_count
+
+    def weight(self) -> int:
+        self._expire_time_slices(int(time.time() // TIME_SLICE_SECONDS))
+        if self._weight is None:
+            latency_ms = self.latency_ms()
+            failure_rate = self.failure_rate()
+            if latency_ms is None or failure_rate is None:
+                self._weight = MIRROR_INITIAL_WEIGHT
+            else:
+                self._weight = calculate_mirror_weight(latency_ms, failure_rate)
+        return self._weight
+
+
+class MirrorScoreboard:
+    def __init__(self, latency_percentiles: dict[MirrorResource, float]) -> None:
+        self.latency_percentiles = latency_percentiles
+        self.scores: dict[tuple[str, MirrorResource], MirrorResourceScore] = {}
+
+    def get_score(
+        self,
+        mirror_name: str,
+        resource: MirrorResource,
+    ) -> MirrorResourceScore:
+        score = self.scores.get((mirror_name, resource))
+        if score is None:
+            score = MirrorResourceScore(
+                latency_percentile=self.latency_percentiles.get(
+                    resource,
+                    DEFAULT_LATENCY_PERCENTILE,
+                ),
+            )
+            self.scores[(mirror_name, resource)] = score
+        return score
+
+    def record(self, request: BeatmapMirrorRequest) -> None:
+        latency_ms = (request.ended_at - request.started_at).total_seconds() * 1000
+        self.get_score(request.mirror_name, request.resource).record(
+            started_at=request.started_at.timestamp(),
+            success=request.success,
+            latency_bucket=_latency_bucket(latency_ms),
+        )
+
+    async def seed(self) -> None:
+        """Load the rolling window's history from the database."""
+        histogram_buckets = await beatmap_mirror_requests.fetch_request_histograms(
+            window_seconds=WINDOW_SECONDS,
+            time_slice_seconds=TIME_SLICE_SECONDS,
+            latency_buckets_per_doubling=LATENCY_BUCKETS_PER_DOUBLING,
+        )
+
+        # Successful requests may be sampled when written to the database
+        success_weight = 1 / settings.MIRROR_REQUEST_LOG_SUCCESS_SAMPLE_RATE
+
+        for histogram_bucket in sorted(histogram_buckets, key=lambda b: b.time_slice):
+            self.get_score(
+                histogram_bucket.mirror_name, histogram_bucket.resource
+            ).record(
+                started_at=histogram_bucket.time_slice * TIME_SLICE_SECONDS,
+                success=histogram_bucket.success,
+                latency_bucket=min(
+                    max(histogram_bucket.latency_bucket, 0),
+                    LATENCY_BUCKET_COUNT - 1,
+                ),
+                count=histogram_bucket.request_count
+                * (success_weight if histogram_bucket.success else 1),
+            )
+
+        logging.info(
+            "Seeded mirror scoreboard",
+            extra={"histogram_bucket_count": len(histogram_buckets)},
+        )
+
+
+mirror_scoreboard = MirrorScoreboard(
+    latency_percentiles={
+        MirrorResource.OSZ_FILE: 0.75,
+        MirrorResource.BACKGROUND_IMAGE: 0.75,
+        MirrorResource.AUDIO: 0.75,
+        MirrorResource.AUDIO_PREVIEW: 0.75,
+    },
+)
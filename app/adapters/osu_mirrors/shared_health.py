@@ -0,0 +1,237 @@
+"""\
+Sharing of beatmap mirror health between replicas of the service.
+
+Each replica keeps its own circuit breakers & rate limiters, which remain
+the fast path for every request. Periodically, each replica publishes its
+view of each mirror to a shared store, and merges in the others' views:
+
+- A circuit opened by any replica is opened on all of them, so that a
+  failing mirror isn't retried by every replica in turn.
+- A mirror's rate limit is divided between all live replicas, so that
+  together they stay within it.
+"""
+
+import asyncio
+import logging
+import socket
+import time
+from abc import ABC
+from abc import abstractmethod
+from collections.abc import Sequence
+
+from pydantic import BaseModel
+
+from app import settings
+from app.adapters.osu_mirrors.backends import AbstractBeatmapMirror
+from app.adapters.osu_mirrors.resilience import CircuitState
+from app.repositories import beatmap_mirror_health
+from app.repositories.beatmap_mirror_health import BeatmapMirrorHealthReport
+
+# Replicas which haven't reported for this many sync intervals are presumed gone
+REPORT_MAX_AGE_SYNC_INTERVALS = 3
+
+
+class SharedMirrorHealthStore(ABC):
+    @abstractmethod
+    async def publish(self, reports: list[BeatmapMirrorHealthReport]) -> None: ...
+
+    @abstractmethod
+    async def fetch_recent(
+        self,
+        max_age_seconds: int,
+    ) -> list[BeatmapMirrorHealthReport]: ...
+
+
+class MySQLSharedMirrorHealthStore(SharedMirrorHealthStore):
+    async def publish(self, reports: list[BeatmapMirrorHealthReport]) -> None:
+        await beatmap_mirror_health.upsert_many(reports)
+
+    async def fetch_recent(
+        self,
+        max_age_seconds: int,
+    ) -> list[BeatmapMirrorHealthReport]:
+        return await beatmap_mirror_health.fetch_recent(max_age_seconds)
+
+
+class InMemorySharedMirrorHealthStore(SharedMirrorHealthStore):
+    """\
+    A store which only shares health within a single process.
+
+    Useful for local development, and for running several synchronizers
+    against one another to stand in for a cluster.
+    """
+
+    def __init__(self) -> None:
+        # (replica id, mirror name) -> (report, unix time reported at)
+        self._reports: dict[
+            tuple[str, str], tuple[BeatmapMirrorHealthReport, float]
+        ] = {}
+
+    async def publish(self, reports: list[BeatmapMirrorHealthReport]) -> None:
+        reported_at = time.time()
+        for report in reports:
+            self._reports[(report.replica_id, report.mirror_name)] = (
+                report,
+                reported_at,
+            )
+
+    async def fetch_recent(
+        self,
+        max_age_seconds: int,
+    ) -> list[BeatmapMirrorHealthReport]:
+        min_reported_at = time.time() - max_age_seconds
+        return [
+            report
+            for report, reported_at in self._reports.values()
+            if reported_at > min_reported_at
+        ]
+
+
+class SharedMirrorHealthStats(BaseModel):
+    replica_id: str
+    live_replica_count: int
+    syncs: int
+    failed_syncs: int
+    last_synced_at: float | None
+
+
+class SharedMirrorHealth:
+    def __init__(
+        self,
+        *,
+        store: SharedMirrorHealthStore,
+        replica_id: str,
+        sync_interval_seconds: float,
+    ) -> None:
+        self.store = store
+        self.replica_id = replica_id
+        self.sync_interval_seconds = sync_interval_seconds
+
+        self._mirrors: Sequence[AbstractBeatmapMirror] = []
+        self._sync_task: asyncio.Task[None] | None = None
+
+        self._live_replica_count = 1
+        self._sync_count = 0
+        self._failed_sync_count = 0
+        self._last_synced_at: float | None = None
+
+    def _create_reports(self) -> list[BeatmapMirrorHealthReport]:
+        return [
+            BeatmapMirrorHealthReport(
+                replica_id=self.replica_id,
+                mirror_name=mirror.name,
+                circuit_state=mirror.health.circuit.state,
+                consecutive_failures=mirror.health.circuit.consecutive_failures,
+                circuit_opened_at=(
+                    mirror.health.circuit.opened_at
+                    if mirror.health.circuit.state == CircuitState.OPEN
+                    else None
+                ),
+            )
+            for mirror in self._mirrors
+        ]
+
+    def _merge(self, reports: list[BeatmapMirrorHealthReport]) -> None:
+        replica_ids = {report.replica_id for report in reports}
+        replica_ids.add(self.replica_id)
+        self._live_replica_count = len(replica_ids)
+
+        for mirror in self._mirrors:
+            for report in reports:
+                if (
+                    report.replica_id != self.replica_id
+                    and report.mirror_name == mirror.name
+                    and report.circuit_state == CircuitState.OPEN
+                    and report.circuit_opened_at is not None
+                ):
+                    mirror.health.circuit.trip(report.circuit_opened_at)
+
+            if (
+                mirror.health.rate_limiter is not None
+                and mirror.requests_per_second is not None
+            ):
+                tokens_per_second = (
+                    mirror.requests_per_second / self._live_replica_count
+                )
+                mirror.health.rate_limiter.set_rate(
+                    tokens_per_second=tokens_per_second,
+                    bucket_size=tokens_per_second * 2,  # Allow small bursts
+                )
+
+    @property
+    def live_replica_count(self) -> int:
+        """The number of replicas (including this one) seen at the last sync."""
+        return self._live_replica_count
+
+    async def sync(self) -> None:
+        """Publish our view of mirror health, and merge in everyone else's."""
+        max_age_seconds = int(
+            self.sync_interval_seconds * REPORT_MAX_AGE_SYNC_INTERVALS,
+        )
+        try:
+            await self.store.publish(self._create_reports())
+            reports = await self.store.fetch_recent(max(max_age_seconds, 1))
+        except Exception:
+            self._failed_sync_count += 1
+            logging.exception("Failed to sync shared mirror health")
+            return None
+
+        self._merge(reports)
+        self._sync_count += 1
+        self._last_synced_at = time.time()
+
+    async def _run(self) -> None:
+        while True:
+            await self.sync()
+            await asyncio.sleep(self.sync_interval_seconds)
+
+    def start(self, mirrors: Sequence[AbstractBeatmapMirror]) -> None:
+        self._mirrors = mirrors
+        self._sync_task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except asyncio.CancelledError:
+                pass
+            self._sync_task = None
+
+    def get_stats(self) -> SharedMirrorHealthStats:
+        return SharedMirrorHealthStats(
+            replica_id=self.replica_id,
+            live_replica_count=self._live_replica_count,
+            syncs=self._sync_count,
+            failed_syncs=self._failed_sync_count,
+            last_synced_at=self._last_synced_at,
+        )
+
+
+def _create_store() -> SharedMirrorHealthStore | None:
+    match settings.MIRROR_HEALTH_SHARED_BACKEND:
+        case "mysql":
+            return MySQLSharedMirrorHealthStore()
+        case "memory":
+            return InMemorySharedMirrorHealthStore()
+        case "none":
+            return None
+        case _:
+            raise ValueError(
+                "Unknown MIRROR_HEALTH_SHARED_BACKEND: "
+                f"{settings.MIRROR_HEALTH_SHARED_BACKEND}",
+            )
+
+
+_shared_mirror_health_store = _create_store()
+
+# None if health is not shared between replicas
+shared_mirror_health = (
+    SharedMirrorHealth(
+        store=_shared_mirror_health_store,
+        replica_id=socket.gethostname(),
+        sync_interval_seconds=settings.MIRROR_HEALTH_SYNC_INTERVAL_SECONDS,
+    )
+    if _shared_mirror_health_store is not None
+    else None
+)
@@ -0,0 +1,87 @@
+"""\
+Helpers for HTTP conditional requests (RFC 9110 section 13).
+
+Responses carry validators (`ETag` and/or `Last-Modified`), which clients
+and caches send back in `If-None-Match` and `If-Modified-Since` headers to
+ask whether their copy of a resource is still current.
+"""
+
+import email.utils
+from datetime import datetime
+
+from fastapi import Response
+
+# For responses which may be stored, but must be revalidated before each use
+REVALIDATE_CACHE_CONTROL = "no-cache"
+# For responses whose content can never change at their url
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def format_etag(value: str) -> str:
+    return f'"{value}"'
+
+
+def format_http_date(unix_time: int) -> str:
+    return email.utils.formatdate(unix_time, usegmt=True)
+
+
+def _parse_http_date(value: str) -> datetime | None:
+    try:
+        return email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+
+    # If-None-Match uses weak comparison; ignore any weakness indicators
+    candidate_etags = {
+        candidate_etag.strip().removeprefix("W/")
+        for candidate_etag in if_none_match.split(",")
+    }
+    return etag.removeprefix("W/") in candidate_etags
+
+
+def is_not_modified(
+    *,
+    if_none_match: str | None,
+    if_modified_since: str | None,
+    etag: str | None = None,
+    last_modified: int | None = None,
+) -> bool:
+    """\
+    Determine whether the client's copy of a resource is still current.
+
+    `If-None-Match` takes precedence; `If-Modified-Since` is only
+    considered when the client didn't send an `If-None-Match` header.
+    """
+    if if_none_match is not None:
+        return etag is not None and _etag_matches(if_none_match, etag)
+
+    if if_modified_since is not None and last_modified is not None:
+        modified_since = _parse_http_date(if_modified_since)
+        return (
+            modified_since is not None and last_modified <= modified_since.timestamp()
+        )
+
+    return False
+
+
+def create_validator_headers(
+    *,
+    etag: str | None = None,
+    last_modified: int | None = None,
+    cache_control: str = REVALIDATE_CACHE_CONTROL,
+) -> dict[str, str]:
+    headers = {"Cache-Control": cache_control}
+    if etag is not None:
+        headers["ETag"] = etag
+    if last_modified is not None:
+        headers["Last-Modified"] = format_http_date(last_modified)
+    return headers
+
+
+def not_modified_response(headers: dict[str, str]) -> Response:
+    return Response(status_code=304, headers=headers)
@@ -4,6 +4,7 @@ from . import akatsuki
 from . import osu_api_v1
 from . import osu_api_v2
 from . import osu_assets
+from . import service_stats
 
 v1_router = APIRouter()
 
@@ -11,3 +12,4 @@ v1_router.include_router(akatsuki.router)
 v1_router.include_router(osu_api_v1.router)
 v1_router.include_router(osu_api_v2.router)
 v1_router.include_router(osu_assets.router)
+v1_router.include_router(service_stats.router)
@@ -8,17 +8,21 @@ import logging
 from fastapi import APIRouter
 from fastapi import Header
 from fastapi import Response
+from pydantic import BaseModel
 
 from app.api.responses import JSONResponse
 from app.usecases import akatsuki_beatmaps
 
 router = APIRouter(tags=["Akatsuki Beatmaps"])
 
+MAX_BATCH_LOOKUP_SIZE = 500
+
 
 @router.get("/api/akatsuki/v1/beatmaps/lookup")
 async def get_beatmap(
     beatmap_id: int | None = None,
     beatmap_md5: str | None = None,
+    fresh: bool = False,
     client_ip_address: str | None = Header(None, alias="X-Real-IP"),
     client_user_agent: str | None = Header(None, alias="User-Agent"),
 ) -> Response:
@@ -26,11 +30,11 @@ async def get_beatmap(
         return Response(status_code=400)
 
     if beatmap_id is not None:
-        beatmap = await akatsuki_beatmaps.fetch_one_by_id(beatmap_id)
+        beatmap = await akatsuki_beatmaps.fetch_one_by_id(beatmap_id, fresh=fresh)
         if beatmap is None:
             return Response(status_code=404)
     elif beatmap_md5 is not None:
-        beatmap = await akatsuki_beatmaps.fetch_one_by_md5(beatmap_md5)
+        beatmap = await akatsuki_beatmaps.fetch_one_by_md5(beatmap_md5, fresh=fresh)
         if beatmap is None:
             return Response(status_code=404)
     else:
@@ -46,3 +50,57 @@ async def get_beatmap(
     )
 
     return JSONResponse(content=beatmap.model_dump())
+
+
+class BeatmapBatchLookupRequest(BaseModel):
+    beatmap_ids: list[int] = []
+    beatmap_md5s: list[str] = []
+
+
+@router.post("/api/akatsuki/v1/beatmaps/lookup")
+async def get_beatmaps(
+    args: BeatmapBatchLookupRequest,
+    fresh: bool = False,
+    client_ip_address: str | None = Header(None, alias="X-Real-IP"),
+    client_user_agent: str | None = Header(None, alias="User-Agent"),
+) -> Response:
+    """\
+    Look up many beatmaps at once, by their ids and/or md5s.
+
+    Results are returned in the same order as they were requested,
+    with `null` in place of any beatmap which could not be found.
+
+    Pass `?fresh=1` to wait for any beatmaps due for an update to be
+    updated, rather than being served as they are.
+    """
+    if len(args.beatmap_ids) + len(args.beatmap_md5s) > MAX_BATCH_LOOKUP_SIZE:
+        return Response(status_code=400)
+
+    lookup = await akatsuki_beatmaps.fetch_many(
+        beatmap_ids=args.beatmap_ids,
+        beatmap_md5s=args.beatmap_md5s,
+        fresh=fresh,
+    )
+
+    logging.debug(
+        "Serving Akatsuki beatmaps",
+        extra={
+            "beatmap_ids": args.beatmap_ids,
+            "beatmap_md5s": args.beatmap_md5s,
+            "client_ip_address": client_ip_address,
+            "client_user_agent": client_user_agent,
+        },
+    )
+
+    return JSONResponse(
+        content={
+            "beatmap_ids": [
+                beatmap.model_dump() if beatmap is not None else None
+                for beatmap in map(lookup.by_id.get, args.beatmap_ids)
+            ],
+            "beatmap_md5s": [
+                beatmap.model_dump() if beatmap is not None else None
+                for beatmap in map(lookup.by_md5.get, args.beatmap_md5s)
+            ],
+        },
+    )
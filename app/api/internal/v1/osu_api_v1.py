@@ -1,21 +1,121 @@
+import io
+import zipfile
+
 from fastapi import APIRouter
+from fastapi import Header
 from fastapi import Response
 
+from app.api import conditional_requests
 from app.usecases import osu_files
 
 router = APIRouter(tags=["osu Files"])
 
 
 @router.get("/api/osu-api/v1/osu-files/{beatmap_id}")
-async def download_beatmap_osu_file(beatmap_id: int) -> Response:
+async def download_beatmap_osu_file(
+    beatmap_id: int,
+    if_none_match: str | None = Header(None, alias="If-None-Match"),
+    if_modified_since: str | None = Header(None, alias="If-Modified-Since"),
+) -> Response:
+    osu_file_validators = await osu_files.fetch_beatmap_osu_file_validators(
+        beatmap_id,
+    )
+    if osu_file_validators is not None:
+        validator_headers = conditional_requests.create_validator_headers(
+            etag=conditional_requests.format_etag(osu_file_validators.beatmap_md5),
+            last_modified=osu_file_validators.latest_update,
+        )
+        if conditional_requests.is_not_modified(
+            if_none_match=if_none_match,
+            if_modified_since=if_modified_since,
+            etag=validator_headers["ETag"],
+            last_modified=osu_file_validators.latest_update,
+        ):
+            return conditional_requests.not_modified_response(validator_headers)
+
     beatmap_osu_file_data = await osu_files.fetch_beatmap_osu_file_data(beatmap_id)
     if beatmap_osu_file_data is None:
         return Response(status_code=404)
 
+    # The file may have been refreshed since we read the database;
+    # make sure the validators describe what we're actually sending
+    beatmap_md5 = osu_files.hash_content(beatmap_osu_file_data)
+    headers = conditional_requests.create_validator_headers(
+        etag=conditional_requests.format_etag(beatmap_md5),
+        last_modified=(
+            osu_file_validators.latest_update
+            if (
+                osu_file_validators is not None
+                and osu_file_validators.beatmap_md5 == beatmap_md5
+            )
+            else None
+        ),
+    )
+    headers["Content-Disposition"] = f"attachment; filename={beatmap_id}.osu"
+
     return Response(
         beatmap_osu_file_data,
         media_type="application/octet-stream",
+        headers=headers,
+    )
+
+
+@router.get("/api/osu-api/v1/osu-files/md5/{beatmap_md5}")
+async def download_beatmap_osu_file_by_md5(
+    beatmap_md5: str,
+    if_none_match: str | None = Header(None, alias="If-None-Match"),
+) -> Response:
+    # The content at this url can never change, so any copy is current
+    headers = conditional_requests.create_validator_headers(
+        etag=conditional_requests.format_etag(beatmap_md5),
+        cache_control=conditional_requests.IMMUTABLE_CACHE_CONTROL,
+    )
+    if conditional_requests.is_not_modified(
+        if_none_match=if_none_match,
+        if_modified_since=None,
+        etag=headers["ETag"],
+    ):
+        return conditional_requests.not_modified_response(headers)
+
+    beatmap_osu_file_data = await osu_files.fetch_beatmap_osu_file_data_by_md5(
+        beatmap_md5,
+    )
+    if beatmap_osu_file_data is None:
+        return Response(status_code=404)
+
+    headers["Content-Disposition"] = f"attachment; filename={beatmap_md5}.osu"
+    return Response(
+        beatmap_osu_file_data,
+        media_type="application/octet-stream",
+        headers=headers,
+    )
+
+
+def _create_osu_file_bundle(osu_files: dict[int, bytes]) -> bytes:
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_DEFLATED) as bundle:
+        for beatmap_id, beatmap_osu_file_data in sorted(osu_files.items()):
+            bundle.writestr(f"{beatmap_id}.osu", beatmap_osu_file_data)
+    return output.getvalue()
+
+
+@router.get("/api/osu-api/v1/beatmapsets/{beatmapset_id}/osu-files")
+async def download_beatmapset_osu_files(beatmapset_id: int) -> Response:
+    """\
+    Download the .osu files of every beatmap in a set, as a zip archive.
+
+    Each file is named by its beatmap id (e.g. `123.osu`).
+    """
+    osu_files_by_beatmap_id = await osu_files.fetch_beatmapset_osu_files(
+        beatmapset_id,
+    )
+    if not osu_files_by_beatmap_id:
+        return Response(status_code=404)
+
+    return Response(
+        _create_osu_file_bundle(osu_files_by_beatmap_id),
+        media_type="application/zip",
         headers={
-            "Content-Disposition": f"attachment; filename={beatmap_id}.osu",
+            "Content-Disposition": f"attachment; filename={beatmapset_id}-osu-files.zip",
         },
     )
@@ -2,23 +2,69 @@ import logging
 
 from fastapi import APIRouter
 from fastapi import Header
+from fastapi import Query
 from fastapi import Response
+from fastapi.responses import StreamingResponse
 
-from app.adapters import osu_mirrors
+from app.api import conditional_requests
+from app.image_processing import ImageFormat
+from app.usecases import audio_files
+from app.usecases import background_images
+from app.usecases.audio_files import AudioFileStream
+from app.usecases.background_images import BackgroundImageVariant
 
 router = APIRouter(tags=["osu! Media Assets"])
 
+# Backgrounds rarely change, so downstream caches may hold them for a day
+BACKGROUND_IMAGE_CACHE_CONTROL = "public, max-age=86400"
+AUDIO_FILE_CACHE_CONTROL = "public, max-age=86400"
+
 
 @router.get("/api/osu-assets/backgrounds/{beatmap_id}")
 async def get_beatmap_background(
     beatmap_id: int,
     client_ip_address: str | None = Header(None, alias="X-Real-IP"),
     client_user_agent: str | None = Header(None, alias="User-Agent"),
+    if_none_match: str | None = Header(None, alias="If-None-Match"),
+    if_modified_since: str | None = Header(None, alias="If-Modified-Since"),
+    w: int | None = None,
+    h: int | None = None,
+    image_format: ImageFormat | None = Query(None, alias="format"),
 ) -> Response:
-    background_image_data = await osu_mirrors.fetch_beatmap_background_image(beatmap_id)
-    if background_image_data is None:
+    if w is None and h is None and image_format is None:
+        background_image = await background_images.fetch_beatmap_background_image(
+            beatmap_id,
+        )
+    else:
+        variant = BackgroundImageVariant(
+            max_width=w,
+            max_height=h,
+            image_format=image_format or ImageFormat.JPEG,
+        )
+        if not variant.is_allowed:
+            return Response(status_code=400)
+
+        background_image = (
+            await background_images.fetch_beatmap_background_image_variant(
+                beatmap_id,
+                variant,
+            )
+        )
+
+    if background_image is None:
         return Response(status_code=404)
 
+    headers = conditional_requests.create_validator_headers(
+        etag=conditional_requests.format_etag(background_image.etag),
+        cache_control=BACKGROUND_IMAGE_CACHE_CONTROL,
+    )
+    if conditional_requests.is_not_modified(
+        if_none_match=if_none_match,
+        if_modified_since=if_modified_since,
+        etag=headers["ETag"],
+    ):
+        return conditional_requests.not_modified_response(headers)
+
     logging.debug(
         "Serving osu! API v2 background",
         extra={
@@ -28,4 +74,64 @@ async def get_beatmap_background(
         },
     )
 
-    return Response(background_image_data, media_type="image/jpeg")
+    return Response(
+        background_image.data,
+        media_type=background_image.media_type,
+        headers=headers,
+    )
+
+
+def _audio_file_response(audio_file_stream: AudioFileStream) -> Response:
+    headers = {"Cache-Control": AUDIO_FILE_CACHE_CONTROL}
+    if audio_file_stream.content_length is not None:
+        headers["Content-Length"] = str(audio_file_stream.content_length)
+
+    return StreamingResponse(
+        audio_file_stream.chunks,
+        media_type=audio_file_stream.media_type,
+        headers=headers,
+    )
+
+
+@router.get("/api/osu-assets/audio/{beatmap_id}")
+async def get_beatmap_audio(
+    beatmap_id: int,
+    client_ip_address: str | None = Header(None, alias="X-Real-IP"),
+    client_user_agent: str | None = Header(None, alias="User-Agent"),
+) -> Response:
+    audio_file_stream = await audio_files.stream_beatmap_audio_file(beatmap_id)
+    if audio_file_stream is None:
+        return Response(status_code=404)
+
+    logging.debug(
+        "Serving beatmap audio",
+        extra={
+            "beatmap_id": beatmap_id,
+            "client_ip_address": client_ip_address,
+            "client_user_agent": client_user_agent,
+        },
+    )
+
+    return _audio_file_response(audio_file_stream)
+
+
+@router.get("/api/osu-assets/audio-previews/{beatmap_id}")
+async def get_beatmap_audio_preview(
+    beatmap_id: int,
+    client_ip_address: str | None = Header(None, alias="X-Real-IP"),
+    client_user_agent: str | None = Header(None, alias="User-Agent"),
+) -> Response:
+    audio_file_stream = await audio_files.stream_beatmap_audio_preview(beatmap_id)
+    if audio_file_stream is None:
+        return Response(status_code=404)
+
+    logging.debug(
+        "Serving beatmap audio preview",
+        extra={
+            "beatmap_id": beatmap_id,
+            "client_ip_address": client_ip_address,
+            "client_user_agent": client_user_agent,
+        },
+    )
+
+    return _audio_file_response(audio_file_stream)
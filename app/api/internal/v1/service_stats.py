@@ -0,0 +1,97 @@
+"""\
+Provides an API exposing the internal state of this service,
+to help understand its behaviour from the outside.
+"""
+
+from fastapi import APIRouter
+from fastapi import Response
+
+from app import request_coalescing
+from app.adapters import osu_mirrors
+from app.adapters.http_clients import http_client_manager
+from app.adapters.osu_mirrors.request_log import mirror_request_log
+from app.adapters.osu_mirrors.shared_health import shared_mirror_health
+from app.api.responses import JSONResponse
+from app.repositories import akatsuki_beatmaps
+from app.usecases import background_images
+from app.usecases.osz_prefetching import osz_prefetcher
+
+router = APIRouter(tags=["Service Stats"])
+
+
+@router.get("/api/service-stats/v1/request-coalescing")
+async def get_request_coalescing_stats() -> Response:
+    return JSONResponse(
+        content={
+            "in_flight_calls": request_coalescing.get_in_flight_call_count(),
+            "upstreams": {
+                upstream: stats.model_dump()
+                for upstream, stats in request_coalescing.get_stats().items()
+            },
+        },
+    )
+
+
+@router.get("/api/service-stats/v1/mirrors")
+async def get_mirror_stats() -> Response:
+    return JSONResponse(
+        content=[
+            mirror_stats.model_dump(mode="json")
+            for mirror_stats in osu_mirrors.get_mirror_stats()
+        ],
+    )
+
+
+@router.get("/api/service-stats/v1/mirror-request-log")
+async def get_mirror_request_log_stats() -> Response:
+    return JSONResponse(content=mirror_request_log.get_stats().model_dump())
+
+
+@router.get("/api/service-stats/v1/shared-mirror-health")
+async def get_shared_mirror_health_stats() -> Response:
+    if shared_mirror_health is None:
+        return JSONResponse(content=None)
+    return JSONResponse(content=shared_mirror_health.get_stats().model_dump())
+
+
+@router.get("/api/service-stats/v1/osz-prefetching")
+async def get_osz_prefetching_stats() -> Response:
+    return JSONResponse(content=osz_prefetcher.get_stats().model_dump())
+
+
+@router.get("/api/service-stats/v1/background-image-cache")
+async def get_background_image_cache_stats() -> Response:
+    return JSONResponse(
+        content={
+            "images": (
+                background_images.BACKGROUND_IMAGE_MEMORY_CACHE.get_stats().model_dump()
+            ),
+            "variants": (
+                background_images.BACKGROUND_IMAGE_VARIANT_MEMORY_CACHE.get_stats().model_dump()
+            ),
+        },
+    )
+
+
+@router.get("/api/service-stats/v1/akatsuki-beatmap-cache")
+async def get_akatsuki_beatmap_cache_stats() -> Response:
+    return JSONResponse(
+        content={
+            "beatmaps": (
+                akatsuki_beatmaps.AKATSUKI_BEATMAP_MEMORY_CACHE.get_stats().model_dump()
+            ),
+            "md5_index": (
+                akatsuki_beatmaps.AKATSUKI_BEATMAP_ID_BY_MD5_MEMORY_CACHE.get_stats().model_dump()
+            ),
+        },
+    )
+
+
+@router.get("/api/service-stats/v1/http-clients")
+async def get_http_client_stats() -> Response:
+    return JSONResponse(
+        content=[
+            http_client_stats.model_dump()
+            for http_client_stats in http_client_manager.get_stats()
+        ],
+    )
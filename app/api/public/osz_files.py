@@ -1,21 +1,141 @@
 from fastapi import APIRouter
+from fastapi import Header
 from fastapi import Response
+from fastapi.responses import StreamingResponse
 
-from app.adapters import osu_mirrors
+from app.api import conditional_requests
+from app.byte_ranges import parse_range_header
+from app.usecases import osz_files
+from app.usecases.osz_files import OszFileMetadata
+from app.usecases.osz_files import UnsatisfiableRange
 
 router = APIRouter(tags=["(Public) osz Files"])
 
 
+def _osz_file_headers(
+    beatmapset_id: int,
+    cached_metadata: OszFileMetadata | None,
+) -> dict[str, str]:
+    headers = conditional_requests.create_validator_headers(
+        etag=(
+            conditional_requests.format_etag(cached_metadata.etag)
+            if cached_metadata is not None
+            else None
+        ),
+        last_modified=(
+            cached_metadata.last_modified if cached_metadata is not None else None
+        ),
+    )
+    headers["Content-Disposition"] = f"attachment; filename={beatmapset_id}.osz"
+    headers["Accept-Ranges"] = "bytes"
+    return headers
+
+
 @router.get("/public/api/d/{beatmapset_id}")
-async def download_beatmapset_osz(beatmapset_id: int) -> Response:
-    beatmap_zip_data = await osu_mirrors.fetch_beatmap_zip_data(beatmapset_id)
-    if beatmap_zip_data is not None:
-        return Response(
-            beatmap_zip_data,
+async def download_beatmapset_osz(
+    beatmapset_id: int,
+    range_header: str | None = Header(default=None, alias="Range"),
+    if_range_header: str | None = Header(default=None, alias="If-Range"),
+    if_none_match: str | None = Header(default=None, alias="If-None-Match"),
+    if_modified_since: str | None = Header(default=None, alias="If-Modified-Since"),
+) -> Response:
+    # Archives streamed from a mirror have no validators; only the cached
+    # copy's are stable, as mirrors may repackage sets at any time
+    cached_metadata = await osz_files.fetch_cached_beatmapset_osz_file_metadata(
+        beatmapset_id,
+    )
+    headers = _osz_file_headers(beatmapset_id, cached_metadata)
+    if conditional_requests.is_not_modified(
+        if_none_match=if_none_match,
+        if_modified_since=if_modified_since,
+        etag=headers.get("ETag"),
+        last_modified=(
+            cached_metadata.last_modified if cached_metadata is not None else None
+        ),
+    ):
+        return conditional_requests.not_modified_response(headers)
+
+    # Resume a partial download only if the client's part is still current;
+    # an `If-Range` must exactly match our `ETag` or `Last-Modified`
+    byte_range = None
+    if if_range_header is None or if_range_header in (
+        headers.get("ETag"),
+        headers.get("Last-Modified"),
+    ):
+        byte_range = parse_range_header(range_header)
+
+    beatmap_zip_stream = await osz_files.stream_beatmapset_osz_file(
+        beatmapset_id,
+        byte_range=byte_range,
+    )
+    if beatmap_zip_stream is None:
+        return Response(status_code=404)
+
+    if isinstance(beatmap_zip_stream, UnsatisfiableRange):
+        headers["Content-Range"] = f"bytes */{beatmap_zip_stream.total_size}"
+        return Response(status_code=416, headers=headers)
+
+    if beatmap_zip_stream.content_length is not None:
+        headers["Content-Length"] = str(beatmap_zip_stream.content_length)
+
+    status_code = 200
+    if beatmap_zip_stream.content_range is not None:
+        status_code = 206
+        headers["Content-Range"] = beatmap_zip_stream.content_range.to_header_value()
+
+    return StreamingResponse(
+        beatmap_zip_stream.chunks,
+        status_code=status_code,
+        media_type="application/octet-stream",
+        headers=headers,
+    )
+
+
+@router.head("/public/api/d/{beatmapset_id}")
+async def head_beatmapset_osz(
+    beatmapset_id: int,
+    if_none_match: str | None = Header(default=None, alias="If-None-Match"),
+    if_modified_since: str | None = Header(default=None, alias="If-Modified-Since"),
+) -> Response:
+    cached_metadata = await osz_files.fetch_cached_beatmapset_osz_file_metadata(
+        beatmapset_id,
+    )
+    headers = _osz_file_headers(beatmapset_id, cached_metadata)
+    if cached_metadata is None:
+        # Find the set as a GET would, so that HEAD reports the same
+        # availability & size; the archive has no validators until cached
+        mirror_metadata = await osz_files.fetch_mirrored_beatmapset_osz_file_metadata(
+            beatmapset_id,
+        )
+        if mirror_metadata is None:
+            return Response(status_code=404)
+
+        response = Response(
+            status_code=200,
             media_type="application/octet-stream",
-            headers={
-                "Content-Disposition": f"attachment; filename={beatmapset_id}.osz",
-            },
+            headers=headers,
         )
+        if mirror_metadata.content_length is not None:
+            response.headers["Content-Length"] = str(
+                mirror_metadata.content_length,
+            )
+        else:
+            # Rather than the length of the (empty) body we're sending
+            del response.headers["Content-Length"]
+        return response
+
+    if conditional_requests.is_not_modified(
+        if_none_match=if_none_match,
+        if_modified_since=if_modified_since,
+        etag=headers["ETag"],
+        last_modified=cached_metadata.last_modified,
+    ):
+        return conditional_requests.not_modified_response(headers)
+
+    headers["Content-Length"] = str(cached_metadata.content_length)
 
-    return Response(status_code=404)
+    return Response(
+        status_code=200,
+        media_type="application/octet-stream",
+        headers=headers,
+    )
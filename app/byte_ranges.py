@@ -0,0 +1,108 @@
+"""\
+Parsing & formatting of HTTP byte ranges (RFC 9110 section 14).
+
+Only single ranges are supported; requests for multiple ranges are
+treated as though no range was requested, which the RFC permits.
+"""
+
+import re
+from dataclasses import dataclass
+
+# (ASCII only, as `\d` would otherwise match any unicode digit)
+RANGE_HEADER_PATTERN = re.compile(r"bytes=(\d*)-(\d*)", re.ASCII)
+CONTENT_RANGE_HEADER_PATTERN = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)", re.ASCII)
+
+
+@dataclass(frozen=True)
+class ByteRange:
+    """A single range of bytes, as requested by a `Range` header."""
+
+    # None for a suffix range (the final `last_byte` bytes)
+    first_byte: int | None
+    # Inclusive; None for an open-ended range (through to the end)
+    last_byte: int | None
+
+    @property
+    def starts_at_beginning(self) -> bool:
+        return self.first_byte == 0
+
+    def to_header_value(self) -> str:
+        first_byte = "" if self.first_byte is None else str(self.first_byte)
+        last_byte = "" if self.last_byte is None else str(self.last_byte)
+        return f"bytes={first_byte}-{last_byte}"
+
+    def resolve(self, total_size: int) -> tuple[int, int] | None:
+        """\
+        Resolve the range to inclusive (start, end) offsets within a body.
+
+        Returns None if the range cannot be satisfied for the body's size.
+        """
+        if self.first_byte is None:
+            assert self.last_byte is not None
+            if self.last_byte == 0 or total_size == 0:
+                return None
+            return max(total_size - self.last_byte, 0), total_size - 1
+
+        if self.first_byte >= total_size:
+            return None
+
+        last_byte = total_size - 1
+        if self.last_byte is not None:
+            last_byte = min(self.last_byte, last_byte)
+        return self.first_byte, last_byte
+
+
+@dataclass(frozen=True)
+class ContentRange:
+    """The range of bytes contained within a partial response."""
+
+    start: int
+    end: int  # inclusive
+    total_size: int | None
+
+    @property
+    def length(self) -> int:
+        return self.end - self.start + 1
+
+    def to_header_value(self) -> str:
+        total_size = "*" if self.total_size is None else str(self.total_size)
+        return f"bytes {self.start}-{self.end}/{total_size}"
+
+
+def parse_range_header(header_value: str | None) -> ByteRange | None:
+    if header_value is None:
+        return None
+
+    match = RANGE_HEADER_PATTERN.fullmatch(header_value.strip())
+    if match is None:
+        return None
+
+    raw_first_byte, raw_last_byte = match.groups()
+    if not raw_first_byte and not raw_last_byte:
+        return None
+
+    first_byte = int(raw_first_byte) if raw_first_byte else None
+    last_byte = int(raw_last_byte) if raw_last_byte else None
+    if first_byte is not None and last_byte is not None and last_byte < first_byte:
+        return None
+
+    return ByteRange(first_byte=first_byte, last_byte=last_byte)
+
+
+def parse_content_range_header(header_value: str | None) -> ContentRange | None:
+    if header_value is None:
+        return None
+
+    match = CONTENT_RANGE_HEADER_PATTERN.fullmatch(header_value.strip())
+    if match is None:
+        return None
+
+    raw_start, raw_end, raw_total_size = match.groups()
+    start = int(raw_start)
+    end = int(raw_end)
+    total_size = None if raw_total_size == "*" else int(raw_total_size)
+    # These come from upstream; don't pass on a range which can't be right
+    if end < start or (total_size is not None and end >= total_size):
+        return None
+
+    return ContentRange(start=start, end=end, total_size=total_size)
@@ -0,0 +1,106 @@
+"""\
+Resizing & re-encoding of images.
+
+Image processing is CPU-bound, so it runs in a pool of worker processes
+rather than on the event loop.
+"""
+
+import asyncio
+import functools
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from enum import StrEnum
+
+from PIL import Image
+
+from app import settings
+
+JPEG_QUALITY = 85
+WEBP_QUALITY = 80
+
+
+class ImageFormat(StrEnum):
+    JPEG = "jpeg"
+    WEBP = "webp"
+
+    @property
+    def media_type(self) -> str:
+        return f"image/{self.value}"
+
+
+PROCESS_POOL: ProcessPoolExecutor | None = None
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global PROCESS_POOL
+    if PROCESS_POOL is None:
+        PROCESS_POOL = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_PROCESSING_MAX_WORKERS,
+            # Forking a process with a running event loop is asking for trouble
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return PROCESS_POOL
+
+
+# Errors PIL raises for data which isn't a (whole, sane) image; e.g.
+# UnidentifiedImageError, truncated files, and decompression bombs
+IMAGE_DECODE_ERRORS = (OSError, SyntaxError, ValueError, Image.DecompressionBombError)
+
+
+def _resize_image(
+    image_data: bytes,
+    *,
+    max_width: int | None,
+    max_height: int | None,
+    image_format: ImageFormat,
+) -> bytes | None:
+    try:
+        with Image.open(io.BytesIO(image_data)) as image:
+            resized_image = image.convert("RGB")
+            # Preserves the aspect ratio, and never enlarges the image
+            resized_image.thumbnail(
+                (max_width or resized_image.width, max_height or resized_image.height),
+                Image.Resampling.LANCZOS,
+            )
+
+            output = io.BytesIO()
+            if image_format is ImageFormat.JPEG:
+                resized_image.save(output, format="JPEG", quality=JPEG_QUALITY)
+            else:
+                resized_image.save(output, format="WEBP", quality=WEBP_QUALITY)
+            return output.getvalue()
+    except IMAGE_DECODE_ERRORS:
+        return None
+
+
+async def resize_image(
+    image_data: bytes,
+    *,
+    max_width: int | None,
+    max_height: int | None,
+    image_format: ImageFormat,
+) -> bytes | None:
+    """\
+    Scale an image down to fit within the given bounds, and re-encode it.
+
+    Returns None if the data could not be decoded as an image.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_process_pool(),
+        functools.partial(
+            _resize_image,
+            image_data,
+            max_width=max_width,
+            max_height=max_height,
+            image_format=image_format,
+        ),
+    )
+
+
+def shutdown() -> None:
+    global PROCESS_POOL
+    if PROCESS_POOL is not None:
+        PROCESS_POOL.shutdown(cancel_futures=True)
+        PROCESS_POOL = None
@@ -9,11 +9,18 @@ from fastapi import Request
 from fastapi import Response
 from starlette.middleware.base import RequestResponseEndpoint
 
+from app import image_processing
 from app import logger
 from app import settings
 from app import state
 from app.adapters import mysql
+from app.adapters import osu_mirrors
+from app.adapters.http_clients import http_client_manager
+from app.adapters.osu_mirrors.request_log import mirror_request_log
+from app.adapters.osu_mirrors.scoreboard import mirror_scoreboard
+from app.adapters.osu_mirrors.shared_health import shared_mirror_health
 from app.api import api_router
+from app.usecases.osz_prefetching import osz_prefetcher
 
 
 @asynccontextmanager
@@ -31,9 +38,26 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     )
     state.s3_client = await s3_client.__aenter__()
 
+    await http_client_manager.start()
+
+    try:
+        await mirror_scoreboard.seed()
+    except Exception:
+        logging.exception("Failed to seed mirror scoreboard; starting from empty")
+    mirror_request_log.start()
+    osz_prefetcher.start()
+    if shared_mirror_health is not None:
+        shared_mirror_health.start(osu_mirrors.BEATMAP_MIRRORS)
+
     yield
+    await osz_prefetcher.stop()
+    if shared_mirror_health is not None:
+        await shared_mirror_health.stop()
+    await mirror_request_log.stop()
+    await http_client_manager.aclose()
     await state.s3_client.__aexit__(None, None, None)
     await state.database.disconnect()
+    image_processing.shutdown()
 
 
 def init_routes(app: FastAPI) -> FastAPI:
@@ -0,0 +1,107 @@
+"""\
+A size-bounded, least-recently-used in-memory cache.
+
+Each entry's size is measured by a function given to the cache (e.g. `len`
+for bytes, or a constant 1 to bound the number of entries), and the least
+recently used entries are evicted once the total size exceeds the limit.
+"""
+
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from collections.abc import Hashable
+from dataclasses import dataclass
+from typing import Generic
+from typing import TypeVar
+
+from pydantic import BaseModel
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class MemoryCacheStats(BaseModel):
+    entries: int
+    size: int
+    max_size: int
+    hits: int
+    misses: int
+    evictions: int
+
+
+@dataclass
+class _CacheEntry(Generic[V]):
+    value: V
+    size: int
+    expires_at: float | None
+
+
+class LRUCache(Generic[K, V]):
+    def __init__(
+        self,
+        *,
+        max_size: int,
+        size_func: Callable[[V], int],
+        ttl_seconds: float | None = None,
+    ) -> None:
+        self.max_size = max_size
+        self.size_func = size_func
+        self.ttl_seconds = ttl_seconds
+
+        self._entries: OrderedDict[K, _CacheEntry[V]] = OrderedDict()
+        self._size = 0
+
+        self._hit_count = 0
+        self._miss_count = 0
+        self._eviction_count = 0
+
+    def get(self, key: K) -> V | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self._miss_count += 1
+            return None
+
+        if entry.expires_at is not None and entry.expires_at <= time.time():
+            self.delete(key)
+            self._miss_count += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self._hit_count += 1
+        return entry.value
+
+    def set(self, key: K, value: V) -> None:
+        size = self.size_func(value)
+        if size > self.max_size:
+            # Would evict everything else, and then itself
+            return None
+
+        self.delete(key)
+        self._entries[key] = _CacheEntry(
+            value=value,
+            size=size,
+            expires_at=(
+                time.time() + self.ttl_seconds if self.ttl_seconds is not None else None
+            ),
+        )
+        self._size += size
+
+        while self._size > self.max_size:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= evicted.size
+            self._eviction_count += 1
+
+    def delete(self, key: K) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry.size
+
+    def get_stats(self) -> MemoryCacheStats:
+        return MemoryCacheStats(
+            entries=len(self._entries),
+            size=self._size,
+            max_size=self.max_size,
+            hits=self._hit_count,
+            misses=self._miss_count,
+            evictions=self._eviction_count,
+        )
@@ -1,11 +1,35 @@
+import time
+from collections.abc import Iterable
 from datetime import datetime
 from datetime import timedelta
+from typing import Any
 
+from databases.interfaces import Record
 from pydantic import BaseModel
 
+from app import settings
 from app import state
 from app.common_models import GameMode
 from app.common_models import RankedStatus
+from app.memory_cache import LRUCache
+
+
+def get_update_interval(ranked_status: RankedStatus) -> timedelta:
+    """How long a beatmap with this status may go before it's updated from osu!."""
+    match ranked_status:
+        case RankedStatus.QUALIFIED:
+            return timedelta(minutes=5)
+        case RankedStatus.PENDING:
+            return timedelta(minutes=10)
+        case RankedStatus.LOVED:
+            # loved maps can *technically* be updated
+            return timedelta(days=1)
+        case RankedStatus.RANKED | RankedStatus.APPROVED:
+            # in very rare cases, the osu! team has updated ranked/appvoed maps
+            # this is usually done to remove things like inappropriate content
+            return timedelta(days=1)
+        case _:
+            raise NotImplementedError(f"Unknown ranked status: {ranked_status}")
 
 
 class AkatsukiBeatmap(BaseModel):
@@ -36,21 +60,7 @@ class AkatsukiBeatmap(BaseModel):
 
     @property
     def deserves_update(self) -> bool:
-        match self.ranked:
-            case RankedStatus.QUALIFIED:
-                update_interval = timedelta(minutes=5)
-            case RankedStatus.PENDING:
-                update_interval = timedelta(minutes=10)
-            case RankedStatus.LOVED:
-                # loved maps can *technically* be updated
-                update_interval = timedelta(days=1)
-            case RankedStatus.RANKED | RankedStatus.APPROVED:
-                # in very rare cases, the osu! team has updated ranked/appvoed maps
-                # this is usually done to remove things like inappropriate content
-                update_interval = timedelta(days=1)
-            case _:
-                raise NotImplementedError(f"Unknown ranked status: {self.ranked}")
-
+        update_interval = get_update_interval(self.ranked)
         last_updated = datetime.fromtimestamp(self.latest_update)
         return last_updated <= (datetime.now() - update_interval)
 
@@ -67,164 +77,348 @@ class AkatsukiBeatmap(BaseModel):
         return f"[{self.url} {self.song_name}]"
 
 
+AKATSUKI_BEATMAP_FIELDS = tuple(AkatsukiBeatmap.model_fields)
+# Columns are selected explicitly, in the model's field order,
+# so that rows can be mapped to models by position.
+AKATSUKI_BEATMAP_COLUMNS = ", ".join(AKATSUKI_BEATMAP_FIELDS)
+
+
+def _deserialize(values: Iterable[Any]) -> AkatsukiBeatmap:
+    """\
+    Build a beatmap from its field values, in `AKATSUKI_BEATMAP_FIELDS` order.
+
+    This is the single mapping from database rows (and memory cache entries)
+    to models. Validating a whole dict in one call is done by pydantic-core,
+    and is far cheaper than passing fields as keyword arguments - or even
+    than `model_construct`, which skips validation but runs in python.
+    """
+    return AkatsukiBeatmap.model_validate(dict(zip(AKATSUKI_BEATMAP_FIELDS, values)))
+
+
+def _deserialize_record(rec: Record) -> AkatsukiBeatmap:
+    # Reading the row's values at once is much cheaper than column by column
+    return _deserialize(rec._mapping.values())
+
+
+def _count_entry(_: object) -> int:
+    return 1
+
+
+# Beatmaps are cached by id, as plain tuples of their field values; these take
+# far less memory than models, and are rebuilt like database rows on hits.
+# Other replicas (and akatsuki's other services) may change beatmaps too, so
+# entries are only trusted for a short while.
+AKATSUKI_BEATMAP_MEMORY_CACHE: LRUCache[int, tuple[Any, ...]] = LRUCache(
+    max_size=settings.AKATSUKI_BEATMAP_MEMORY_CACHE_MAX_ENTRIES,
+    size_func=_count_entry,
+    ttl_seconds=settings.AKATSUKI_BEATMAP_MEMORY_CACHE_TTL_SECONDS,
+)
+# A secondary index from md5 to id; entries are checked against
+# the primary cache when used, so they may safely go stale.
+AKATSUKI_BEATMAP_ID_BY_MD5_MEMORY_CACHE: LRUCache[str, int] = LRUCache(
+    max_size=settings.AKATSUKI_BEATMAP_MEMORY_CACHE_MAX_ENTRIES,
+    size_func=_count_entry,
+    ttl_seconds=settings.AKATSUKI_BEATMAP_MEMORY_CACHE_TTL_SECONDS,
+)
+
+
+def _get_cached_by_id(beatmap_id: int) -> AkatsukiBeatmap | None:
+    cache_entry = AKATSUKI_BEATMAP_MEMORY_CACHE.get(beatmap_id)
+    if cache_entry is None:
+        return None
+
+    beatmap = _deserialize(cache_entry)
+    if beatmap.deserves_update:
+        # Another replica may have updated it already; check the database
+        AKATSUKI_BEATMAP_MEMORY_CACHE.delete(beatmap_id)
+        return None
+
+    return beatmap
+
+
+def _get_cached_by_md5(beatmap_md5: str) -> AkatsukiBeatmap | None:
+    beatmap_id = AKATSUKI_BEATMAP_ID_BY_MD5_MEMORY_CACHE.get(beatmap_md5)
+    if beatmap_id is None:
+        return None
+
+    beatmap = _get_cached_by_id(beatmap_id)
+    if beatmap is None or beatmap.beatmap_md5 != beatmap_md5:
+        AKATSUKI_BEATMAP_ID_BY_MD5_MEMORY_CACHE.delete(beatmap_md5)
+        return None
+
+    return beatmap
+
+
+def _cache(beatmap: AkatsukiBeatmap) -> None:
+    AKATSUKI_BEATMAP_MEMORY_CACHE.set(
+        beatmap.beatmap_id,
+        tuple(getattr(beatmap, field) for field in AKATSUKI_BEATMAP_FIELDS),
+    )
+    AKATSUKI_BEATMAP_ID_BY_MD5_MEMORY_CACHE.set(beatmap.beatmap_md5, beatmap.beatmap_id)
+
+
+def _uncache(beatmap_md5: str, beatmap_id: int | None) -> None:
+    # The md5 index may have evicted its entry before the id cache did,
+    # so it's only relied upon to find the id when we weren't given it
+    if beatmap_id is None:
+        beatmap_id = AKATSUKI_BEATMAP_ID_BY_MD5_MEMORY_CACHE.get(beatmap_md5)
+    if beatmap_id is not None:
+        AKATSUKI_BEATMAP_MEMORY_CACHE.delete(beatmap_id)
+    AKATSUKI_BEATMAP_ID_BY_MD5_MEMORY_CACHE.delete(beatmap_md5)
+
+
 async def fetch_one_by_md5(beatmap_md5: str, /) -> AkatsukiBeatmap | None:
-    query = """\
-        SELECT * FROM beatmaps WHERE beatmap_md5 = :beatmap_md5
+    beatmap = _get_cached_by_md5(beatmap_md5)
+    if beatmap is not None:
+        return beatmap
+
+    query = f"""\
+        SELECT {AKATSUKI_BEATMAP_COLUMNS} FROM beatmaps
+        WHERE beatmap_md5 = :beatmap_md5
     """
     rec = await state.database.fetch_one(query, {"beatmap_md5": beatmap_md5})
     if rec is None:
         return None
-    return AkatsukiBeatmap(
-        beatmap_id=rec["beatmap_id"],
-        beatmapset_id=rec["beatmapset_id"],
-        beatmap_md5=rec["beatmap_md5"],
-        song_name=rec["song_name"],
-        file_name=rec["file_name"],
-        ar=rec["ar"],
-        od=rec["od"],
-        mode=rec["mode"],
-        max_combo=rec["max_combo"],
-        hit_length=rec["hit_length"],
-        bpm=rec["bpm"],
-        ranked=rec["ranked"],
-        latest_update=rec["latest_update"],
-        ranked_status_freezed=rec["ranked_status_freezed"],
-        playcount=rec["playcount"],
-        passcount=rec["passcount"],
-        rankedby=rec["rankedby"],
-        rating=rec["rating"],
-        bancho_ranked_status=rec["bancho_ranked_status"],
-        count_circles=rec["count_circles"],
-        count_spinners=rec["count_spinners"],
-        count_sliders=rec["count_sliders"],
-        bancho_creator_id=rec["bancho_creator_id"],
-        bancho_creator_name=rec["bancho_creator_name"],
-    )
+    beatmap = _deserialize_record(rec)
+    _cache(beatmap)
+    return beatmap
 
 
 async def fetch_one_by_id(beatmap_id: int, /) -> AkatsukiBeatmap | None:
-    query = """\
-        SELECT * FROM beatmaps WHERE beatmap_id = :beatmap_id
+    beatmap = _get_cached_by_id(beatmap_id)
+    if beatmap is not None:
+        return beatmap
+
+    query = f"""\
+        SELECT {AKATSUKI_BEATMAP_COLUMNS} FROM beatmaps
+        WHERE beatmap_id = :beatmap_id
     """
     rec = await state.database.fetch_one(query, {"beatmap_id": beatmap_id})
     if rec is None:
         return None
-    return AkatsukiBeatmap(
-        beatmap_id=rec["beatmap_id"],
-        beatmapset_id=rec["beatmapset_id"],
-        beatmap_md5=rec["beatmap_md5"],
-        song_name=rec["song_name"],
-        file_name=rec["file_name"],
-        ar=rec["ar"],
-        od=rec["od"],
-        mode=rec["mode"],
-        max_combo=rec["max_combo"],
-        hit_length=rec["hit_length"],
-        bpm=rec["bpm"],
-        ranked=rec["ranked"],
-        latest_update=rec["latest_update"],
-        ranked_status_freezed=rec["ranked_status_freezed"],
-        playcount=rec["playcount"],
-        passcount=rec["passcount"],
-        rankedby=rec["rankedby"],
-        rating=rec["rating"],
-        bancho_ranked_status=rec["bancho_ranked_status"],
-        count_circles=rec["count_circles"],
-        count_spinners=rec["count_spinners"],
-        count_sliders=rec["count_sliders"],
-        bancho_creator_id=rec["bancho_creator_id"],
-        bancho_creator_name=rec["bancho_creator_name"],
-    )
+    beatmap = _deserialize_record(rec)
+    _cache(beatmap)
+    return beatmap
 
 
-async def create_or_replace(beatmap: AkatsukiBeatmap) -> AkatsukiBeatmap:
-    query = """\
-        REPLACE INTO beatmaps (
-            beatmap_id, beatmapset_id, beatmap_md5, song_name, file_name,
-            ar, od, mode, max_combo, hit_length, bpm, ranked, latest_update,
-            ranked_status_freezed, playcount, passcount, rankedby, rating,
-            bancho_ranked_status, count_circles, count_spinners, count_sliders,
-            bancho_creator_id, bancho_creator_name
+async def fetch_many_by_beatmapset_id(beatmapset_id: int, /) -> list[AkatsukiBeatmap]:
+    query = f"""\
+        SELECT {AKATSUKI_BEATMAP_COLUMNS} FROM beatmaps
+        WHERE beatmapset_id = :beatmapset_id
+    """
+    recs = await state.database.fetch_all(query, {"beatmapset_id": beatmapset_id})
+    return [_deserialize_record(rec) for rec in recs]
+
+
+async def fetch_many(
+    *,
+    beatmap_ids: list[int],
+    beatmap_md5s: list[str],
+) -> list[AkatsukiBeatmap]:
+    """\
+    Fetch every beatmap matching any of the given ids or md5s.
+
+    Beatmaps in the memory cache are served from it; the rest
+    are read from the database with a single query.
+    """
+    beatmaps: dict[int, AkatsukiBeatmap] = {}
+    uncached_beatmap_ids: list[int] = []
+    uncached_beatmap_md5s: list[str] = []
+    for beatmap_id in beatmap_ids:
+        beatmap = _get_cached_by_id(beatmap_id)
+        if beatmap is not None:
+            beatmaps[beatmap.beatmap_id] = beatmap
+        else:
+            uncached_beatmap_ids.append(beatmap_id)
+    for beatmap_md5 in beatmap_md5s:
+        beatmap = _get_cached_by_md5(beatmap_md5)
+        if beatmap is not None:
+            beatmaps[beatmap.beatmap_id] = beatmap
+        else:
+            uncached_beatmap_md5s.append(beatmap_md5)
+
+    if not uncached_beatmap_ids and not uncached_beatmap_md5s:
+        return list(beatmaps.values())
+
+    values: dict[str, Any] = {}
+    conditions: list[str] = []
+    if uncached_beatmap_ids:
+        for i, beatmap_id in enumerate(uncached_beatmap_ids):
+            values[f"beatmap_id_{i}"] = beatmap_id
+        conditions.append(
+            "beatmap_id IN ({})".format(
+                ", ".join(f":beatmap_id_{i}" for i in range(len(uncached_beatmap_ids)))
+            )
         )
-        VALUES (
-            :beatmap_id, :beatmapset_id, :beatmap_md5, :song_name, :file_name,
-            :ar, :od, :mode, :max_combo, :hit_length, :bpm, :ranked, :latest_update,
-            :ranked_status_freezed, :playcount, :passcount, :rankedby, :rating,
-            :bancho_ranked_status, :count_circles, :count_spinners, :count_sliders,
-            :bancho_creator_id, :bancho_creator_name
+    if uncached_beatmap_md5s:
+        for i, beatmap_md5 in enumerate(uncached_beatmap_md5s):
+            values[f"beatmap_md5_{i}"] = beatmap_md5
+        conditions.append(
+            "beatmap_md5 IN ({})".format(
+                ", ".join(
+                    f":beatmap_md5_{i}" for i in range(len(uncached_beatmap_md5s))
+                )
+            )
         )
+
+    query = f"""\
+        SELECT {AKATSUKI_BEATMAP_COLUMNS} FROM beatmaps
+        WHERE {" OR ".join(conditions)}
     """
-    await state.database.execute(
-        query=query,
-        values={
-            "beatmap_id": beatmap.beatmap_id,
-            "beatmapset_id": beatmap.beatmapset_id,
-            "beatmap_md5": beatmap.beatmap_md5,
-            "song_name": beatmap.song_name,
-            "file_name": beatmap.file_name,
-            "ar": beatmap.ar,
-            "od": beatmap.od,
-            "mode": beatmap.mode.value,
-            "max_combo": beatmap.max_combo,
-            "hit_length": beatmap.hit_length,
-            "bpm": beatmap.bpm,
-            "ranked": beatmap.ranked.value,
-            "latest_update": beatmap.latest_update,
-            "ranked_status_freezed": beatmap.ranked_status_freezed,
-            "playcount": beatmap.playcount,
-            "passcount": beatmap.passcount,
-            "rankedby": beatmap.rankedby,
-            "rating": beatmap.rating,
-            "bancho_ranked_status": (
-                beatmap.bancho_ranked_status.value
-                if beatmap.bancho_ranked_status is not None
-                else None
+    recs = await state.database.fetch_all(query, values)
+    for rec in recs:
+        beatmap = _deserialize_record(rec)
+        _cache(beatmap)
+        beatmaps[beatmap.beatmap_id] = beatmap
+
+    return list(beatmaps.values())
+
+
+async def fetch_many_due_for_update(
+    *,
+    ranked_statuses: list[RankedStatus],
+    limit: int,
+) -> list[AkatsukiBeatmap]:
+    """\
+    Fetch beatmaps of the given statuses which are due for an update.
+
+    Statuses are prioritised in the order given, and beatmaps of the same
+    status by how long it's been since they were last updated.
+    """
+    now = time.time()
+    values: dict[str, Any] = {"limit": limit}
+    conditions: list[str] = []
+    priorities: list[str] = []
+    for i, ranked_status in enumerate(ranked_statuses):
+        values[f"ranked_{i}"] = ranked_status.value
+        values[f"updated_before_{i}"] = int(
+            now - get_update_interval(ranked_status).total_seconds(),
+        )
+        conditions.append(
+            f"(ranked = :ranked_{i} AND latest_update <= :updated_before_{i})",
+        )
+        priorities.append(f"WHEN :ranked_{i} THEN {i}")
+
+    query = f"""\
+        SELECT {AKATSUKI_BEATMAP_COLUMNS} FROM beatmaps
+        WHERE {" OR ".join(conditions)}
+        ORDER BY CASE ranked {" ".join(priorities)} END, latest_update
+        LIMIT :limit
+    """
+    recs = await state.database.fetch_all(query, values)
+    return [_deserialize_record(rec) for rec in recs]
+
+
+def _serialize(beatmap: AkatsukiBeatmap) -> dict[str, Any]:
+    return {
+        "beatmap_id": beatmap.beatmap_id,
+        "beatmapset_id": beatmap.beatmapset_id,
+        "beatmap_md5": beatmap.beatmap_md5,
+        "song_name": beatmap.song_name,
+        "file_name": beatmap.file_name,
+        "ar": beatmap.ar,
+        "od": beatmap.od,
+        "mode": beatmap.mode.value,
+        "max_combo": beatmap.max_combo,
+        "hit_length": beatmap.hit_length,
+        "bpm": beatmap.bpm,
+        "ranked": beatmap.ranked.value,
+        "latest_update": beatmap.latest_update,
+        "ranked_status_freezed": beatmap.ranked_status_freezed,
+        "playcount": beatmap.playcount,
+        "passcount": beatmap.passcount,
+        "rankedby": beatmap.rankedby,
+        "rating": beatmap.rating,
+        "bancho_ranked_status": (
+            beatmap.bancho_ranked_status.value
+            if beatmap.bancho_ranked_status is not None
+            else None
+        ),
+        "count_circles": beatmap.count_circles,
+        "count_spinners": beatmap.count_spinners,
+        "count_sliders": beatmap.count_sliders,
+        "bancho_creator_id": beatmap.bancho_creator_id,
+        "bancho_creator_name": beatmap.bancho_creator_name,
+    }
+
+
+async def upsert(beatmap: AkatsukiBeatmap) -> AkatsukiBeatmap:
+    (beatmap,) = await upsert_many([beatmap])
+    return beatmap
+
+
+async def upsert_many(beatmaps: list[AkatsukiBeatmap]) -> list[AkatsukiBeatmap]:
+    """\
+    Create or update many beatmaps with a single statement.
+
+    Existing rows only have their osu!-owned columns updated; the play
+    counters, rating & who ranked it are left as they are, since the
+    score server & staff update those. A status frozen on Akatsuki is
+    also kept. As the rows may therefore differ from the beatmaps given,
+    they are uncached rather than cached, to be read again when next used.
+    """
+    if not beatmaps:
+        return []
+
+    values: dict[str, Any] = {}
+    rows: list[str] = []
+    for i, beatmap in enumerate(beatmaps):
+        row_values = {
+            f"{column}_{i}": value for column, value in _serialize(beatmap).items()
+        }
+        rows.append(f"({', '.join(f':{param}' for param in row_values)})")
+        values.update(row_values)
+
+    # Unlike REPLACE (a delete & insert), this updates rows in place.
+    # (assignments apply in order, so `ranked` sees the stored freeze)
+    query = f"""\
+        INSERT INTO beatmaps ({AKATSUKI_BEATMAP_COLUMNS})
+        VALUES {", ".join(rows)}
+        ON DUPLICATE KEY UPDATE
+            beatmapset_id = VALUES(beatmapset_id),
+            beatmap_md5 = VALUES(beatmap_md5),
+            song_name = VALUES(song_name),
+            file_name = VALUES(file_name),
+            ar = VALUES(ar),
+            od = VALUES(od),
+            mode = VALUES(mode),
+            max_combo = VALUES(max_combo),
+            hit_length = VALUES(hit_length),
+            bpm = VALUES(bpm),
+            ranked = IF(ranked_status_freezed, ranked, VALUES(ranked)),
+            latest_update = VALUES(latest_update),
+            ranked_status_freezed = (
+                ranked_status_freezed OR VALUES(ranked_status_freezed)
             ),
-            "count_circles": beatmap.count_circles,
-            "count_spinners": beatmap.count_spinners,
-            "count_sliders": beatmap.count_sliders,
-            "bancho_creator_id": beatmap.bancho_creator_id,
-            "bancho_creator_name": beatmap.bancho_creator_name,
-        },
-    )
-    rec = await state.database.fetch_one(
-        """\
-        SELECT * FROM beatmaps WHERE beatmap_id = :beatmap_id
-        """,
-        {"beatmap_id": beatmap.beatmap_id},
-    )
-    assert rec is not None
-
-    return AkatsukiBeatmap(
-        beatmap_id=rec["beatmap_id"],
-        beatmapset_id=rec["beatmapset_id"],
-        beatmap_md5=rec["beatmap_md5"],
-        song_name=rec["song_name"],
-        file_name=rec["file_name"],
-        ar=rec["ar"],
-        od=rec["od"],
-        mode=rec["mode"],
-        max_combo=rec["max_combo"],
-        hit_length=rec["hit_length"],
-        bpm=rec["bpm"],
-        ranked=rec["ranked"],
-        latest_update=rec["latest_update"],
-        ranked_status_freezed=rec["ranked_status_freezed"],
-        playcount=rec["playcount"],
-        passcount=rec["passcount"],
-        rankedby=rec["rankedby"],
-        rating=rec["rating"],
-        bancho_ranked_status=rec["bancho_ranked_status"],
-        count_circles=rec["count_circles"],
-        count_spinners=rec["count_spinners"],
-        count_sliders=rec["count_sliders"],
-        bancho_creator_id=rec["bancho_creator_id"],
-        bancho_creator_name=rec["bancho_creator_name"],
-    )
+            bancho_ranked_status = VALUES(bancho_ranked_status),
+            count_circles = VALUES(count_circles),
+            count_spinners = VALUES(count_spinners),
+            count_sliders = VALUES(count_sliders),
+            bancho_creator_id = VALUES(bancho_creator_id),
+            bancho_creator_name = VALUES(bancho_creator_name)
+    """
+    await state.database.execute(query=query, values=values)
 
+    for beatmap in beatmaps:
+        _uncache(beatmap.beatmap_md5, beatmap.beatmap_id)
 
-async def delete_by_md5(beatmap_md5: str, /) -> None:
+    return beatmaps
+
+
+async def delete_by_md5(
+    beatmap_md5: str,
+    /,
+    *,
+    beatmap_id: int | None = None,
+) -> None:
+    """\
+    Delete a beatmap by its md5.
+
+    Pass the beatmap's id if it's known, so that it's certainly
+    removed from the memory cache too.
+    """
     await state.database.execute(
         "DELETE FROM beatmaps WHERE beatmap_md5 = :beatmap_md5",
         {"beatmap_md5": beatmap_md5},
     )
+    _uncache(beatmap_md5, beatmap_id)
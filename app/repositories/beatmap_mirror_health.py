@@ -0,0 +1,83 @@
+"""\
+Health reports published by each replica of the service, per beatmap mirror.
+
+CREATE TABLE beatmap_mirror_health (
+    replica_id VARCHAR(255) NOT NULL,
+    mirror_name VARCHAR(255) NOT NULL,
+    circuit_state VARCHAR(32) NOT NULL,
+    consecutive_failures INT NOT NULL,
+    circuit_opened_at DOUBLE NULL,
+    reported_at DATETIME NOT NULL,
+    PRIMARY KEY (replica_id, mirror_name),
+    KEY (reported_at)
+);
+"""
+
+from typing import Any
+
+from pydantic import BaseModel
+
+from app import state
+
+
+class BeatmapMirrorHealthReport(BaseModel):
+    replica_id: str
+    mirror_name: str
+    circuit_state: str
+    consecutive_failures: int
+    # Unix time at which the replica's circuit opened, if it is open
+    circuit_opened_at: float | None
+
+
+async def upsert_many(reports: list[BeatmapMirrorHealthReport]) -> None:
+    if not reports:
+        return None
+
+    values: dict[str, Any] = {}
+    rows: list[str] = []
+    for i, report in enumerate(reports):
+        rows.append(
+            f"(:replica_id_{i}, :mirror_name_{i}, :circuit_state_{i}, "
+            f":consecutive_failures_{i}, :circuit_opened_at_{i}, NOW())",
+        )
+        values[f"replica_id_{i}"] = report.replica_id
+        values[f"mirror_name_{i}"] = report.mirror_name
+        values[f"circuit_state_{i}"] = report.circuit_state
+        values[f"consecutive_failures_{i}"] = report.consecutive_failures
+        values[f"circuit_opened_at_{i}"] = report.circuit_opened_at
+
+    query = f"""\
+        INSERT INTO beatmap_mirror_health (
+            replica_id, mirror_name, circuit_state,
+            consecutive_failures, circuit_opened_at, reported_at
+        )
+        VALUES {", ".join(rows)}
+        ON DUPLICATE KEY UPDATE
+            circuit_state = VALUES(circuit_state),
+            consecutive_failures = VALUES(consecutive_failures),
+            circuit_opened_at = VALUES(circuit_opened_at),
+            reported_at = VALUES(reported_at)
+    """
+    await state.database.execute(query=query, values=values)
+
+
+async def fetch_recent(max_age_seconds: int) -> list[BeatmapMirrorHealthReport]:
+    recs = await state.database.fetch_all(
+        """\
+        SELECT replica_id, mirror_name, circuit_state,
+        consecutive_failures, circuit_opened_at
+        FROM beatmap_mirror_health
+        WHERE reported_at > NOW() - INTERVAL :max_age_seconds SECOND
+        """,
+        {"max_age_seconds": max_age_seconds},
+    )
+    return [
+        BeatmapMirrorHealthReport(
+            replica_id=rec["replica_id"],
+            mirror_name=rec["mirror_name"],
+            circuit_state=rec["circuit_state"],
+            consecutive_failures=rec["consecutive_failures"],
+            circuit_opened_at=rec["circuit_opened_at"],
+        )
+        for rec in recs
+    ]
@@ -1,20 +1,28 @@
-import math
+"""\
+Requests made to beatmap mirrors, for metrics & mirror selection.
+
+The `resource` column is an ENUM of `MirrorResource`'s values; when
+adding resources, extend it first, e.g. for the audio resources:
+
+ALTER TABLE beatmap_mirror_requests
+    MODIFY COLUMN resource
+    ENUM('osz_file', 'background_image', 'audio', 'audio_preview') NOT NULL;
+"""
+
 from datetime import datetime
 from enum import StrEnum
+from typing import Any
 
 from pydantic import BaseModel
 
 from app import state
 
-# Give new mirrors a fair shot
-# to get their foot in the race
-MIRROR_INITIAL_WEIGHT = 100
-
 
 class MirrorResource(StrEnum):
     OSZ_FILE = "osz_file"
     BACKGROUND_IMAGE = "background_image"
-    # TODO: beatmap audio file
+    AUDIO = "audio"
+    AUDIO_PREVIEW = "audio_preview"
 
 
 class BeatmapMirrorRequest(BaseModel):
@@ -30,53 +38,58 @@ class BeatmapMirrorRequest(BaseModel):
     resource: MirrorResource
 
 
-class BeatmapMirrorScore(BaseModel):
+class BeatmapMirrorRequestHistogramBucket(BaseModel):
     mirror_name: str
-    score: float
+    resource: MirrorResource
+    success: bool
+    time_slice: int
+    latency_bucket: int
+    request_count: int
 
 
-async def get_mirror_weight(mirror_name: str, resource: MirrorResource) -> int:
-    """Give the mirror a weighting based on its latency and failure rate."""
-    p75_success_ms_latency = await state.database.fetch_val(
-        """\
-        WITH request_latencies AS (
-            SELECT (ended_at - started_at) * 1000 AS ms_elapsed,
-            PERCENT_RANK() OVER (ORDER BY ended_at - started_at) p
-            FROM beatmap_mirror_requests
-            WHERE started_at > NOW() - INTERVAL 4 HOUR
-            AND mirror_name = :mirror_name
-            AND resource = :resource
-            AND success = 1
-        )
-        SELECT DISTINCT first_value(ms_elapsed) OVER (
-            ORDER BY CASE WHEN p <= 0.75 THEN p END DESC
-        ) p75_success_ms_latency
-        FROM request_latencies
-        """,
-        {"mirror_name": mirror_name, "resource": resource.value},
-    )
-    if p75_success_ms_latency is None:
-        return MIRROR_INITIAL_WEIGHT
+async def fetch_request_histograms(
+    *,
+    window_seconds: int,
+    time_slice_seconds: int,
+    latency_buckets_per_doubling: int,
+) -> list[BeatmapMirrorRequestHistogramBucket]:
+    """\
+    Aggregate recent requests into per-mirror & resource latency histograms.
 
-    failure_rate = await state.database.fetch_val(
+    Requests are counted by time slice (the unix time of the request divided
+    by `time_slice_seconds`) and latency bucket (log2 of the latency in ms,
+    multiplied by `latency_buckets_per_doubling`).
+    """
+    recs = await state.database.fetch_all(
         """\
-        SELECT AVG(success = 0)
+        SELECT mirror_name, resource, success,
+        FLOOR(UNIX_TIMESTAMP(started_at) / :time_slice_seconds) AS time_slice,
+        FLOOR(
+            LOG2(GREATEST(TIMESTAMPDIFF(MICROSECOND, started_at, ended_at) / 1000, 1))
+            * :latency_buckets_per_doubling
+        ) AS latency_bucket,
+        COUNT(*) AS request_count
         FROM beatmap_mirror_requests
-        WHERE started_at > NOW() - INTERVAL 4 HOUR
-        AND mirror_name = :mirror_name
-        AND resource = :resource
+        WHERE started_at > NOW() - INTERVAL :window_seconds SECOND
+        GROUP BY mirror_name, resource, success, time_slice, latency_bucket
         """,
-        {"mirror_name": mirror_name, "resource": resource.value},
+        {
+            "window_seconds": window_seconds,
+            "time_slice_seconds": time_slice_seconds,
+            "latency_buckets_per_doubling": latency_buckets_per_doubling,
+        },
     )
-    if failure_rate is None:
-        return MIRROR_INITIAL_WEIGHT
-
-    # https://www.desmos.com/calculator/wxpsjhdby9
-    latency_weight = 1000 * math.exp(-1 / 1000 * float(p75_success_ms_latency))
-    failure_weight = math.exp(-30 * failure_rate)
-    # TODO: integrate `mirror_cache_age` into the weight calculation
-    weight = max(1, int(latency_weight * failure_weight))
-    return weight
+    return [
+        BeatmapMirrorRequestHistogramBucket(
+            mirror_name=rec["mirror_name"],
+            resource=rec["resource"],
+            success=rec["success"],
+            time_slice=rec["time_slice"],
+            latency_bucket=rec["latency_bucket"],
+            request_count=rec["request_count"],
+        )
+        for rec in recs
+    ]
 
 
 async def create(
@@ -128,3 +141,37 @@ async def create(
         response_error=response_error,
         resource=resource,
     )
+
+
+async def create_many(requests: list[BeatmapMirrorRequest]) -> None:
+    """Insert many requests in a single multi-row statement."""
+    if not requests:
+        return None
+
+    values: dict[str, Any] = {}
+    rows: list[str] = []
+    for i, request in enumerate(requests):
+        rows.append(
+            f"(:request_url_{i}, :api_key_id_{i}, :mirror_name_{i}, :success_{i}, "
+            f":started_at_{i}, :ended_at_{i}, :response_status_code_{i}, "
+            f":response_size_{i}, :response_error_{i}, :resource_{i})",
+        )
+        values[f"request_url_{i}"] = request.request_url
+        values[f"api_key_id_{i}"] = request.api_key_id
+        values[f"mirror_name_{i}"] = request.mirror_name
+        values[f"success_{i}"] = request.success
+        values[f"started_at_{i}"] = request.started_at
+        values[f"ended_at_{i}"] = request.ended_at
+        values[f"response_status_code_{i}"] = request.response_status_code
+        values[f"response_size_{i}"] = request.response_size
+        values[f"response_error_{i}"] = request.response_error
+        values[f"resource_{i}"] = request.resource.value
+
+    query = f"""\
+        INSERT INTO beatmap_mirror_requests (
+            request_url, api_key_id, mirror_name, success, started_at,
+            ended_at, response_status_code, response_size, response_error, resource
+        )
+        VALUES {", ".join(rows)}
+    """
+    await state.database.execute(query=query, values=values)
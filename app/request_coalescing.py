@@ -0,0 +1,91 @@
+"""\
+Coalescing of concurrent, identical calls to upstream services.
+
+While a call for some key is in flight, any further callers using the same
+key will await the in-flight call's result rather than making their own.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections import defaultdict
+from collections.abc import Callable
+from collections.abc import Coroutine
+from dataclasses import dataclass
+from typing import Any
+from typing import TypeVar
+
+from pydantic import BaseModel
+
+T = TypeVar("T")
+
+# (upstream, resource, resource id)
+CoalescingKey = tuple[str, str, int | str]
+
+
+class CoalescingStats(BaseModel):
+    calls: int = 0
+    deduplicated_calls: int = 0
+
+
+@dataclass
+class _InFlightCall:
+    task: asyncio.Task[Any]
+    waiters: int = 0
+
+
+IN_FLIGHT_CALLS: dict[CoalescingKey, _InFlightCall] = {}
+COALESCING_STATS: defaultdict[str, CoalescingStats] = defaultdict(CoalescingStats)
+
+
+def _forget_call(key: CoalescingKey, in_flight_call: _InFlightCall) -> None:
+    if IN_FLIGHT_CALLS.get(key) is in_flight_call:
+        del IN_FLIGHT_CALLS[key]
+
+
+async def coalesce(
+    key: CoalescingKey,
+    func: Callable[[], Coroutine[Any, Any, T]],
+) -> T:
+    """\
+    Call `func`, or join an identical call which is already in flight.
+
+    The call runs in its own task, so a caller being cancelled does not
+    affect any other callers waiting on the same result. The call itself
+    is only cancelled once every caller waiting on it has gone away.
+    """
+    upstream, _, _ = key
+    stats = COALESCING_STATS[upstream]
+    stats.calls += 1
+
+    in_flight_call = IN_FLIGHT_CALLS.get(key)
+    if in_flight_call is None:
+        in_flight_call = _InFlightCall(task=asyncio.create_task(func()))
+        IN_FLIGHT_CALLS[key] = in_flight_call
+        in_flight_call.task.add_done_callback(
+            lambda _: _forget_call(key, in_flight_call),
+        )
+    else:
+        stats.deduplicated_calls += 1
+
+    in_flight_call.waiters += 1
+    try:
+        result: T = await asyncio.shield(in_flight_call.task)
+        return result
+    except asyncio.CancelledError:
+        if in_flight_call.waiters == 1 and not in_flight_call.task.done():
+            # We were the last caller interested in the result; forget the
+            # call immediately so that new callers don't join a dying task
+            _forget_call(key, in_flight_call)
+            in_flight_call.task.cancel()
+        raise
+    finally:
+        in_flight_call.waiters -= 1
+
+
+def get_stats() -> dict[str, CoalescingStats]:
+    return dict(COALESCING_STATS)
+
+
+def get_in_flight_call_count() -> int:
+    return len(IN_FLIGHT_CALLS)
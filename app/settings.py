@@ -35,3 +35,63 @@ AWS_S3_SECRET_ACCESS_KEY = os.environ["AWS_S3_SECRET_ACCESS_KEY"]
 DISCORD_BEATMAP_UPDATES_WEBHOOK_URL = os.environ["DISCORD_BEATMAP_UPDATES_WEBHOOK_URL"]
 
 MINO_INCREASED_RATELIMIT_KEY = os.environ["MINO_INCREASED_RATELIMIT_KEY"]
+
+HTTP_CLIENT_HTTP2_ENABLED = read_bool(
+    os.environ.get("HTTP_CLIENT_HTTP2_ENABLED", "false"),
+)
+HTTP_CLIENT_KEEPALIVE_EXPIRY_SECONDS = float(
+    os.environ.get("HTTP_CLIENT_KEEPALIVE_EXPIRY_SECONDS", "30"),
+)
+
+# One of "none", "mysql" or "memory"
+MIRROR_HEALTH_SHARED_BACKEND = os.environ.get("MIRROR_HEALTH_SHARED_BACKEND", "none")
+MIRROR_HEALTH_SYNC_INTERVAL_SECONDS = float(
+    os.environ.get("MIRROR_HEALTH_SYNC_INTERVAL_SECONDS", "5"),
+)
+
+BACKGROUND_IMAGE_MEMORY_CACHE_MAX_BYTES = int(
+    os.environ.get("BACKGROUND_IMAGE_MEMORY_CACHE_MAX_BYTES", str(64 * 1024**2)),
+)
+BACKGROUND_IMAGE_VARIANT_MEMORY_CACHE_MAX_BYTES = int(
+    os.environ.get(
+        "BACKGROUND_IMAGE_VARIANT_MEMORY_CACHE_MAX_BYTES", str(16 * 1024**2)
+    ),
+)
+
+IMAGE_PROCESSING_MAX_WORKERS = int(os.environ.get("IMAGE_PROCESSING_MAX_WORKERS", "1"))
+
+AKATSUKI_BEATMAP_MEMORY_CACHE_MAX_ENTRIES = int(
+    os.environ.get("AKATSUKI_BEATMAP_MEMORY_CACHE_MAX_ENTRIES", "50000"),
+)
+AKATSUKI_BEATMAP_MEMORY_CACHE_TTL_SECONDS = float(
+    os.environ.get("AKATSUKI_BEATMAP_MEMORY_CACHE_TTL_SECONDS", "60"),
+)
+
+OSZ_PREFETCH_MAX_QUEUE_SIZE = int(
+    os.environ.get("OSZ_PREFETCH_MAX_QUEUE_SIZE", "1000"),
+)
+OSZ_PREFETCH_CONCURRENCY = int(os.environ.get("OSZ_PREFETCH_CONCURRENCY", "2"))
+OSZ_PREFETCH_DAILY_BYTE_BUDGET = int(
+    os.environ.get("OSZ_PREFETCH_DAILY_BYTE_BUDGET", str(10 * 1024**3)),
+)
+
+MIRROR_REQUEST_LOG_MAX_QUEUE_SIZE = int(
+    os.environ.get("MIRROR_REQUEST_LOG_MAX_QUEUE_SIZE", "10000"),
+)
+MIRROR_REQUEST_LOG_BATCH_SIZE = int(
+    os.environ.get("MIRROR_REQUEST_LOG_BATCH_SIZE", "500"),
+)
+MIRROR_REQUEST_LOG_FLUSH_INTERVAL_SECONDS = float(
+    os.environ.get("MIRROR_REQUEST_LOG_FLUSH_INTERVAL_SECONDS", "5"),
+)
+MIRROR_REQUEST_LOG_SUCCESS_SAMPLE_RATE = float(
+    os.environ.get("MIRROR_REQUEST_LOG_SUCCESS_SAMPLE_RATE", "1.0"),
+)
+
+SWEEPER_INTERVAL_SECONDS = float(os.environ.get("SWEEPER_INTERVAL_SECONDS", "60"))
+SWEEPER_BATCH_SIZE = int(os.environ.get("SWEEPER_BATCH_SIZE", "200"))
+SWEEPER_CONCURRENCY = int(os.environ.get("SWEEPER_CONCURRENCY", "4"))
+# The share of our osu! api key pool's rate limit which the sweeper may use
+SWEEPER_OSU_API_REQUESTS_PER_MINUTE = float(
+    os.environ.get("SWEEPER_OSU_API_REQUESTS_PER_MINUTE", "60"),
+)
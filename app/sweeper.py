@@ -0,0 +1,178 @@
+"""\
+The sweeper component, which proactively updates beatmaps from osu!.
+
+Beatmaps are otherwise only updated when they're requested, so a popular
+qualified map can sit stale and then be updated on demand under load. The
+sweeper periodically updates beatmaps which are due for it ahead of time,
+within its own budget of osu! api requests, and runs in its own process
+(`APP_COMPONENT=sweeper`) so that the API is unaffected by its work.
+"""
+
+import asyncio
+import logging
+import signal
+from dataclasses import dataclass
+
+import aiobotocore.session
+from databases import Database
+
+from app import job_scheduling
+from app import logger
+from app import settings
+from app import state
+from app.adapters import mysql
+from app.adapters import osu_mirrors
+from app.adapters.http_clients import http_client_manager
+from app.adapters.osu_mirrors.request_log import mirror_request_log
+from app.adapters.osu_mirrors.resilience import TokenBucket
+from app.adapters.osu_mirrors.scoreboard import mirror_scoreboard
+from app.adapters.osu_mirrors.shared_health import shared_mirror_health
+from app.common_models import RankedStatus
+from app.repositories import akatsuki_beatmaps
+from app.usecases import akatsuki_beatmaps as akatsuki_beatmaps_usecases
+from app.usecases.osz_prefetching import osz_prefetcher
+
+# In order of priority
+SWEPT_RANKED_STATUSES = [RankedStatus.QUALIFIED, RankedStatus.PENDING]
+
+SHUTDOWN_JOB_TIMEOUT_SECONDS = 30
+
+
+@dataclass
+class SweepResult:
+    due_count: int
+    # Includes any siblings of due beatmaps, which are updated along with them
+    updated_count: int
+
+
+class BeatmapSweeper:
+    def __init__(
+        self,
+        *,
+        interval_seconds: float,
+        batch_size: int,
+        concurrency: int,
+        osu_api_requests_per_minute: float,
+    ) -> None:
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.osu_api_budget = TokenBucket(
+            tokens_per_second=osu_api_requests_per_minute / 60,
+            bucket_size=max(osu_api_requests_per_minute / 60, 1),
+        )
+
+    async def sweep(self) -> SweepResult:
+        """Update a batch of beatmaps which are due for it."""
+        beatmaps = await akatsuki_beatmaps.fetch_many_due_for_update(
+            ranked_statuses=SWEPT_RANKED_STATUSES,
+            limit=self.batch_size,
+        )
+        if not beatmaps:
+            return SweepResult(due_count=0, updated_count=0)
+
+        updated_count = await akatsuki_beatmaps_usecases.update_many_from_osu_api(
+            beatmaps,
+            concurrency=self.concurrency,
+            osu_api_budget=self.osu_api_budget,
+        )
+        return SweepResult(due_count=len(beatmaps), updated_count=updated_count)
+
+    async def run(self, stop_event: asyncio.Event) -> None:
+        while not stop_event.is_set():
+            try:
+                result = await self.sweep()
+            except Exception:
+                logging.exception("Failed to sweep beatmaps")
+                result = SweepResult(due_count=0, updated_count=0)
+            else:
+                logging.info(
+                    "Swept beatmaps",
+                    extra={
+                        "due_count": result.due_count,
+                        "updated_count": result.updated_count,
+                    },
+                )
+
+            # A full batch of due beatmaps means there's a backlog;
+            # carry straight on with it
+            if result.due_count >= self.batch_size:
+                continue
+
+            try:
+                await asyncio.wait_for(stop_event.wait(), self.interval_seconds)
+            except TimeoutError:
+                pass
+
+
+beatmap_sweeper = BeatmapSweeper(
+    interval_seconds=settings.SWEEPER_INTERVAL_SECONDS,
+    batch_size=settings.SWEEPER_BATCH_SIZE,
+    concurrency=settings.SWEEPER_CONCURRENCY,
+    osu_api_requests_per_minute=settings.SWEEPER_OSU_API_REQUESTS_PER_MINUTE,
+)
+
+
+async def run_sweeper() -> None:
+    logger.configure_logging()
+
+    state.database = Database(
+        url=mysql.create_dsn(
+            driver="aiomysql",
+            username=settings.DB_USER,
+            password=settings.DB_PASS,
+            host=settings.DB_HOST,
+            port=settings.DB_PORT,
+            database=settings.DB_NAME,
+        ),
+    )
+    await state.database.connect()
+
+    aws_session = aiobotocore.session.get_session()
+    s3_client = aws_session.create_client(
+        service_name="s3",
+        region_name=settings.AWS_S3_REGION_NAME,
+        endpoint_url=settings.AWS_S3_ENDPOINT_URL,
+        aws_access_key_id=settings.AWS_S3_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_S3_SECRET_ACCESS_KEY,
+    )
+    state.s3_client = await s3_client.__aenter__()
+
+    await http_client_manager.start()
+
+    # Newly qualified & ranked sets found by the sweep are prefetched from
+    # here, so the sweeper uses the mirrors just as an API replica does
+    try:
+        await mirror_scoreboard.seed()
+    except Exception:
+        logging.exception("Failed to seed mirror scoreboard; starting from empty")
+    mirror_request_log.start()
+    osz_prefetcher.start()
+    if shared_mirror_health is not None:
+        shared_mirror_health.start(osu_mirrors.BEATMAP_MIRRORS)
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop_event.set)
+
+    try:
+        await beatmap_sweeper.run(stop_event)
+    finally:
+        await osz_prefetcher.stop()
+        await job_scheduling.await_running_jobs(timeout=SHUTDOWN_JOB_TIMEOUT_SECONDS)
+        if shared_mirror_health is not None:
+            await shared_mirror_health.stop()
+        await mirror_request_log.stop()
+        await http_client_manager.aclose()
+        await state.s3_client.__aexit__(None, None, None)
+        await state.database.disconnect()
+
+
+def main() -> int:
+    asyncio.run(run_sweeper())
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
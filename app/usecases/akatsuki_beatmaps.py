@@ -1,16 +1,38 @@
+import asyncio
 import logging
+import math
 import time
+from dataclasses import dataclass
 
+from app import job_scheduling
+from app import request_coalescing
 from app.adapters import aws_s3
 from app.adapters import discord_webhooks
 from app.adapters import osu_api_v1
+from app.adapters.osu_mirrors.resilience import TokenBucket
 from app.common_models import RankedStatus
 from app.repositories import akatsuki_beatmaps
 from app.repositories.akatsuki_beatmaps import AkatsukiBeatmap
+from app.usecases import audio_files
+from app.usecases import background_images
+from app.usecases import osz_files
+from app.usecases import osz_prefetching
 
 IGNORED_BEATMAP_CHARS = dict.fromkeys(map(ord, r':\/*<>?"|'), None)
 FROZEN_STATUSES = {RankedStatus.RANKED, RankedStatus.APPROVED, RankedStatus.LOVED}
 
+# Bounds how many beatmaps a batch lookup fetches or refreshes from osu! api v1 at once
+BATCH_LOOKUP_REFRESH_CONCURRENCY = 8
+
+# Sets being updated in the background, to avoid duplicate updates
+REFRESHING_BEATMAPSET_IDS: set[int] = set()
+
+
+@dataclass
+class BeatmapBatchLookup:
+    by_id: dict[int, AkatsukiBeatmap]
+    by_md5: dict[str, AkatsukiBeatmap]
+
 
 def _parse_akatsuki_beatmap_from_osu_api_v1_response(
     osu_api_beatmap: osu_api_v1.Beatmap,
@@ -68,27 +90,103 @@ def _parse_akatsuki_beatmap_from_osu_api_v1_response(
     return akatsuki_beatmap
 
 
-async def _update_from_osu_api(old_beatmap: AkatsukiBeatmap) -> AkatsukiBeatmap | None:
-    if not old_beatmap.deserves_update:
-        return old_beatmap
+async def _update_beatmapset_from_osu_api(
+    beatmapset_id: int,
+) -> list[AkatsukiBeatmap]:
+    """\
+    Update every beatmap of a set from osu!, with a single osu! api request.
 
-    try:
-        new_osu_api_v1_beatmap = await osu_api_v1.fetch_one_beatmap(
+    Difficulties new to us are added, and any we have which are no longer
+    part of the set on osu! are deleted. Returns the set's current beatmaps.
+    """
+    osu_api_v1_beatmaps = await osu_api_v1.fetch_many_beatmaps_by_beatmapset_id(
+        beatmapset_id,
+    )
+
+    old_beatmaps = await akatsuki_beatmaps.fetch_many_by_beatmapset_id(beatmapset_id)
+    updates = await _prepare_beatmapset_update(old_beatmaps, osu_api_v1_beatmaps)
+    await _save_updates(updates)
+    return [new_beatmap for _, new_beatmap in updates]
+
+
+async def _prepare_beatmapset_update(
+    old_beatmaps: list[AkatsukiBeatmap],
+    osu_api_v1_beatmaps: list[osu_api_v1.Beatmap],
+) -> list[tuple[AkatsukiBeatmap | None, AkatsukiBeatmap]]:
+    """\
+    Work out the updated state of a set's beatmaps, from the set on osu!.
+
+    Returns (old, new) pairs of beatmaps to be saved with `_save_updates`;
+    the old beatmap is None for difficulties which are new to us.
+    """
+    osu_api_v1_beatmaps_by_id = {
+        osu_api_v1_beatmap.beatmap_id: osu_api_v1_beatmap
+        for osu_api_v1_beatmap in osu_api_v1_beatmaps
+    }
+
+    updates: list[tuple[AkatsukiBeatmap | None, AkatsukiBeatmap]] = []
+    for old_beatmap in old_beatmaps:
+        # (difficulties deleted from the set are missing here)
+        new_osu_api_v1_beatmap = osu_api_v1_beatmaps_by_id.pop(
+            old_beatmap.beatmap_id,
+            None,
+        )
+        new_beatmap = await _prepare_update(old_beatmap, new_osu_api_v1_beatmap)
+        if new_beatmap is not None:
+            updates.append((old_beatmap, new_beatmap))
+
+    for osu_api_v1_beatmap in osu_api_v1_beatmaps_by_id.values():
+        updates.append(
+            (
+                None,
+                _parse_akatsuki_beatmap_from_osu_api_v1_response(osu_api_v1_beatmap),
+            ),
+        )
+
+    return updates
+
+
+async def _save_updates(
+    updates: list[tuple[AkatsukiBeatmap | None, AkatsukiBeatmap]],
+) -> None:
+    await akatsuki_beatmaps.upsert_many(
+        [new_beatmap for _, new_beatmap in updates],
+    )
+    for old_beatmap, new_beatmap in updates:
+        if old_beatmap is not None:
+            await _finish_update(old_beatmap, new_beatmap)
+
+
+async def _prepare_update(
+    old_beatmap: AkatsukiBeatmap,
+    new_osu_api_v1_beatmap: osu_api_v1.Beatmap | None,
+) -> AkatsukiBeatmap | None:
+    """\
+    Work out a beatmap's updated state, from its current state on osu!.
+
+    Beatmaps which have been unsubmitted, or whose old versions have been
+    replaced, are deleted (and their cached files invalidated) here. The
+    updated beatmap is returned to be saved, after which `_finish_update`
+    must be called.
+    """
+    if new_osu_api_v1_beatmap is None:
+        # The map has been unsubmitted (or deleted from its set) by the
+        # mapper or staff on the official osu! servers. We'll delete it as well.
+        logging.info(
+            "Deleting unsubmitted beatmap",
+            extra={"beatmap": old_beatmap.model_dump()},
+        )
+        await akatsuki_beatmaps.delete_by_md5(
+            old_beatmap.beatmap_md5,
             beatmap_id=old_beatmap.beatmap_id,
         )
-        if new_osu_api_v1_beatmap is None:
-            # The map has been unsubmitted by the mapper or staff
-            # on the official osu! servers. We'll delete it as well.
-            logging.info(
-                "Deleting unsubmitted beatmap",
-                extra={"beatmap": old_beatmap.model_dump()},
-            )
-            await akatsuki_beatmaps.delete_by_md5(old_beatmap.beatmap_md5)
-            await aws_s3.delete_object(f"/beatmaps/{old_beatmap.beatmap_id}.osu")
-            return None
-    except Exception:
-        # TODO: fallback to beatmap mirror
-        raise
+        await aws_s3.delete_object(f"/beatmaps/{old_beatmap.beatmap_id}.osu")
+        await osz_files.invalidate_beatmapset_osz_file(old_beatmap.beatmapset_id)
+        await background_images.invalidate_beatmap_background_image(
+            old_beatmap.beatmap_id,
+        )
+        await audio_files.invalidate_beatmap_audio(old_beatmap.beatmap_id)
+        return None
 
     new_beatmap = _parse_akatsuki_beatmap_from_osu_api_v1_response(
         new_osu_api_v1_beatmap,
@@ -101,7 +199,18 @@ async def _update_from_osu_api(old_beatmap: AkatsukiBeatmap) -> AkatsukiBeatmap
             "Deleting old beatmap",
             extra={"old_beatmap": old_beatmap.model_dump()},
         )
-        await akatsuki_beatmaps.delete_by_md5(old_beatmap.beatmap_md5)
+        await akatsuki_beatmaps.delete_by_md5(
+            old_beatmap.beatmap_md5,
+            beatmap_id=old_beatmap.beatmap_id,
+        )
+
+        # the set's .osz archive contains the old version of this difficulty
+        await osz_files.invalidate_beatmapset_osz_file(old_beatmap.beatmapset_id)
+        # and the new version may come with a new background & audio
+        await background_images.invalidate_beatmap_background_image(
+            old_beatmap.beatmap_id,
+        )
+        await audio_files.invalidate_beatmap_audio(old_beatmap.beatmap_id)
     else:
         # the map may have changed in some ways (e.g. ranked status),
         # but we want to make sure to keep our stats, because the map
@@ -138,16 +247,147 @@ async def _update_from_osu_api(old_beatmap: AkatsukiBeatmap) -> AkatsukiBeatmap
             )
 
     new_beatmap.latest_update = int(time.time())
+    return new_beatmap
+
 
-    new_beatmap = await akatsuki_beatmaps.create_or_replace(new_beatmap)
+async def _finish_update(
+    old_beatmap: AkatsukiBeatmap,
+    new_beatmap: AkatsukiBeatmap,
+) -> None:
+    if (
+        new_beatmap.ranked != old_beatmap.ranked
+        and new_beatmap.ranked in osz_prefetching.PREFETCH_RANKED_STATUSES
+    ):
+        # players are about to start downloading this set en masse
+        osz_prefetching.osz_prefetcher.enqueue(new_beatmap.beatmapset_id)
 
     # invalidate any cached .osu data in s3
     await aws_s3.delete_object(f"/beatmaps/{new_beatmap.beatmap_id}.osu")
 
-    return new_beatmap
+
+async def update_many_from_osu_api(
+    old_beatmaps: list[AkatsukiBeatmap],
+    *,
+    concurrency: int,
+    osu_api_budget: TokenBucket,
+) -> int:
+    """\
+    Update the sets of many beatmaps from osu!, whether or not they're due.
+
+    Each set is fetched from osu! api once, with at most `concurrency`
+    requests at a time, each waiting for a token from `osu_api_budget`.
+    Each set is read & saved right after its response arrives, so that
+    a slow sweep doesn't write back rows read long before. Returns how
+    many beatmaps were updated (or added).
+    """
+    beatmapset_ids = {old_beatmap.beatmapset_id for old_beatmap in old_beatmaps}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def update(beatmapset_id: int) -> int:
+        async with semaphore:
+            await osu_api_budget.acquire(timeout=math.inf)
+            try:
+                osu_api_v1_beatmaps = (
+                    await osu_api_v1.fetch_many_beatmaps_by_beatmapset_id(
+                        beatmapset_id,
+                    )
+                )
+            except Exception:
+                # (already logged) it'll be tried again on a later update
+                return 0
+
+            updates = await _prepare_beatmapset_update(
+                await akatsuki_beatmaps.fetch_many_by_beatmapset_id(beatmapset_id),
+                osu_api_v1_beatmaps,
+            )
+            await _save_updates(updates)
+            return len(updates)
+
+    return sum(await asyncio.gather(*map(update, beatmapset_ids)))
+
+
+def _refresh_in_background(beatmapset_id: int) -> None:
+    if beatmapset_id in REFRESHING_BEATMAPSET_IDS:
+        return None
+
+    REFRESHING_BEATMAPSET_IDS.add(beatmapset_id)
+    job_scheduling.schedule_job(_refresh(beatmapset_id))
+
+
+async def _refresh(beatmapset_id: int) -> None:
+    try:
+        await _update_beatmapset(beatmapset_id)
+    except Exception:
+        logging.warning(
+            "Failed to update beatmapset in the background",
+            exc_info=True,
+            extra={"beatmapset_id": beatmapset_id},
+        )
+    finally:
+        REFRESHING_BEATMAPSET_IDS.discard(beatmapset_id)
 
 
-async def fetch_one_by_id(beatmap_id: int) -> AkatsukiBeatmap | None:
+async def _update_beatmapset(beatmapset_id: int) -> list[AkatsukiBeatmap]:
+    # background & synchronous (?fresh=1) updates of any of a set's
+    # beatmaps share a single osu! api request & write
+    return await request_coalescing.coalesce(
+        ("akatsuki_beatmaps", "beatmapset_update", beatmapset_id),
+        lambda: _update_beatmapset_from_osu_api(beatmapset_id),
+    )
+
+
+async def _update_beatmap(old_beatmap: AkatsukiBeatmap) -> AkatsukiBeatmap | None:
+    for beatmap in await _update_beatmapset(old_beatmap.beatmapset_id):
+        if beatmap.beatmap_id == old_beatmap.beatmap_id:
+            return beatmap
+    # (we deleted the map during the update)
+    return None
+
+
+async def _revalidate(
+    beatmap: AkatsukiBeatmap,
+    *,
+    fresh: bool,
+) -> AkatsukiBeatmap | None:
+    if not beatmap.deserves_update:
+        return beatmap
+
+    if not fresh:
+        # serve what we have, rather than making the caller wait on osu! api
+        _refresh_in_background(beatmap.beatmapset_id)
+        return beatmap
+
+    try:
+        # (we may delete the map during the update)
+        return await _update_beatmap(beatmap)
+    except Exception:
+        logging.warning(
+            "Failed to update beatmap (using old beatmap for now)",
+            extra={"beatmap": beatmap.model_dump()},
+        )
+        return beatmap
+
+
+async def fetch_one_by_id(
+    beatmap_id: int,
+    *,
+    fresh: bool = False,
+) -> AkatsukiBeatmap | None:
+    """\
+    Fetch a beatmap by its id.
+
+    Beatmaps due for an update are returned as they are, and updated in the
+    background; pass `fresh` to wait for the update instead.
+    """
+    # concurrent lookups of the same (e.g. newly popular) beatmap
+    # share a single database read, osu! api request and write
+    return await request_coalescing.coalesce(
+        ("akatsuki_beatmaps", "fresh_beatmap" if fresh else "beatmap", beatmap_id),
+        lambda: _fetch_one_by_id(beatmap_id, fresh=fresh),
+    )
+
+
+async def _fetch_one_by_id(beatmap_id: int, *, fresh: bool) -> AkatsukiBeatmap | None:
     beatmap = await akatsuki_beatmaps.fetch_one_by_id(beatmap_id)
     if beatmap is None:
         osu_api_v1_beatmap = await osu_api_v1.fetch_one_beatmap(beatmap_id=beatmap_id)
@@ -157,27 +397,40 @@ async def fetch_one_by_id(beatmap_id: int) -> AkatsukiBeatmap | None:
         new_beatmap = _parse_akatsuki_beatmap_from_osu_api_v1_response(
             osu_api_v1_beatmap,
         )
-        beatmap = await akatsuki_beatmaps.create_or_replace(new_beatmap)
+        new_beatmap = await akatsuki_beatmaps.upsert(new_beatmap)
+        # its sibling difficulties are likely to be requested soon too
+        _refresh_in_background(new_beatmap.beatmapset_id)
+        return new_beatmap
 
-    elif beatmap.deserves_update:
-        try:
-            beatmap = await _update_from_osu_api(beatmap)
-            if beatmap is None:
-                # (we may have deleted the map during the update)
-                return None
-        except Exception:
-            logging.warning(
-                "Failed to update beatmap requested by id (using old beatmap for now)",
-                extra={
-                    "beatmap": beatmap.model_dump() if beatmap else None,
-                    "beatmap_id": beatmap_id,
-                },
-            )
+    return await _revalidate(beatmap, fresh=fresh)
 
-    return beatmap
 
+async def fetch_one_by_md5(
+    beatmap_md5: str,
+    *,
+    fresh: bool = False,
+) -> AkatsukiBeatmap | None:
+    """\
+    Fetch a beatmap by its md5.
 
-async def fetch_one_by_md5(beatmap_md5: str) -> AkatsukiBeatmap | None:
+    Beatmaps due for an update are returned as they are, and updated in the
+    background; pass `fresh` to wait for the update instead.
+    """
+    return await request_coalescing.coalesce(
+        (
+            "akatsuki_beatmaps",
+            "fresh_beatmap_by_md5" if fresh else "beatmap_by_md5",
+            beatmap_md5,
+        ),
+        lambda: _fetch_one_by_md5(beatmap_md5, fresh=fresh),
+    )
+
+
+async def _fetch_one_by_md5(
+    beatmap_md5: str,
+    *,
+    fresh: bool,
+) -> AkatsukiBeatmap | None:
     beatmap = await akatsuki_beatmaps.fetch_one_by_md5(beatmap_md5)
     if beatmap is None:
         osu_api_v1_beatmap = await osu_api_v1.fetch_one_beatmap(beatmap_md5=beatmap_md5)
@@ -187,21 +440,134 @@ async def fetch_one_by_md5(beatmap_md5: str) -> AkatsukiBeatmap | None:
         new_beatmap = _parse_akatsuki_beatmap_from_osu_api_v1_response(
             osu_api_v1_beatmap,
         )
-        beatmap = await akatsuki_beatmaps.create_or_replace(new_beatmap)
+        new_beatmap = await akatsuki_beatmaps.upsert(new_beatmap)
+        # its sibling difficulties are likely to be requested soon too
+        _refresh_in_background(new_beatmap.beatmapset_id)
+        return new_beatmap
+
+    return await _revalidate(beatmap, fresh=fresh)
+
+
+async def _fetch_one_for_batch(
+    *,
+    beatmap_id: int | None = None,
+    beatmap_md5: str | None = None,
+    fresh: bool,
+) -> AkatsukiBeatmap | None:
+    try:
+        if beatmap_id is not None:
+            return await fetch_one_by_id(beatmap_id, fresh=fresh)
+        assert beatmap_md5 is not None
+        return await fetch_one_by_md5(beatmap_md5, fresh=fresh)
+    except Exception:
+        logging.warning(
+            "Failed to look up beatmap in batch (treating it as not found)",
+            exc_info=True,
+            extra={"beatmap_id": beatmap_id, "beatmap_md5": beatmap_md5},
+        )
+        return None
+
+
+async def _update_beatmapset_for_batch(beatmapset_id: int) -> list[AkatsukiBeatmap]:
+    try:
+        return await _update_beatmapset(beatmapset_id)
+    except Exception:
+        # (already logged) the misses will be looked up one by one instead
+        return []
+
+
+async def fetch_many(
+    *,
+    beatmap_ids: list[int],
+    beatmap_md5s: list[str],
+    fresh: bool = False,
+) -> BeatmapBatchLookup:
+    """\
+    Look up many beatmaps at once, by their ids and/or md5s.
+
+    Known beatmaps are read together, and stale ones revalidated as they
+    would be for single lookups. Beatmaps we've never seen are fetched from osu!
+    api v1, several at a time; once one is found, the rest of its set is
+    fetched & saved with it, so other misses from the same set which haven't
+    been started yet need no further requests.
+
+    Beatmaps which can't be found (or fetched) are left out of the results.
+    """
+    requested_beatmap_ids = dict.fromkeys(beatmap_ids)
+    requested_beatmap_md5s = dict.fromkeys(beatmap_md5s)
+
+    known_beatmaps = await akatsuki_beatmaps.fetch_many(
+        beatmap_ids=list(requested_beatmap_ids),
+        beatmap_md5s=list(requested_beatmap_md5s),
+    )
+
+    semaphore = asyncio.Semaphore(BATCH_LOOKUP_REFRESH_CONCURRENCY)
+
+    async def revalidate(beatmap: AkatsukiBeatmap) -> AkatsukiBeatmap | None:
+        if not fresh:
+            return await _revalidate(beatmap, fresh=False)
+        async with semaphore:
+            return await _revalidate(beatmap, fresh=True)
+
+    current_beatmaps = await asyncio.gather(*map(revalidate, known_beatmaps))
+
+    lookup = BeatmapBatchLookup(by_id={}, by_md5={})
+    missing_beatmap_ids = requested_beatmap_ids.copy()
+    missing_beatmap_md5s = requested_beatmap_md5s.copy()
+
+    def resolve(
+        requested_beatmap: AkatsukiBeatmap,
+        beatmap: AkatsukiBeatmap | None,
+    ) -> None:
+        if requested_beatmap.beatmap_id in missing_beatmap_ids:
+            del missing_beatmap_ids[requested_beatmap.beatmap_id]
+            if beatmap is not None:
+                lookup.by_id[requested_beatmap.beatmap_id] = beatmap
+        if requested_beatmap.beatmap_md5 in missing_beatmap_md5s:
+            del missing_beatmap_md5s[requested_beatmap.beatmap_md5]
+            if beatmap is not None:
+                lookup.by_md5[requested_beatmap.beatmap_md5] = beatmap
+
+    # (a refresh may have deleted the beatmap, or given it a new md5)
+    for known_beatmap, current_beatmap in zip(known_beatmaps, current_beatmaps):
+        resolve(known_beatmap, current_beatmap)
+
+    async def resolve_misses() -> None:
+        # Workers take misses one at a time; any resolved by a sibling set
+        # fetch in the meantime are no longer missing, and are skipped
+        while missing_beatmap_ids or missing_beatmap_md5s:
+            if missing_beatmap_ids:
+                beatmap_id = next(iter(missing_beatmap_ids))
+                del missing_beatmap_ids[beatmap_id]
+                beatmap = await _fetch_one_for_batch(
+                    beatmap_id=beatmap_id,
+                    fresh=fresh,
+                )
+                if beatmap is not None:
+                    lookup.by_id[beatmap_id] = beatmap
+            else:
+                beatmap_md5 = next(iter(missing_beatmap_md5s))
+                del missing_beatmap_md5s[beatmap_md5]
+                beatmap = await _fetch_one_for_batch(
+                    beatmap_md5=beatmap_md5,
+                    fresh=fresh,
+                )
+                if beatmap is not None:
+                    lookup.by_md5[beatmap_md5] = beatmap
 
-    elif beatmap.deserves_update:
-        try:
-            beatmap = await _update_from_osu_api(beatmap)
             if beatmap is None:
-                # (we may have deleted the map during the update)
-                return None
-        except Exception:
-            logging.warning(
-                "Failed to update beatmap requested by md5 (using old beatmap for now)",
-                extra={
-                    "beatmap": beatmap.model_dump() if beatmap else None,
-                    "beatmap_md5": beatmap_md5,
-                },
-            )
+                continue
+
+            # (it may have been requested by both its id and md5)
+            resolve(beatmap, beatmap)
+            if missing_beatmap_ids or missing_beatmap_md5s:
+                for sibling_beatmap in await _update_beatmapset_for_batch(
+                    beatmap.beatmapset_id,
+                ):
+                    resolve(sibling_beatmap, sibling_beatmap)
+
+    await asyncio.gather(
+        *[resolve_misses() for _ in range(BATCH_LOOKUP_REFRESH_CONCURRENCY)],
+    )
 
-    return beatmap
+    return lookup
@@ -0,0 +1,83 @@
+from collections.abc import AsyncIterator
+from collections.abc import Awaitable
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from app.adapters import aws_s3
+from app.adapters import osu_mirrors
+from app.adapters.osu_mirrors.backends import BeatmapMirrorStream
+from app.usecases import cached_streams
+
+MP3_MEDIA_TYPE = "audio/mpeg"
+OGG_MEDIA_TYPE = "audio/ogg"
+
+
+@dataclass
+class AudioFileStream:
+    content_length: int | None
+    media_type: str
+    chunks: AsyncIterator[bytes]
+
+
+def _audio_file_object_key(beatmap_id: int) -> str:
+    return f"/audio/{beatmap_id}"
+
+
+def _audio_preview_object_key(beatmap_id: int) -> str:
+    return f"/audio-previews/{beatmap_id}"
+
+
+def _detect_media_type(first_chunk: bytes) -> str:
+    # Nearly all beatmaps use mp3 audio, but some older ones use ogg vorbis
+    if first_chunk.startswith(b"OggS"):
+        return OGG_MEDIA_TYPE
+    return MP3_MEDIA_TYPE
+
+
+async def _stream_audio(
+    object_key: str,
+    open_mirror_stream: Callable[[], Awaitable[BeatmapMirrorStream | None]],
+) -> AudioFileStream | None:
+    cached_stream = await aws_s3.stream_object_data(object_key)
+    if cached_stream is not None:
+        return AudioFileStream(
+            content_length=cached_stream.content_length,
+            media_type=cached_stream.content_type or MP3_MEDIA_TYPE,
+            chunks=cached_stream.chunks,
+        )
+
+    mirror_stream = await open_mirror_stream()
+    if mirror_stream is None:
+        return None
+
+    media_type = _detect_media_type(mirror_stream.first_chunk)
+    return AudioFileStream(
+        content_length=mirror_stream.content_length,
+        media_type=media_type,
+        chunks=cached_streams.stream_through_cache(
+            object_key,
+            mirror_stream,
+            content_type=media_type,
+        ),
+    )
+
+
+async def stream_beatmap_audio_file(beatmap_id: int) -> AudioFileStream | None:
+    return await _stream_audio(
+        _audio_file_object_key(beatmap_id),
+        lambda: osu_mirrors.stream_beatmap_audio(beatmap_id),
+    )
+
+
+async def stream_beatmap_audio_preview(beatmap_id: int) -> AudioFileStream | None:
+    return await _stream_audio(
+        _audio_preview_object_key(beatmap_id),
+        lambda: osu_mirrors.stream_beatmap_audio_preview(beatmap_id),
+    )
+
+
+async def invalidate_beatmap_audio(beatmap_id: int) -> None:
+    await cached_streams.invalidate_cached_object(_audio_file_object_key(beatmap_id))
+    await cached_streams.invalidate_cached_object(
+        _audio_preview_object_key(beatmap_id),
+    )
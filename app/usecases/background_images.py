@@ -0,0 +1,189 @@
+import logging
+from dataclasses import dataclass
+
+from app import image_processing
+from app import job_scheduling
+from app import request_coalescing
+from app import settings
+from app.adapters import aws_s3
+from app.adapters import osu_mirrors
+from app.image_processing import ImageFormat
+from app.memory_cache import LRUCache
+from app.usecases.osu_files import hash_content
+
+# Bounds how long a replica may serve an image invalidated by another replica
+BACKGROUND_IMAGE_MEMORY_CACHE_TTL_SECONDS = 60 * 60
+
+# Only a few sizes may be requested, to keep the number of cached variants small
+ALLOWED_BACKGROUND_IMAGE_VARIANT_DIMENSIONS = {80, 160, 320, 640, 1280}
+
+
+@dataclass(frozen=True)
+class BackgroundImage:
+    data: bytes
+    etag: str
+    media_type: str = ImageFormat.JPEG.media_type
+
+
+@dataclass(frozen=True)
+class BackgroundImageVariant:
+    max_width: int | None
+    max_height: int | None
+    image_format: ImageFormat
+
+    @property
+    def is_allowed(self) -> bool:
+        return all(
+            dimension is None
+            or dimension in ALLOWED_BACKGROUND_IMAGE_VARIANT_DIMENSIONS
+            for dimension in (self.max_width, self.max_height)
+        )
+
+    @property
+    def name(self) -> str:
+        return f"w{self.max_width or 0}-h{self.max_height or 0}.{self.image_format}"
+
+
+def _background_image_size(background_image: BackgroundImage) -> int:
+    return len(background_image.data)
+
+
+BACKGROUND_IMAGE_MEMORY_CACHE: LRUCache[int, BackgroundImage] = LRUCache(
+    max_size=settings.BACKGROUND_IMAGE_MEMORY_CACHE_MAX_BYTES,
+    size_func=_background_image_size,
+    ttl_seconds=BACKGROUND_IMAGE_MEMORY_CACHE_TTL_SECONDS,
+)
+
+
+BACKGROUND_IMAGE_VARIANT_MEMORY_CACHE: LRUCache[
+    tuple[int, str, BackgroundImageVariant],
+    BackgroundImage,
+] = LRUCache(
+    max_size=settings.BACKGROUND_IMAGE_VARIANT_MEMORY_CACHE_MAX_BYTES,
+    size_func=_background_image_size,
+)
+
+
+def _background_image_object_key(beatmap_id: int) -> str:
+    return f"/backgrounds/{beatmap_id}.jpg"
+
+
+def _background_image_variant_object_key(
+    beatmap_id: int,
+    source_etag: str,
+    variant: BackgroundImageVariant,
+) -> str:
+    # Variants are keyed by their source image, so they
+    # go stale along with it, without needing invalidation
+    return f"/backgrounds/{beatmap_id}/{source_etag}/{variant.name}"
+
+
+def _create_background_image(data: bytes) -> BackgroundImage:
+    return BackgroundImage(data=data, etag=hash_content(data))
+
+
+async def _save_background_image_to_cache(beatmap_id: int, data: bytes) -> None:
+    await aws_s3.save_object_data(_background_image_object_key(beatmap_id), data)
+    logging.info(
+        "Saved beatmap background image to s3",
+        extra={"beatmap_id": beatmap_id},
+    )
+
+
+async def fetch_beatmap_background_image(beatmap_id: int) -> BackgroundImage | None:
+    background_image = BACKGROUND_IMAGE_MEMORY_CACHE.get(beatmap_id)
+    if background_image is not None:
+        return background_image
+
+    background_image_data = await aws_s3.get_object_data(
+        _background_image_object_key(beatmap_id),
+    )
+    if background_image_data is None:
+        background_image_data = await osu_mirrors.fetch_beatmap_background_image(
+            beatmap_id,
+        )
+        if background_image_data is None:
+            return None
+
+        job_scheduling.schedule_job(
+            _save_background_image_to_cache(beatmap_id, background_image_data),
+        )
+
+    background_image = _create_background_image(background_image_data)
+    BACKGROUND_IMAGE_MEMORY_CACHE.set(beatmap_id, background_image)
+    return background_image
+
+
+async def _fetch_beatmap_background_image_variant(
+    beatmap_id: int,
+    source_image: BackgroundImage,
+    variant: BackgroundImageVariant,
+) -> BackgroundImage | None:
+    object_key = _background_image_variant_object_key(
+        beatmap_id,
+        source_image.etag,
+        variant,
+    )
+    variant_data = await aws_s3.get_object_data(object_key)
+    if variant_data is None:
+        variant_data = await image_processing.resize_image(
+            source_image.data,
+            max_width=variant.max_width,
+            max_height=variant.max_height,
+            image_format=variant.image_format,
+        )
+        if variant_data is None:
+            # e.g. a mirror served something other than an image
+            logging.warning(
+                "Failed to decode beatmap background image",
+                extra={"beatmap_id": beatmap_id, "source_etag": source_image.etag},
+            )
+            return None
+
+        job_scheduling.schedule_job(aws_s3.save_object_data(object_key, variant_data))
+
+    return BackgroundImage(
+        data=variant_data,
+        etag=hash_content(variant_data),
+        media_type=variant.image_format.media_type,
+    )
+
+
+async def fetch_beatmap_background_image_variant(
+    beatmap_id: int,
+    variant: BackgroundImageVariant,
+) -> BackgroundImage | None:
+    """\
+    Fetch a background image, resized and/or re-encoded.
+
+    Returns None if the image doesn't exist, or could not be decoded.
+    """
+    source_image = await fetch_beatmap_background_image(beatmap_id)
+    if source_image is None:
+        return None
+
+    cache_key = (beatmap_id, source_image.etag, variant)
+    background_image = BACKGROUND_IMAGE_VARIANT_MEMORY_CACHE.get(cache_key)
+    if background_image is not None:
+        return background_image
+
+    background_image = await request_coalescing.coalesce(
+        (
+            "background_images",
+            "variant",
+            f"{beatmap_id}/{source_image.etag}/{variant.name}",
+        ),
+        lambda: _fetch_beatmap_background_image_variant(
+            beatmap_id,
+            source_image,
+            variant,
+        ),
+    )
+    if background_image is not None:
+        BACKGROUND_IMAGE_VARIANT_MEMORY_CACHE.set(cache_key, background_image)
+    return background_image
+
+
+async def invalidate_beatmap_background_image(beatmap_id: int) -> None:
+    BACKGROUND_IMAGE_MEMORY_CACHE.delete(beatmap_id)
+    await aws_s3.delete_object(_background_image_object_key(beatmap_id))
@@ -0,0 +1,129 @@
+"""\
+Writing mirror downloads through to the s3 cache as they're streamed.
+
+Large files (archives, audio) are streamed to clients as they arrive from
+a mirror, rather than buffered; a copy is set aside on the way through, and
+saved to s3 once the whole body has been received.
+
+Cached objects must be invalidated through `invalidate_cached_object`, so
+that copies of their old versions still being streamed aren't saved over
+the invalidation once their streams complete.
+"""
+
+import logging
+import tempfile
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from typing import IO
+
+from app import job_scheduling
+from app.adapters import aws_s3
+from app.adapters.osu_mirrors.backends import BeatmapMirrorStream
+
+# Bodies being written through to the cache are spooled to disk
+# beyond this size, to keep memory use bounded on large downloads
+CACHE_SPOOL_MAX_MEMORY_SIZE = 1024 * 1024
+
+
+@dataclass
+class _PendingWrites:
+    # Streams (and their uploads) which may still write to the object
+    count: int = 0
+    # Bumped by each invalidation of the object while writes are pending
+    generation: int = 0
+
+
+PENDING_WRITES: dict[str, _PendingWrites] = {}
+
+
+def _acquire_pending_writes(object_key: str) -> _PendingWrites:
+    pending_writes = PENDING_WRITES.setdefault(object_key, _PendingWrites())
+    pending_writes.count += 1
+    return pending_writes
+
+
+def _release_pending_writes(object_key: str) -> None:
+    pending_writes = PENDING_WRITES[object_key]
+    pending_writes.count -= 1
+    if pending_writes.count == 0:
+        del PENDING_WRITES[object_key]
+
+
+async def _save_spool_to_cache(
+    object_key: str,
+    spool: IO[bytes],
+    content_type: str | None,
+    *,
+    pending_writes: _PendingWrites,
+    generation: int,
+) -> None:
+    try:
+        if pending_writes.generation != generation:
+            logging.info(
+                "Skipped saving mirror download to s3, as it was invalidated",
+                extra={"object_key": object_key},
+            )
+            return None
+
+        spool.seek(0)
+        await aws_s3.save_object_data(object_key, spool, content_type=content_type)
+        if pending_writes.generation != generation:
+            # Invalidated while uploading; the invalidation's delete may
+            # have been applied before our upload, so delete it again
+            await aws_s3.delete_object(object_key)
+            return None
+
+        logging.info(
+            "Saved mirror download to s3",
+            extra={"object_key": object_key},
+        )
+    finally:
+        spool.close()
+        _release_pending_writes(object_key)
+
+
+async def stream_through_cache(
+    object_key: str,
+    mirror_stream: BeatmapMirrorStream,
+    *,
+    content_type: str | None = None,
+) -> AsyncIterator[bytes]:
+    """\
+    Yield a mirror's response body, while copying it aside for the cache.
+
+    The copy is only written to s3 if the whole body was received; if the
+    client goes away part way through, the partial copy is thrown away.
+    """
+    pending_writes = _acquire_pending_writes(object_key)
+    generation = pending_writes.generation
+
+    spool = tempfile.SpooledTemporaryFile(max_size=CACHE_SPOOL_MAX_MEMORY_SIZE)
+    completed = False
+    try:
+        async for chunk in mirror_stream.iter_bytes():
+            spool.write(chunk)
+            yield chunk
+        completed = mirror_stream.content_length in (None, spool.tell())
+    finally:
+        if completed:
+            job_scheduling.schedule_job(
+                _save_spool_to_cache(
+                    object_key,
+                    spool,
+                    content_type,
+                    pending_writes=pending_writes,
+                    generation=generation,
+                ),
+            )
+        else:
+            spool.close()
+            _release_pending_writes(object_key)
+
+
+async def invalidate_cached_object(object_key: str) -> None:
+    """Delete an object from the cache, and any pending writes of its old version."""
+    pending_writes = PENDING_WRITES.get(object_key)
+    if pending_writes is not None:
+        pending_writes.generation += 1
+
+    await aws_s3.delete_object(object_key)
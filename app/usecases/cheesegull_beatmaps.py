@@ -12,6 +12,7 @@ from app.common_models import CheesegullBeatmapset
 from app.common_models import CheesegullRankedStatus
 from app.common_models import GameMode
 from app.common_models import RankedStatus
+from app.usecases import osz_prefetching
 
 
 def cheesegull_beatmap_from_osu_api_beatmap(
@@ -146,6 +147,12 @@ async def fetch_one_cheesegull_beatmapset(
             if cheesegull_beatmapset is None:
                 return None
 
+        if cheesegull_beatmapset is not None and osz_prefetching.is_recently_ranked(
+            RankedStatus.from_osu_api(cheesegull_beatmapset.RankedStatus),
+            cheesegull_beatmapset.LastUpdate,
+        ):
+            osz_prefetching.osz_prefetcher.enqueue(beatmapset_id)
+
         logging.debug(
             "Serving cheesegull beatmapset",
             extra={
@@ -1,47 +1,99 @@
+import asyncio
 import hashlib
 import logging
+from dataclasses import dataclass
 
+from app import job_scheduling
 from app.adapters import aws_s3
 from app.adapters import osu_api_v1
 from app.repositories import akatsuki_beatmaps
+from app.repositories.akatsuki_beatmaps import AkatsukiBeatmap
+from app.usecases import osz_files
+
+# Bounds how many s3 reads & osu! api requests a single set's bundle may make at once
+BEATMAPSET_OSU_FILES_FETCH_CONCURRENCY = 8
+
+
+@dataclass
+class OsuFileValidators:
+    beatmap_md5: str
+    latest_update: int
 
 
 def hash_content(content: bytes) -> str:
     return hashlib.md5(content).hexdigest()
 
 
-async def _osu_file_cache_expired(
-    *,
+async def fetch_beatmap_osu_file_validators(
     beatmap_id: int,
-    beatmap_osu_file_data: bytes,
-) -> bool:
+) -> OsuFileValidators | None:
+    """\
+    Fetch what we currently know of a beatmap's .osu file version.
+
+    This only reads the database, so that clients with a current copy of the
+    file can be answered cheaply; it may lag behind osu! until the beatmap's
+    next update, in the same way as the s3 cache does.
+    """
     akatsuki_beatmap = await akatsuki_beatmaps.fetch_one_by_id(beatmap_id)
-    return (
-        akatsuki_beatmap is None
-        or hash_content(beatmap_osu_file_data) != akatsuki_beatmap.beatmap_md5
+    if akatsuki_beatmap is None:
+        return None
+    return OsuFileValidators(
+        beatmap_md5=akatsuki_beatmap.beatmap_md5,
+        latest_update=akatsuki_beatmap.latest_update,
     )
 
 
-async def fetch_beatmap_osu_file_data(beatmap_id: int) -> bytes | None:
-    beatmap_osu_file_data = await aws_s3.get_object_data(f"/beatmaps/{beatmap_id}.osu")
-    if beatmap_osu_file_data is not None:
-        if not await _osu_file_cache_expired(
-            beatmap_id=beatmap_id,
-            beatmap_osu_file_data=beatmap_osu_file_data,
-        ):
-            return beatmap_osu_file_data
+async def fetch_beatmap_osu_file_data_by_md5(beatmap_md5: str) -> bytes | None:
+    """Fetch the .osu file with exactly this md5, if it's still current."""
+    akatsuki_beatmap = await akatsuki_beatmaps.fetch_one_by_md5(beatmap_md5)
+    if akatsuki_beatmap is None:
+        return None
+
+    beatmap_osu_file_data = await fetch_beatmap_osu_file_data(
+        akatsuki_beatmap.beatmap_id,
+    )
+    if (
+        beatmap_osu_file_data is None
+        or hash_content(beatmap_osu_file_data) != beatmap_md5
+    ):
+        return None
+
+    return beatmap_osu_file_data
+
 
+def _osu_file_object_key(beatmap_id: int) -> str:
+    return f"/beatmaps/{beatmap_id}.osu"
+
+
+async def _fetch_cached_osu_file_data(
+    beatmap_id: int,
+    akatsuki_beatmap: AkatsukiBeatmap | None,
+) -> bytes | None:
+    beatmap_osu_file_data = await aws_s3.get_object_data(
+        _osu_file_object_key(beatmap_id),
+    )
+    if beatmap_osu_file_data is None:
+        return None
+
+    if (
+        akatsuki_beatmap is None
+        or hash_content(beatmap_osu_file_data) != akatsuki_beatmap.beatmap_md5
+    ):
         logging.info(
             "Updating expired beatmap s3 osu file cache",
             extra={"beatmap_id": beatmap_id},
         )
-
-    beatmap_osu_file_data = await osu_api_v1.fetch_beatmap_osu_file_data(beatmap_id)
-    if beatmap_osu_file_data is None:
         return None
 
+    return beatmap_osu_file_data
+
+
+async def _save_osu_file_data_to_cache(
+    beatmap_id: int,
+    beatmap_osu_file_data: bytes,
+) -> None:
     await aws_s3.save_object_data(
-        f"/beatmaps/{beatmap_id}.osu",
+        _osu_file_object_key(beatmap_id),
         beatmap_osu_file_data,
     )
     logging.info(
@@ -54,4 +106,125 @@ async def fetch_beatmap_osu_file_data(beatmap_id: int) -> bytes | None:
     #       which rely on .osu files will also fetch the beatmap metadata,
     #       forcing an update to occur.
 
+
+async def _fetch_osu_files_from_cached_osz_file(
+    beatmapset_id: int,
+    akatsuki_beatmaps_: list[AkatsukiBeatmap],
+) -> dict[int, bytes]:
+    osu_files_by_md5 = await osz_files.fetch_osu_files_from_cached_osz_file(
+        beatmapset_id,
+        beatmap_md5s={beatmap.beatmap_md5 for beatmap in akatsuki_beatmaps_},
+        preferred_file_names={beatmap.file_name for beatmap in akatsuki_beatmaps_},
+    )
+    osu_files: dict[int, bytes] = {}
+    for beatmap in akatsuki_beatmaps_:
+        beatmap_osu_file_data = osu_files_by_md5.get(beatmap.beatmap_md5)
+        if beatmap_osu_file_data is not None:
+            osu_files[beatmap.beatmap_id] = beatmap_osu_file_data
+
+    if osu_files:
+        logging.info(
+            "Extracted beatmap osu files from cached osz file",
+            extra={
+                "beatmapset_id": beatmapset_id,
+                "beatmap_ids": sorted(osu_files),
+            },
+        )
+    return osu_files
+
+
+async def fetch_beatmap_osu_file_data(beatmap_id: int) -> bytes | None:
+    akatsuki_beatmap = await akatsuki_beatmaps.fetch_one_by_id(beatmap_id)
+
+    beatmap_osu_file_data = await _fetch_cached_osu_file_data(
+        beatmap_id,
+        akatsuki_beatmap,
+    )
+    if beatmap_osu_file_data is not None:
+        return beatmap_osu_file_data
+
+    # osu! api v1 is our most rate limited upstream; if we already have
+    # the set's archive cached, the .osu file can be taken from there
+    if akatsuki_beatmap is not None:
+        osu_files = await _fetch_osu_files_from_cached_osz_file(
+            akatsuki_beatmap.beatmapset_id,
+            [akatsuki_beatmap],
+        )
+        beatmap_osu_file_data = osu_files.get(beatmap_id)
+
+    if beatmap_osu_file_data is None:
+        beatmap_osu_file_data = await osu_api_v1.fetch_beatmap_osu_file_data(
+            beatmap_id,
+        )
+        if beatmap_osu_file_data is None:
+            return None
+
+    await _save_osu_file_data_to_cache(beatmap_id, beatmap_osu_file_data)
     return beatmap_osu_file_data
+
+
+async def fetch_beatmapset_osu_files(beatmapset_id: int) -> dict[int, bytes] | None:
+    """\
+    Fetch the .osu files of every beatmap we know of in a set, by beatmap id.
+
+    Beatmaps are looked up with a single query, and their cached files are
+    read in parallel; missing files are then taken from the set's cached
+    .osz archive where possible, and otherwise from osu! api v1. Beatmaps
+    whose files can't be found anywhere are left out.
+    """
+    akatsuki_beatmaps_ = await akatsuki_beatmaps.fetch_many_by_beatmapset_id(
+        beatmapset_id,
+    )
+    if not akatsuki_beatmaps_:
+        return None
+
+    semaphore = asyncio.Semaphore(BEATMAPSET_OSU_FILES_FETCH_CONCURRENCY)
+
+    async def fetch_cached(beatmap: AkatsukiBeatmap) -> bytes | None:
+        async with semaphore:
+            return await _fetch_cached_osu_file_data(beatmap.beatmap_id, beatmap)
+
+    async def fetch_from_osu_api(beatmap_id: int) -> bytes | None:
+        async with semaphore:
+            return await osu_api_v1.fetch_beatmap_osu_file_data(beatmap_id)
+
+    cached_osu_files = await asyncio.gather(
+        *(fetch_cached(beatmap) for beatmap in akatsuki_beatmaps_),
+    )
+    osu_files = {
+        beatmap.beatmap_id: beatmap_osu_file_data
+        for beatmap, beatmap_osu_file_data in zip(akatsuki_beatmaps_, cached_osu_files)
+        if beatmap_osu_file_data is not None
+    }
+
+    missing_beatmaps = [
+        beatmap for beatmap in akatsuki_beatmaps_ if beatmap.beatmap_id not in osu_files
+    ]
+    if not missing_beatmaps:
+        return osu_files
+
+    fetched_osu_files = await _fetch_osu_files_from_cached_osz_file(
+        beatmapset_id,
+        missing_beatmaps,
+    )
+    missing_beatmap_ids = [
+        beatmap.beatmap_id
+        for beatmap in missing_beatmaps
+        if beatmap.beatmap_id not in fetched_osu_files
+    ]
+    osu_api_osu_files = await asyncio.gather(
+        *(fetch_from_osu_api(beatmap_id) for beatmap_id in missing_beatmap_ids),
+    )
+    for beatmap_id, beatmap_osu_file_data in zip(
+        missing_beatmap_ids,
+        osu_api_osu_files,
+    ):
+        if beatmap_osu_file_data is not None:
+            fetched_osu_files[beatmap_id] = beatmap_osu_file_data
+
+    for beatmap_id, beatmap_osu_file_data in fetched_osu_files.items():
+        job_scheduling.schedule_job(
+            _save_osu_file_data_to_cache(beatmap_id, beatmap_osu_file_data),
+        )
+
+    return osu_files | fetched_osu_files
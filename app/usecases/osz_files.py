@@ -0,0 +1,384 @@
+import hashlib
+import logging
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+
+from app import request_coalescing
+from app import zip_archives
+from app.adapters import aws_s3
+from app.adapters import osu_mirrors
+from app.adapters.osu_mirrors.backends import BeatmapMirrorStream
+from app.byte_ranges import ByteRange
+from app.byte_ranges import ContentRange
+from app.usecases import cached_streams
+from app.zip_archives import ZipMember
+
+# Read along with each member's fixed-size local header, to usually cover its
+# variable-length file name & extra field without a second request to s3
+LOCAL_HEADER_READ_ALLOWANCE = 1024
+
+
+@dataclass
+class OszFileStream:
+    content_length: int | None
+    # Set when only part of the archive is being streamed
+    content_range: ContentRange | None
+    chunks: AsyncIterator[bytes]
+
+
+@dataclass
+class OszFileMetadata:
+    content_length: int
+    etag: str
+    last_modified: int
+
+
+@dataclass
+class MirroredOszFileMetadata:
+    # Unknown if the mirror didn't say, e.g. for a compressed response
+    content_length: int | None
+
+
+@dataclass
+class UnsatisfiableRange:
+    total_size: int
+
+
+def _osz_file_object_key(beatmapset_id: int) -> str:
+    return f"/beatmapsets/{beatmapset_id}.osz"
+
+
+def _stream_through_cache(
+    beatmapset_id: int,
+    mirror_stream: BeatmapMirrorStream,
+) -> AsyncIterator[bytes]:
+    return cached_streams.stream_through_cache(
+        _osz_file_object_key(beatmapset_id),
+        mirror_stream,
+    )
+
+
+async def _slice_stream(
+    mirror_stream: BeatmapMirrorStream,
+    start: int,
+    end: int,
+) -> AsyncIterator[bytes]:
+    """Yield only the bytes from `start` to `end` (inclusive) of a full body."""
+    position = 0
+    try:
+        async for chunk in mirror_stream.iter_bytes():
+            chunk_end = position + len(chunk)
+            if chunk_end > start:
+                yield chunk[max(start - position, 0) : end + 1 - position]
+            position = chunk_end
+            if position > end:
+                break
+    finally:
+        await mirror_stream.aclose()
+
+
+async def _stream_osz_file_range(
+    beatmapset_id: int,
+    byte_range: ByteRange,
+) -> OszFileStream | UnsatisfiableRange | None:
+    """\
+    Stream part of an archive, from the cache if present or else a mirror.
+
+    Partial responses are not written through to the cache.
+    """
+    object_key = _osz_file_object_key(beatmapset_id)
+    cached_metadata = await aws_s3.get_object_metadata(object_key)
+    if cached_metadata is not None:
+        total_size = cached_metadata.content_length
+        resolved_range = byte_range.resolve(total_size)
+        if resolved_range is None:
+            return UnsatisfiableRange(total_size=total_size)
+
+        cached_stream = await aws_s3.stream_object_data(
+            object_key,
+            byte_range=resolved_range,
+        )
+        if cached_stream is not None:
+            start, end = resolved_range
+            content_range = ContentRange(start=start, end=end, total_size=total_size)
+            return OszFileStream(
+                content_length=content_range.length,
+                content_range=content_range,
+                chunks=cached_stream.chunks,
+            )
+
+    mirror_stream = await osu_mirrors.stream_beatmap_zip_data(
+        beatmapset_id,
+        byte_range=byte_range,
+    )
+    if mirror_stream is None:
+        return None
+
+    if mirror_stream.content_range is not None:
+        return OszFileStream(
+            content_length=mirror_stream.content_range.length,
+            content_range=mirror_stream.content_range,
+            chunks=mirror_stream.iter_bytes(),
+        )
+
+    # The mirror ignored the range & sent the whole archive. If we don't
+    # know its size, we can't place the range; serve the whole thing.
+    if mirror_stream.content_length is None:
+        return OszFileStream(
+            content_length=None,
+            content_range=None,
+            chunks=_stream_through_cache(beatmapset_id, mirror_stream),
+        )
+
+    total_size = mirror_stream.content_length
+    resolved_range = byte_range.resolve(total_size)
+    if resolved_range is None:
+        await mirror_stream.aclose()
+        return UnsatisfiableRange(total_size=total_size)
+
+    start, end = resolved_range
+    content_range = ContentRange(start=start, end=end, total_size=total_size)
+    return OszFileStream(
+        content_length=content_range.length,
+        content_range=content_range,
+        chunks=_slice_stream(mirror_stream, start, end),
+    )
+
+
+async def stream_beatmapset_osz_file(
+    beatmapset_id: int,
+    *,
+    byte_range: ByteRange | None = None,
+) -> OszFileStream | UnsatisfiableRange | None:
+    if byte_range is not None:
+        return await _stream_osz_file_range(beatmapset_id, byte_range)
+
+    cached_stream = await aws_s3.stream_object_data(
+        _osz_file_object_key(beatmapset_id),
+    )
+    if cached_stream is not None:
+        return OszFileStream(
+            content_length=cached_stream.content_length,
+            content_range=None,
+            chunks=cached_stream.chunks,
+        )
+
+    mirror_stream = await osu_mirrors.stream_beatmap_zip_data(beatmapset_id)
+    if mirror_stream is None:
+        return None
+
+    return OszFileStream(
+        content_length=mirror_stream.content_length,
+        content_range=None,
+        chunks=_stream_through_cache(beatmapset_id, mirror_stream),
+    )
+
+
+async def fetch_cached_beatmapset_osz_file_metadata(
+    beatmapset_id: int,
+) -> OszFileMetadata | None:
+    """\
+    Fetch the metadata of a set's archive, if it is in the cache.
+
+    The validators are the cached object's own, so they only change
+    when the archive itself does.
+    """
+    cached_metadata = await aws_s3.get_object_metadata(
+        _osz_file_object_key(beatmapset_id),
+    )
+    if cached_metadata is None:
+        return None
+
+    return OszFileMetadata(
+        content_length=cached_metadata.content_length,
+        etag=cached_metadata.etag,
+        last_modified=cached_metadata.last_modified,
+    )
+
+
+async def _probe_mirrors_for_osz_file(
+    beatmapset_id: int,
+) -> MirroredOszFileMetadata | None:
+    mirror_stream = await osu_mirrors.stream_beatmap_zip_data(beatmapset_id)
+    if mirror_stream is None:
+        return None
+
+    # Only the response head was wanted
+    await mirror_stream.aclose()
+    return MirroredOszFileMetadata(content_length=mirror_stream.content_length)
+
+
+async def fetch_mirrored_beatmapset_osz_file_metadata(
+    beatmapset_id: int,
+) -> MirroredOszFileMetadata | None:
+    """\
+    Find a set's archive on the mirrors, as a download of it would.
+
+    Only the start of the response is read. Concurrent calls for the
+    same set share a single probe. Returns None if no mirror has it.
+    """
+    return await request_coalescing.coalesce(
+        ("osu_mirrors", "osz_file_metadata", beatmapset_id),
+        lambda: _probe_mirrors_for_osz_file(beatmapset_id),
+    )
+
+
+async def is_beatmapset_osz_file_cached(beatmapset_id: int) -> bool:
+    cached_metadata = await aws_s3.get_object_metadata(
+        _osz_file_object_key(beatmapset_id),
+    )
+    return cached_metadata is not None
+
+
+async def prefetch_beatmapset_osz_file(beatmapset_id: int) -> int | None:
+    """\
+    Download an archive from the mirrors into the cache.
+
+    Returns the archive's size, or None if no mirror has it.
+    """
+    mirror_stream = await osu_mirrors.stream_beatmap_zip_data(beatmapset_id)
+    if mirror_stream is None:
+        return None
+
+    size_bytes = 0
+    async for chunk in _stream_through_cache(beatmapset_id, mirror_stream):
+        size_bytes += len(chunk)
+    return size_bytes
+
+
+async def invalidate_beatmapset_osz_file(beatmapset_id: int) -> None:
+    await cached_streams.invalidate_cached_object(_osz_file_object_key(beatmapset_id))
+
+
+async def _read_cached_osz_file_member(
+    object_key: str,
+    member: ZipMember,
+) -> bytes | None:
+    read_size = (
+        zip_archives.LOCAL_FILE_HEADER_STRUCT.size
+        + LOCAL_HEADER_READ_ALLOWANCE
+        + member.compressed_size
+    )
+    member_data = await aws_s3.get_object_data(
+        object_key,
+        byte_range=(
+            member.local_header_offset,
+            member.local_header_offset + read_size - 1,
+        ),
+    )
+    if member_data is None:
+        return None
+
+    local_header_size = zip_archives.get_local_header_size(member_data)
+    if local_header_size is None:
+        return None
+
+    if local_header_size + member.compressed_size > len(member_data):
+        # An unusually long file name or extra field; read exactly what we need
+        data_offset = member.local_header_offset + local_header_size
+        compressed_data = await aws_s3.get_object_data(
+            object_key,
+            byte_range=(data_offset, data_offset + member.compressed_size - 1),
+        )
+        if compressed_data is None:
+            return None
+    else:
+        compressed_data = member_data[
+            local_header_size : local_header_size + member.compressed_size
+        ]
+
+    return zip_archives.decompress_member(member, compressed_data)
+
+
+async def _fetch_cached_osz_file_members(
+    object_key: str,
+) -> list[ZipMember] | None:
+    cached_metadata = await aws_s3.get_object_metadata(object_key)
+    if cached_metadata is None:
+        return None
+
+    archive_size = cached_metadata.content_length
+    tail_start = max(
+        archive_size - zip_archives.MAX_END_OF_CENTRAL_DIRECTORY_SIZE,
+        0,
+    )
+    archive_tail = await aws_s3.get_object_data(
+        object_key,
+        byte_range=(tail_start, archive_size - 1),
+    )
+    if archive_tail is None:
+        return None
+
+    location = zip_archives.find_central_directory(archive_tail)
+    if location is None or location.offset + location.size > archive_size:
+        return None
+
+    if location.offset >= tail_start:
+        # Usually, the central directory is small enough to be in the tail
+        central_directory_start = location.offset - tail_start
+        central_directory: bytes | None = archive_tail[
+            central_directory_start : central_directory_start + location.size
+        ]
+    else:
+        central_directory = await aws_s3.get_object_data(
+            object_key,
+            byte_range=(location.offset, location.offset + location.size - 1),
+        )
+    if central_directory is None:
+        return None
+
+    return zip_archives.parse_central_directory(central_directory)
+
+
+async def fetch_osu_files_from_cached_osz_file(
+    beatmapset_id: int,
+    *,
+    beatmap_md5s: set[str],
+    preferred_file_names: set[str] | None = None,
+) -> dict[str, bytes]:
+    """\
+    Extract .osu files from a set's cached .osz archive, by their md5s.
+
+    Only the archive's central directory and its .osu members are read,
+    stopping once every requested file has been found; members named in
+    `preferred_file_names` are tried first. Archives which are not in the
+    cache are not downloaded.
+    """
+    object_key = _osz_file_object_key(beatmapset_id)
+    members = await _fetch_cached_osz_file_members(object_key)
+    if members is None:
+        return {}
+
+    preferred_file_names = preferred_file_names or set()
+    candidate_members = sorted(
+        (
+            member
+            for member in members
+            if member.file_name.lower().endswith(".osu") and member.is_supported
+        ),
+        key=lambda member: member.file_name not in preferred_file_names,
+    )
+
+    osu_files: dict[str, bytes] = {}
+    for member in candidate_members:
+        if len(osu_files) == len(beatmap_md5s):
+            break
+
+        osu_file_data = await _read_cached_osz_file_member(object_key, member)
+        if osu_file_data is None:
+            continue
+
+        osu_file_md5 = hashlib.md5(osu_file_data).hexdigest()
+        if osu_file_md5 in beatmap_md5s:
+            osu_files[osu_file_md5] = osu_file_data
+
+    if len(osu_files) != len(beatmap_md5s):
+        logging.info(
+            "Cached beatmapset osz file did not contain all requested osu files",
+            extra={
+                "beatmapset_id": beatmapset_id,
+                "missing_beatmap_md5s": sorted(beatmap_md5s - osu_files.keys()),
+            },
+        )
+
+    return osu_files
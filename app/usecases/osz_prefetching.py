@@ -0,0 +1,178 @@
+"""\
+Speculative prefetching of beatmapset .osz files into the cache.
+
+When a set is newly ranked or qualified, many players download it within
+a short time of each other. Fetching the set into the cache ahead of them
+means that spike is served from the cache, rather than from the mirrors.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+
+from pydantic import BaseModel
+
+from app import settings
+from app.adapters.osu_mirrors.shared_health import shared_mirror_health
+from app.common_models import RankedStatus
+from app.usecases import osz_files
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# Statuses which bring a wave of downloads with them
+PREFETCH_RANKED_STATUSES = {
+    RankedStatus.RANKED,
+    RankedStatus.APPROVED,
+    RankedStatus.QUALIFIED,
+    RankedStatus.LOVED,
+}
+RECENTLY_RANKED_WINDOW_SECONDS = 24 * 60 * 60
+
+
+def is_recently_ranked(ranked_status: RankedStatus, ranked_at: datetime) -> bool:
+    return (
+        ranked_status in PREFETCH_RANKED_STATUSES
+        and time.time() - ranked_at.timestamp() < RECENTLY_RANKED_WINDOW_SECONDS
+    )
+
+
+class OszPrefetchStats(BaseModel):
+    queued: int
+    prefetched: int
+    already_cached: int
+    not_found: int
+    failed: int
+    dropped: int
+    over_budget: int
+    bytes_prefetched_today: int
+    byte_budget_today: int
+
+
+class OszPrefetcher:
+    def __init__(
+        self,
+        *,
+        max_queue_size: int,
+        concurrency: int,
+        daily_byte_budget: int,
+    ) -> None:
+        self.max_queue_size = max_queue_size
+        self.concurrency = concurrency
+        self.daily_byte_budget = daily_byte_budget
+
+        self._queue: asyncio.Queue[int] = asyncio.Queue(maxsize=max_queue_size)
+        # Sets which are queued or being prefetched, to avoid duplicate work
+        self._pending_beatmapset_ids: set[int] = set()
+        self._worker_tasks: list[asyncio.Task[None]] = []
+
+        self._budget_day = int(time.time() // SECONDS_PER_DAY)
+        self._bytes_prefetched_today = 0
+
+        self._prefetched_count = 0
+        self._already_cached_count = 0
+        self._not_found_count = 0
+        self._failed_count = 0
+        self._dropped_count = 0
+        self._over_budget_count = 0
+
+    def enqueue(self, beatmapset_id: int) -> None:
+        """Queue a set's .osz file to be prefetched. Never blocks."""
+        if beatmapset_id in self._pending_beatmapset_ids:
+            return None
+
+        try:
+            self._queue.put_nowait(beatmapset_id)
+        except asyncio.QueueFull:
+            self._dropped_count += 1
+            return None
+
+        self._pending_beatmapset_ids.add(beatmapset_id)
+
+    @property
+    def replica_daily_byte_budget(self) -> int:
+        """\
+        This process's share of the daily byte budget.
+
+        Every replica (and the sweeper) runs its own prefetcher, so the budget
+        is split between all live replicas, as seen through shared mirror
+        health. Without shared health, each process spends the whole budget.
+        """
+        if shared_mirror_health is None:
+            return self.daily_byte_budget
+        return self.daily_byte_budget // shared_mirror_health.live_replica_count
+
+    def _has_budget_remaining(self) -> bool:
+        current_day = int(time.time() // SECONDS_PER_DAY)
+        if current_day != self._budget_day:
+            self._budget_day = current_day
+            self._bytes_prefetched_today = 0
+        return self._bytes_prefetched_today < self.replica_daily_byte_budget
+
+    async def _prefetch(self, beatmapset_id: int) -> None:
+        if not self._has_budget_remaining():
+            self._over_budget_count += 1
+            return None
+
+        if await osz_files.is_beatmapset_osz_file_cached(beatmapset_id):
+            self._already_cached_count += 1
+            return None
+
+        size_bytes = await osz_files.prefetch_beatmapset_osz_file(beatmapset_id)
+        if size_bytes is None:
+            self._not_found_count += 1
+            return None
+
+        self._bytes_prefetched_today += size_bytes
+        self._prefetched_count += 1
+        logging.info(
+            "Prefetched beatmapset osz file",
+            extra={"beatmapset_id": beatmapset_id, "size_bytes": size_bytes},
+        )
+
+    async def _run_worker(self) -> None:
+        while True:
+            beatmapset_id = await self._queue.get()
+            try:
+                await self._prefetch(beatmapset_id)
+            except Exception:
+                self._failed_count += 1
+                logging.exception(
+                    "Failed to prefetch beatmapset osz file",
+                    extra={"beatmapset_id": beatmapset_id},
+                )
+            finally:
+                self._pending_beatmapset_ids.discard(beatmapset_id)
+
+    def start(self) -> None:
+        self._worker_tasks = [
+            asyncio.create_task(self._run_worker()) for _ in range(self.concurrency)
+        ]
+
+    async def stop(self) -> None:
+        """Stop prefetching, abandoning anything still queued."""
+        for worker_task in self._worker_tasks:
+            worker_task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    def get_stats(self) -> OszPrefetchStats:
+        self._has_budget_remaining()  # roll the budget over if a new day began
+        return OszPrefetchStats(
+            queued=self._queue.qsize(),
+            prefetched=self._prefetched_count,
+            already_cached=self._already_cached_count,
+            not_found=self._not_found_count,
+            failed=self._failed_count,
+            dropped=self._dropped_count,
+            over_budget=self._over_budget_count,
+            bytes_prefetched_today=self._bytes_prefetched_today,
+            byte_budget_today=self.replica_daily_byte_budget,
+        )
+
+
+osz_prefetcher = OszPrefetcher(
+    max_queue_size=settings.OSZ_PREFETCH_MAX_QUEUE_SIZE,
+    concurrency=settings.OSZ_PREFETCH_CONCURRENCY,
+    daily_byte_budget=settings.OSZ_PREFETCH_DAILY_BYTE_BUDGET,
+)
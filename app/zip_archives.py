@@ -0,0 +1,237 @@
+"""\
+Random access to members of zip archives (such as .osz files).
+
+Rather than reading a whole archive, the central directory at its end is
+read to find where each member lives, so that individual members can be
+read & decompressed on their own (e.g. with ranged reads from s3).
+
+Only what's needed for .osz files is supported: single-disk archives, with
+stored or deflated members, and without zip64 extensions.
+"""
+
+import struct
+import zlib
+from dataclasses import dataclass
+
+END_OF_CENTRAL_DIRECTORY_SIGNATURE = b"PK\x05\x06"
+END_OF_CENTRAL_DIRECTORY_STRUCT = struct.Struct("<4s4H2LH")
+CENTRAL_DIRECTORY_HEADER_SIGNATURE = b"PK\x01\x02"
+CENTRAL_DIRECTORY_HEADER_STRUCT = struct.Struct("<4s6H3L5H2L")
+LOCAL_FILE_HEADER_SIGNATURE = b"PK\x03\x04"
+LOCAL_FILE_HEADER_STRUCT = struct.Struct("<4s5H3L2H")
+
+# The end of central directory record may be followed by a comment
+MAX_ARCHIVE_COMMENT_SIZE = 0xFFFF
+# Enough of an archive's tail to be sure to contain the end of central directory
+MAX_END_OF_CENTRAL_DIRECTORY_SIZE = (
+    END_OF_CENTRAL_DIRECTORY_STRUCT.size + MAX_ARCHIVE_COMMENT_SIZE
+)
+
+# Placeholder values used in archives which need zip64 extensions
+ZIP64_PLACEHOLDER_SIZE = 0xFFFFFFFF
+ZIP64_PLACEHOLDER_COUNT = 0xFFFF
+
+UTF8_FILE_NAME_FLAG = 1 << 11
+ENCRYPTED_FLAG = 1 << 0
+
+COMPRESSION_METHOD_STORED = 0
+COMPRESSION_METHOD_DEFLATED = 8
+
+
+@dataclass(frozen=True)
+class CentralDirectoryLocation:
+    offset: int
+    size: int
+    entry_count: int
+
+
+@dataclass(frozen=True)
+class ZipMember:
+    file_name: str
+    compression_method: int
+    crc32: int
+    compressed_size: int
+    uncompressed_size: int
+    local_header_offset: int
+    flags: int
+
+    @property
+    def is_supported(self) -> bool:
+        return not self.flags & ENCRYPTED_FLAG and self.compression_method in (
+            COMPRESSION_METHOD_STORED,
+            COMPRESSION_METHOD_DEFLATED,
+        )
+
+
+def _find_end_of_central_directory_record(archive_tail: bytes) -> bytes | None:
+    # The archive comment may itself contain the signature; the record
+    # is the one whose comment runs exactly to the end of the archive
+    search_end = len(archive_tail)
+    while True:
+        record_offset = archive_tail.rfind(
+            END_OF_CENTRAL_DIRECTORY_SIGNATURE,
+            0,
+            search_end,
+        )
+        if record_offset == -1:
+            return None
+
+        record = archive_tail[
+            record_offset : record_offset + END_OF_CENTRAL_DIRECTORY_STRUCT.size
+        ]
+        if len(record) == END_OF_CENTRAL_DIRECTORY_STRUCT.size:
+            (comment_size,) = struct.unpack_from("<H", record, len(record) - 2)
+            if record_offset + len(record) + comment_size == len(archive_tail):
+                return record
+
+        search_end = record_offset + len(END_OF_CENTRAL_DIRECTORY_SIGNATURE) - 1
+
+
+def find_central_directory(archive_tail: bytes) -> CentralDirectoryLocation | None:
+    """\
+    Locate the central directory from the final bytes of an archive.
+
+    `archive_tail` should be the last `MAX_END_OF_CENTRAL_DIRECTORY_SIZE`
+    bytes of the archive (or the whole archive, if it is smaller).
+    """
+    record = _find_end_of_central_directory_record(archive_tail)
+    if record is None:
+        return None
+
+    (
+        _,
+        disk_number,
+        central_directory_disk_number,
+        _,
+        entry_count,
+        central_directory_size,
+        central_directory_offset,
+        _,
+    ) = END_OF_CENTRAL_DIRECTORY_STRUCT.unpack(record)
+
+    if disk_number != 0 or central_directory_disk_number != 0:
+        return None  # multi-disk archive
+    if (
+        entry_count == ZIP64_PLACEHOLDER_COUNT
+        or central_directory_size == ZIP64_PLACEHOLDER_SIZE
+        or central_directory_offset == ZIP64_PLACEHOLDER_SIZE
+    ):
+        return None  # zip64 archive
+
+    return CentralDirectoryLocation(
+        offset=central_directory_offset,
+        size=central_directory_size,
+        entry_count=entry_count,
+    )
+
+
+def parse_central_directory(central_directory: bytes) -> list[ZipMember] | None:
+    members: list[ZipMember] = []
+    position = 0
+    while position < len(central_directory):
+        header = central_directory[
+            position : position + CENTRAL_DIRECTORY_HEADER_STRUCT.size
+        ]
+        if len(header) != CENTRAL_DIRECTORY_HEADER_STRUCT.size:
+            return None
+
+        (
+            signature,
+            _,
+            _,
+            flags,
+            compression_method,
+            _,
+            _,
+            crc32,
+            compressed_size,
+            uncompressed_size,
+            file_name_length,
+            extra_field_length,
+            file_comment_length,
+            _,
+            _,
+            _,
+            local_header_offset,
+        ) = CENTRAL_DIRECTORY_HEADER_STRUCT.unpack(header)
+        if signature != CENTRAL_DIRECTORY_HEADER_SIGNATURE:
+            return None
+
+        file_name_start = position + CENTRAL_DIRECTORY_HEADER_STRUCT.size
+        raw_file_name = central_directory[
+            file_name_start : file_name_start + file_name_length
+        ]
+        members.append(
+            ZipMember(
+                file_name=raw_file_name.decode(
+                    "utf-8" if flags & UTF8_FILE_NAME_FLAG else "cp437",
+                    errors="replace",
+                ),
+                compression_method=compression_method,
+                crc32=crc32,
+                compressed_size=compressed_size,
+                uncompressed_size=uncompressed_size,
+                local_header_offset=local_header_offset,
+                flags=flags,
+            )
+        )
+        position = (
+            file_name_start
+            + file_name_length
+            + extra_field_length
+            + file_comment_length
+        )
+
+    return members
+
+
+def get_local_header_size(local_header: bytes) -> int | None:
+    """\
+    Determine the size of a member's local file header, which precedes its data.
+
+    The local header's extra field may differ in size from the central
+    directory's, so this must be read from the local header itself.
+    """
+    if len(local_header) < LOCAL_FILE_HEADER_STRUCT.size:
+        return None
+
+    (
+        signature,
+        _,
+        _,
+        _,
+        _,
+        _,
+        _,
+        _,
+        _,
+        file_name_length,
+        extra_field_length,
+    ) = LOCAL_FILE_HEADER_STRUCT.unpack(local_header[: LOCAL_FILE_HEADER_STRUCT.size])
+    if signature != LOCAL_FILE_HEADER_SIGNATURE:
+        return None
+
+    local_header_size: int = (
+        LOCAL_FILE_HEADER_STRUCT.size + file_name_length + extra_field_length
+    )
+    return local_header_size
+
+
+def decompress_member(member: ZipMember, compressed_data: bytes) -> bytes | None:
+    """Decompress a member's data, verifying it against its checksum."""
+    if not member.is_supported or len(compressed_data) != member.compressed_size:
+        return None
+
+    if member.compression_method == COMPRESSION_METHOD_STORED:
+        data = compressed_data
+    else:
+        try:
+            # Negative window bits; zip members are raw deflate streams
+            data = zlib.decompress(compressed_data, wbits=-zlib.MAX_WBITS)
+        except zlib.error:
+            return None
+
+    if zlib.crc32(data) != member.crc32:
+        return None
+
+    return data
@@ -0,0 +1,125 @@
+"""\
+Micro-benchmark of building akatsuki beatmap models from database rows.
+
+Rows are real `databases` records (as its mysql backend builds them), read
+from an in-memory sqlite database so that no mysql server is needed.
+
+Usage: PYTHONPATH=. python scripts/benchmark_akatsuki_beatmap_rows.py
+"""
+
+import timeit
+from collections.abc import Callable
+from typing import Any
+
+import sqlalchemy
+from databases.backends.common.records import Record
+from databases.backends.common.records import Row
+from databases.backends.common.records import create_column_maps
+
+from app.repositories.akatsuki_beatmaps import AKATSUKI_BEATMAP_FIELDS
+from app.repositories.akatsuki_beatmaps import AkatsukiBeatmap
+from app.repositories.akatsuki_beatmaps import _deserialize
+from app.repositories.akatsuki_beatmaps import _deserialize_record
+
+ROW_COUNT = 1_000
+REPEAT = 5
+
+# As mysql returns them; enums & bools are plain integers
+SAMPLE_ROW: dict[str, Any] = {
+    "beatmap_id": 75,
+    "beatmapset_id": 1,
+    "beatmap_md5": "a5b99395a42bd55bc5eb1d2411cbdf8b",
+    "song_name": "Kenji Ninuma - DISCO PRINCE [Normal]",
+    "file_name": "Kenji Ninuma - DISCOPRINCE (peppy) [Normal].osu",
+    "ar": 6.0,
+    "od": 6.0,
+    "mode": 0,
+    "max_combo": 314,
+    "hit_length": 108,
+    "bpm": 120,
+    "ranked": 2,
+    "latest_update": 1191692104,
+    "ranked_status_freezed": 0,
+    "playcount": 1234,
+    "passcount": 567,
+    "rankedby": None,
+    "rating": 10.0,
+    "bancho_ranked_status": 2,
+    "count_circles": 160,
+    "count_spinners": 3,
+    "count_sliders": 30,
+    "bancho_creator_id": 2,
+    "bancho_creator_name": "peppy",
+}
+
+
+def _create_records(count: int) -> list[Record]:
+    engine = sqlalchemy.create_engine("sqlite://")
+    columns = ", ".join(f":{field} AS {field}" for field in AKATSUKI_BEATMAP_FIELDS)
+    with engine.connect() as connection:
+        result = connection.execute(
+            sqlalchemy.text(f"SELECT {columns}"),
+            SAMPLE_ROW,
+        )
+        metadata = result._metadata
+        data = tuple(result.one())
+
+    return [
+        Record(
+            Row(metadata, metadata._processors, metadata._keymap, data),
+            (),
+            engine.dialect,
+            create_column_maps(()),
+        )
+        for _ in range(count)
+    ]
+
+
+# How the repository built beatmaps before
+def _validate_by_name(rec: Record) -> AkatsukiBeatmap:
+    return AkatsukiBeatmap(**{field: rec[field] for field in AKATSUKI_BEATMAP_FIELDS})
+
+
+def _construct_from_cache_entry(cache_entry: tuple[Any, ...]) -> AkatsukiBeatmap:
+    return AkatsukiBeatmap.model_construct(
+        **dict(zip(AKATSUKI_BEATMAP_FIELDS, cache_entry)),
+    )
+
+
+def _benchmark(name: str, items: list[Any], build: Callable[[Any], Any]) -> None:
+    timings = timeit.repeat(
+        lambda: [build(item) for item in items],
+        number=1,
+        repeat=REPEAT,
+    )
+    per_row_us = min(timings) / len(items) * 1_000_000
+    print(f"{name:<40} {per_row_us:8.2f}us/row")
+
+
+def main() -> int:
+    records = _create_records(ROW_COUNT)
+    beatmap = _deserialize_record(records[0])
+    assert beatmap == _validate_by_name(records[0])
+
+    cache_entries = [
+        tuple(getattr(beatmap, field) for field in AKATSUKI_BEATMAP_FIELDS)
+    ] * ROW_COUNT
+    assert _deserialize(cache_entries[0]) == beatmap
+
+    _benchmark("database row, validated by name (before)", records, _validate_by_name)
+    _benchmark(
+        "database row, _deserialize_record (after)",
+        records,
+        _deserialize_record,
+    )
+    _benchmark(
+        "cache entry, model_construct (before)",
+        cache_entries,
+        _construct_from_cache_entry,
+    )
+    _benchmark("cache entry, _deserialize (after)", cache_entries, _deserialize)
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -25,6 +25,8 @@ fi
 
 if [[ $APP_COMPONENT == "api" ]]; then
   exec /scripts/run-api.sh
+elif [[ $APP_COMPONENT == "sweeper" ]]; then
+  exec /scripts/run-sweeper.sh
 else
   echo "Unknown APP_COMPONENT: $APP_COMPONENT"
   exit 1
@@ -0,0 +1,33 @@
+import os
+
+import pytest
+
+# Settings are read from the environment at import time; give the
+# required ones placeholder values so that app modules can be imported
+for name, value in {
+    "APP_ENV": "test",
+    "APP_HOST": "127.0.0.1",
+    "APP_PORT": "80",
+    "CODE_HOTRELOAD": "false",
+    "OSU_API_V2_CLIENT_ID": "0",
+    "OSU_API_V2_CLIENT_SECRET": "",
+    "OSU_API_V1_API_KEYS_POOL": "",
+    "DB_USER": "",
+    "DB_PASS": "",
+    "DB_HOST": "localhost",
+    "DB_PORT": "3306",
+    "DB_NAME": "",
+    "AWS_S3_ENDPOINT_URL": "http://localhost",
+    "AWS_S3_REGION_NAME": "",
+    "AWS_S3_BUCKET_NAME": "",
+    "AWS_S3_ACCESS_KEY_ID": "",
+    "AWS_S3_SECRET_ACCESS_KEY": "",
+    "DISCORD_BEATMAP_UPDATES_WEBHOOK_URL": "",
+    "MINO_INCREASED_RATELIMIT_KEY": "",
+}.items():
+    os.environ.setdefault(name, value)
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    return "asyncio"
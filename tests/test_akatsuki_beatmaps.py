@@ -0,0 +1,221 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from dataclasses import field
+
+import pytest
+
+from app.adapters import osu_api_v1 as osu_api_v1_adapter
+from app.adapters.osu_mirrors.resilience import TokenBucket
+from app.common_models import GameMode
+from app.common_models import RankedStatus
+from app.repositories import akatsuki_beatmaps as akatsuki_beatmaps_repository
+from app.repositories.akatsuki_beatmaps import AkatsukiBeatmap
+from app.usecases import akatsuki_beatmaps
+
+OSU_API_V1_LATENCY_SECONDS = 0.05
+
+
+def _create_beatmap(beatmap_id: int, beatmapset_id: int) -> AkatsukiBeatmap:
+    return AkatsukiBeatmap(
+        beatmap_id=beatmap_id,
+        beatmapset_id=beatmapset_id,
+        beatmap_md5=f"{beatmap_id:032x}",
+        song_name="Artist - Title [Difficulty]",
+        file_name="Artist - Title (Creator) [Difficulty].osu",
+        ar=9.0,
+        od=8.0,
+        mode=GameMode.OSU,
+        max_combo=1000,
+        hit_length=120,
+        bpm=180,
+        ranked=RankedStatus.RANKED,
+        latest_update=int(time.time()),
+        ranked_status_freezed=False,
+        playcount=0,
+        passcount=0,
+        rankedby=None,
+        rating=10.0,
+        bancho_ranked_status=RankedStatus.RANKED,
+        count_circles=None,
+        count_spinners=None,
+        count_sliders=None,
+        bancho_creator_id=None,
+        bancho_creator_name=None,
+    )
+
+
+@dataclass
+class FakeOsuApiV1:
+    beatmapsets: dict[int, list[AkatsukiBeatmap]] = field(default_factory=dict)
+    # (beatmap id, started at, ended at) of each single beatmap lookup
+    lookups: list[tuple[int, float, float]] = field(default_factory=list)
+
+    async def fetch_one_by_id(
+        self,
+        beatmap_id: int,
+        *,
+        fresh: bool = False,
+    ) -> AkatsukiBeatmap | None:
+        started_at = time.monotonic()
+        await asyncio.sleep(OSU_API_V1_LATENCY_SECONDS)
+        self.lookups.append((beatmap_id, started_at, time.monotonic()))
+        for beatmaps in self.beatmapsets.values():
+            for beatmap in beatmaps:
+                if beatmap.beatmap_id == beatmap_id:
+                    return beatmap
+        return None
+
+    async def update_beatmapset(self, beatmapset_id: int) -> list[AkatsukiBeatmap]:
+        await asyncio.sleep(OSU_API_V1_LATENCY_SECONDS)
+        return self.beatmapsets.get(beatmapset_id, [])
+
+
+@pytest.fixture
+def osu_api_v1(monkeypatch: pytest.MonkeyPatch) -> FakeOsuApiV1:
+    """Stand in for osu! api v1, with no beatmaps known to the database."""
+    osu_api_v1 = FakeOsuApiV1()
+
+    async def fetch_many(
+        *,
+        beatmap_ids: list[int],
+        beatmap_md5s: list[str],
+    ) -> list[AkatsukiBeatmap]:
+        return []
+
+    monkeypatch.setattr(akatsuki_beatmaps_repository, "fetch_many", fetch_many)
+    monkeypatch.setattr(
+        akatsuki_beatmaps,
+        "fetch_one_by_id",
+        osu_api_v1.fetch_one_by_id,
+    )
+    monkeypatch.setattr(
+        akatsuki_beatmaps,
+        "_update_beatmapset",
+        osu_api_v1.update_beatmapset,
+    )
+    return osu_api_v1
+
+
+@pytest.mark.anyio
+async def test_fetch_many_resolves_misses_concurrently(
+    osu_api_v1: FakeOsuApiV1,
+) -> None:
+    beatmap_ids = list(range(1, 17))
+    for beatmap_id in beatmap_ids:
+        # each from a different set
+        osu_api_v1.beatmapsets[beatmap_id] = [_create_beatmap(beatmap_id, beatmap_id)]
+
+    lookup = await akatsuki_beatmaps.fetch_many(
+        beatmap_ids=beatmap_ids,
+        beatmap_md5s=[],
+    )
+
+    assert set(lookup.by_id) == set(beatmap_ids)
+    assert len(osu_api_v1.lookups) == len(beatmap_ids)
+
+    first_ended_at = min(ended_at for _, _, ended_at in osu_api_v1.lookups)
+    overlapping_lookups = [
+        beatmap_id
+        for beatmap_id, started_at, _ in osu_api_v1.lookups
+        if started_at < first_ended_at
+    ]
+    assert (
+        len(overlapping_lookups) == akatsuki_beatmaps.BATCH_LOOKUP_REFRESH_CONCURRENCY
+    )
+
+
+@pytest.mark.anyio
+async def test_fetch_many_skips_misses_resolved_by_a_sibling_set_fetch(
+    osu_api_v1: FakeOsuApiV1,
+) -> None:
+    beatmap_ids = list(range(1, 33))
+    # two sets, each with half of the requested beatmaps
+    osu_api_v1.beatmapsets[1] = [
+        _create_beatmap(beatmap_id, 1) for beatmap_id in beatmap_ids[:16]
+    ]
+    osu_api_v1.beatmapsets[2] = [
+        _create_beatmap(beatmap_id, 2) for beatmap_id in beatmap_ids[16:]
+    ]
+
+    lookup = await akatsuki_beatmaps.fetch_many(
+        beatmap_ids=beatmap_ids,
+        beatmap_md5s=[],
+    )
+
+    assert set(lookup.by_id) == set(beatmap_ids)
+    # a wave of lookups per set; its set fetch resolves the rest of the set
+    concurrency = akatsuki_beatmaps.BATCH_LOOKUP_REFRESH_CONCURRENCY
+    looked_up_beatmap_ids = {beatmap_id for beatmap_id, _, _ in osu_api_v1.lookups}
+    assert looked_up_beatmap_ids == {
+        *beatmap_ids[:concurrency],
+        *beatmap_ids[16 : 16 + concurrency],
+    }
+
+
+@pytest.mark.anyio
+async def test_update_many_saves_each_set_as_soon_as_it_is_fetched(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # set 2's response takes much longer than set 1's
+    osu_api_v1_latencies = {1: 0.01, 2: 0.1}
+    events: list[tuple[str, int]] = []
+
+    async def fetch_many_beatmaps_by_beatmapset_id(
+        beatmapset_id: int,
+    ) -> list[osu_api_v1_adapter.Beatmap]:
+        await asyncio.sleep(osu_api_v1_latencies[beatmapset_id])
+        events.append(("fetched", beatmapset_id))
+        return []
+
+    async def fetch_many_by_beatmapset_id(
+        beatmapset_id: int,
+    ) -> list[AkatsukiBeatmap]:
+        events.append(("read", beatmapset_id))
+        return [_create_beatmap(beatmapset_id, beatmapset_id)]
+
+    async def prepare_beatmapset_update(
+        old_beatmaps: list[AkatsukiBeatmap],
+        osu_api_v1_beatmaps: list[osu_api_v1_adapter.Beatmap],
+    ) -> list[tuple[AkatsukiBeatmap | None, AkatsukiBeatmap]]:
+        return [(old_beatmap, old_beatmap) for old_beatmap in old_beatmaps]
+
+    async def save_updates(
+        updates: list[tuple[AkatsukiBeatmap | None, AkatsukiBeatmap]],
+    ) -> None:
+        for _, new_beatmap in updates:
+            events.append(("saved", new_beatmap.beatmapset_id))
+
+    monkeypatch.setattr(
+        osu_api_v1_adapter,
+        "fetch_many_beatmaps_by_beatmapset_id",
+        fetch_many_beatmaps_by_beatmapset_id,
+    )
+    monkeypatch.setattr(
+        akatsuki_beatmaps_repository,
+        "fetch_many_by_beatmapset_id",
+        fetch_many_by_beatmapset_id,
+    )
+    monkeypatch.setattr(
+        akatsuki_beatmaps,
+        "_prepare_beatmapset_update",
+        prepare_beatmapset_update,
+    )
+    monkeypatch.setattr(akatsuki_beatmaps, "_save_updates", save_updates)
+
+    updated_count = await akatsuki_beatmaps.update_many_from_osu_api(
+        [_create_beatmap(1, 1), _create_beatmap(2, 2)],
+        concurrency=2,
+        osu_api_budget=TokenBucket(tokens_per_second=100),
+    )
+
+    assert updated_count == 2
+    # each set's rows are read after its response, & saved straight away
+    assert events == [
+        ("fetched", 1),
+        ("read", 1),
+        ("saved", 1),
+        ("fetched", 2),
+        ("read", 2),
+        ("saved", 2),
+    ]
@@ -0,0 +1,72 @@
+from collections.abc import Iterator
+
+import pytest
+
+from app import image_processing
+from app.adapters import aws_s3
+from app.image_processing import ImageFormat
+from app.usecases import background_images
+from app.usecases.background_images import BackgroundImage
+from app.usecases.background_images import BackgroundImageVariant
+
+NON_IMAGE_DATA = b"<html>502 Bad Gateway</html>"
+
+
+@pytest.fixture(autouse=True)
+def shutdown_image_processing() -> Iterator[None]:
+    yield
+    image_processing.shutdown()
+
+
+@pytest.mark.anyio
+async def test_resize_image_returns_none_for_non_image_data() -> None:
+    resized_image = await image_processing.resize_image(
+        NON_IMAGE_DATA,
+        max_width=80,
+        max_height=None,
+        image_format=ImageFormat.WEBP,
+    )
+
+    assert resized_image is None
+
+
+@pytest.mark.anyio
+async def test_background_image_variant_is_none_for_non_image_data(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    async def fetch_beatmap_background_image(
+        beatmap_id: int,
+    ) -> BackgroundImage | None:
+        return BackgroundImage(data=NON_IMAGE_DATA, etag="etag")
+
+    async def get_object_data(key: str) -> bytes | None:
+        return None
+
+    async def save_object_data(key: str, data: bytes) -> None:
+        raise AssertionError("Undecodable images must not be cached")
+
+    monkeypatch.setattr(
+        background_images,
+        "fetch_beatmap_background_image",
+        fetch_beatmap_background_image,
+    )
+    monkeypatch.setattr(aws_s3, "get_object_data", get_object_data)
+    monkeypatch.setattr(aws_s3, "save_object_data", save_object_data)
+
+    variant = BackgroundImageVariant(
+        max_width=80,
+        max_height=None,
+        image_format=ImageFormat.JPEG,
+    )
+    background_image = await background_images.fetch_beatmap_background_image_variant(
+        1,
+        variant,
+    )
+
+    assert background_image is None
+    assert (
+        background_images.BACKGROUND_IMAGE_VARIANT_MEMORY_CACHE.get(
+            (1, "etag", variant),
+        )
+        is None
+    )
@@ -0,0 +1,144 @@
+import pytest
+
+from app.byte_ranges import ByteRange
+from app.byte_ranges import ContentRange
+from app.byte_ranges import parse_content_range_header
+from app.byte_ranges import parse_range_header
+
+
+@pytest.mark.parametrize(
+    ("header_value", "byte_range"),
+    [
+        ("bytes=0-499", ByteRange(first_byte=0, last_byte=499)),
+        ("bytes=500-999", ByteRange(first_byte=500, last_byte=999)),
+        ("bytes=5-5", ByteRange(first_byte=5, last_byte=5)),
+        # open-ended
+        ("bytes=9500-", ByteRange(first_byte=9500, last_byte=None)),
+        # suffix
+        ("bytes=-500", ByteRange(first_byte=None, last_byte=500)),
+        (" bytes=0-1 ", ByteRange(first_byte=0, last_byte=1)),
+    ],
+)
+def test_parse_range_header(header_value: str, byte_range: ByteRange) -> None:
+    assert parse_range_header(header_value) == byte_range
+
+
+@pytest.mark.parametrize(
+    "header_value",
+    [
+        None,
+        "",
+        "bytes=",
+        "bytes=-",
+        "bytes=abc-def",
+        "bytes=1-2-3",
+        "bytes=-1-2",
+        "bytes=+1-2",
+        "bytes=0x10-",
+        "bytes=500-499",
+        "bytes 0-499",
+        "items=0-499",
+        "BYTES=0-499",
+        # non-ascii digits
+        "bytes=١-٢",
+        # multiple ranges are ignored, rather than partly served
+        "bytes=0-499,1000-1499",
+        "bytes=0-0,-1",
+    ],
+)
+def test_parse_range_header_rejects(header_value: str | None) -> None:
+    assert parse_range_header(header_value) is None
+
+
+@pytest.mark.parametrize(
+    ("byte_range", "total_size", "resolved_range"),
+    [
+        (ByteRange(first_byte=0, last_byte=499), 1000, (0, 499)),
+        # clamped to the end of the body
+        (ByteRange(first_byte=500, last_byte=5000), 1000, (500, 999)),
+        (ByteRange(first_byte=999, last_byte=None), 1000, (999, 999)),
+        (ByteRange(first_byte=500, last_byte=None), 1000, (500, 999)),
+        (ByteRange(first_byte=None, last_byte=100), 1000, (900, 999)),
+        # a suffix longer than the body is the whole body
+        (ByteRange(first_byte=None, last_byte=5000), 1000, (0, 999)),
+    ],
+)
+def test_resolve_byte_range(
+    byte_range: ByteRange,
+    total_size: int,
+    resolved_range: tuple[int, int],
+) -> None:
+    assert byte_range.resolve(total_size) == resolved_range
+
+
+@pytest.mark.parametrize(
+    ("byte_range", "total_size"),
+    [
+        # starting at or past the end of the body
+        (ByteRange(first_byte=1000, last_byte=1500), 1000),
+        (ByteRange(first_byte=1000, last_byte=None), 1000),
+        (ByteRange(first_byte=0, last_byte=None), 0),
+        # an empty suffix, or any suffix of an empty body
+        (ByteRange(first_byte=None, last_byte=0), 1000),
+        (ByteRange(first_byte=None, last_byte=100), 0),
+    ],
+)
+def test_resolve_unsatisfiable_byte_range(
+    byte_range: ByteRange,
+    total_size: int,
+) -> None:
+    assert byte_range.resolve(total_size) is None
+
+
+@pytest.mark.parametrize(
+    "byte_range",
+    [
+        ByteRange(first_byte=0, last_byte=499),
+        ByteRange(first_byte=9500, last_byte=None),
+        ByteRange(first_byte=None, last_byte=500),
+    ],
+)
+def test_range_header_round_trips(byte_range: ByteRange) -> None:
+    assert parse_range_header(byte_range.to_header_value()) == byte_range
+
+
+@pytest.mark.parametrize(
+    ("header_value", "content_range"),
+    [
+        ("bytes 0-499/1000", ContentRange(start=0, end=499, total_size=1000)),
+        ("bytes 999-999/1000", ContentRange(start=999, end=999, total_size=1000)),
+        ("bytes 0-499/*", ContentRange(start=0, end=499, total_size=None)),
+    ],
+)
+def test_parse_content_range_header(
+    header_value: str,
+    content_range: ContentRange,
+) -> None:
+    parsed_content_range = parse_content_range_header(header_value)
+
+    assert parsed_content_range == content_range
+    assert parsed_content_range.to_header_value() == header_value
+
+
+@pytest.mark.parametrize(
+    "header_value",
+    [
+        None,
+        "",
+        "bytes */1000",
+        "bytes 0-499",
+        "bytes=0-499/1000",
+        "bytes -1-499/1000",
+        # ranges which are backwards, or extend past the body's end
+        "bytes 500-499/1000",
+        "bytes 0-1000/1000",
+        "bytes ٠-١/1000",
+    ],
+)
+def test_parse_content_range_header_rejects(header_value: str | None) -> None:
+    assert parse_content_range_header(header_value) is None
+
+
+def test_content_range_length() -> None:
+    assert ContentRange(start=0, end=0, total_size=1).length == 1
+    assert ContentRange(start=500, end=999, total_size=1000).length == 500
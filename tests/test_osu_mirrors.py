@@ -0,0 +1,78 @@
+from datetime import datetime
+from datetime import timedelta
+
+import pytest
+
+from app.adapters import osu_mirrors
+from app.adapters.osu_mirrors.backends.mino import MinoCentralMirror
+from app.adapters.osu_mirrors.backends.nerinyan import NerinyanMirror
+from app.adapters.osu_mirrors.scoreboard import MirrorScoreboard
+from app.repositories.beatmap_mirror_requests import BeatmapMirrorRequest
+from app.repositories.beatmap_mirror_requests import MirrorResource
+
+MIB = 1024 * 1024
+
+
+@pytest.fixture(autouse=True)
+def mirror_scoreboard(monkeypatch: pytest.MonkeyPatch) -> MirrorScoreboard:
+    mirror_scoreboard = MirrorScoreboard(latency_percentiles={})
+    monkeypatch.setattr(osu_mirrors, "mirror_scoreboard", mirror_scoreboard)
+    return mirror_scoreboard
+
+
+def _record_requests(
+    mirror_scoreboard: MirrorScoreboard,
+    mirror_name: str,
+    *,
+    latency_seconds: float,
+    count: int = 20,
+) -> None:
+    ended_at = datetime.now()
+    for _ in range(count):
+        mirror_scoreboard.record(
+            BeatmapMirrorRequest(
+                request_url="https://example.com",
+                api_key_id=None,
+                mirror_name=mirror_name,
+                success=True,
+                started_at=ended_at - timedelta(seconds=latency_seconds),
+                ended_at=ended_at,
+                response_status_code=200,
+                response_size=10 * MIB,
+                response_error=None,
+                resource=MirrorResource.OSZ_FILE,
+            ),
+        )
+
+
+def test_mirror_weight_favours_higher_throughput_at_equal_latency(
+    mirror_scoreboard: MirrorScoreboard,
+) -> None:
+    fast_mirror = NerinyanMirror()
+    slow_mirror = MinoCentralMirror()
+    for mirror in (fast_mirror, slow_mirror):
+        _record_requests(mirror_scoreboard, mirror.name, latency_seconds=0.2)
+    for _ in range(10):
+        fast_mirror.health.record_throughput(MirrorResource.OSZ_FILE, 50 * MIB, 1.0)
+        slow_mirror.health.record_throughput(MirrorResource.OSZ_FILE, 2 * MIB, 1.0)
+
+    fast_weight = osu_mirrors.get_mirror_weight(fast_mirror, MirrorResource.OSZ_FILE)
+    slow_weight = osu_mirrors.get_mirror_weight(slow_mirror, MirrorResource.OSZ_FILE)
+
+    assert fast_weight > slow_weight
+    # throughput only ever lowers the latency-based weight
+    score = mirror_scoreboard.get_score(fast_mirror.name, MirrorResource.OSZ_FILE)
+    assert fast_weight <= score.weight()
+
+
+def test_mirror_weight_ignores_throughput_until_it_has_been_measured(
+    mirror_scoreboard: MirrorScoreboard,
+) -> None:
+    mirror = NerinyanMirror()
+    _record_requests(mirror_scoreboard, mirror.name, latency_seconds=0.2)
+    mirror.health.record_throughput(MirrorResource.OSZ_FILE, 2 * MIB, 1.0)
+
+    score = mirror_scoreboard.get_score(mirror.name, MirrorResource.OSZ_FILE)
+    assert (
+        osu_mirrors.get_mirror_weight(mirror, MirrorResource.OSZ_FILE) == score.weight()
+    )
@@ -0,0 +1,243 @@
+import asyncio
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.adapters import aws_s3
+from app.adapters import osu_mirrors
+from app.adapters.aws_s3 import S3ObjectMetadata
+from app.adapters.aws_s3 import S3ObjectStream
+from app.api.public import osz_files as osz_files_api
+from app.usecases import osz_files
+from app.usecases.osz_files import MirroredOszFileMetadata
+from app.usecases.osz_files import OszFileMetadata
+
+
+@dataclass
+class FakeMirrorStream:
+    content_length: int | None
+    is_closed: bool = False
+
+    async def aclose(self) -> None:
+        self.is_closed = True
+
+
+@pytest.fixture
+def client() -> TestClient:
+    app = FastAPI()
+    app.include_router(osz_files_api.router)
+    return TestClient(app)
+
+
+@pytest.fixture
+def mirrored_beatmapsets(monkeypatch: pytest.MonkeyPatch) -> dict[int, int | None]:
+    """Stand in for the mirrors, with no archives in the cache."""
+    mirrored_beatmapsets: dict[int, int | None] = {}
+
+    async def fetch_cached_beatmapset_osz_file_metadata(
+        beatmapset_id: int,
+    ) -> OszFileMetadata | None:
+        return None
+
+    async def fetch_mirrored_beatmapset_osz_file_metadata(
+        beatmapset_id: int,
+    ) -> MirroredOszFileMetadata | None:
+        if beatmapset_id not in mirrored_beatmapsets:
+            return None
+        return MirroredOszFileMetadata(
+            content_length=mirrored_beatmapsets[beatmapset_id],
+        )
+
+    monkeypatch.setattr(
+        osz_files,
+        "fetch_cached_beatmapset_osz_file_metadata",
+        fetch_cached_beatmapset_osz_file_metadata,
+    )
+    monkeypatch.setattr(
+        osz_files,
+        "fetch_mirrored_beatmapset_osz_file_metadata",
+        fetch_mirrored_beatmapset_osz_file_metadata,
+    )
+    return mirrored_beatmapsets
+
+
+def test_head_of_uncached_missing_beatmapset_is_not_found(
+    client: TestClient,
+    mirrored_beatmapsets: dict[int, int | None],
+) -> None:
+    response = client.head("/public/api/d/1")
+
+    assert response.status_code == 404
+
+
+def test_head_of_uncached_beatmapset_reports_mirrored_size(
+    client: TestClient,
+    mirrored_beatmapsets: dict[int, int | None],
+) -> None:
+    mirrored_beatmapsets[1] = 12345
+
+    response = client.head("/public/api/d/1")
+
+    assert response.status_code == 200
+    assert response.headers["Content-Length"] == "12345"
+    assert "ETag" not in response.headers
+
+
+def test_head_of_uncached_beatmapset_of_unknown_size_has_no_length(
+    client: TestClient,
+    mirrored_beatmapsets: dict[int, int | None],
+) -> None:
+    mirrored_beatmapsets[1] = None
+
+    response = client.head("/public/api/d/1")
+
+    assert response.status_code == 200
+    assert "Content-Length" not in response.headers
+
+
+def test_head_of_cached_beatmapset_reports_cached_metadata(
+    client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    async def fetch_cached_beatmapset_osz_file_metadata(
+        beatmapset_id: int,
+    ) -> OszFileMetadata | None:
+        return OszFileMetadata(
+            content_length=54321,
+            etag="abc",
+            last_modified=1_700_000_000,
+        )
+
+    async def fetch_mirrored_beatmapset_osz_file_metadata(
+        beatmapset_id: int,
+    ) -> MirroredOszFileMetadata | None:
+        raise AssertionError("Cached archives must not be looked up on mirrors")
+
+    monkeypatch.setattr(
+        osz_files,
+        "fetch_cached_beatmapset_osz_file_metadata",
+        fetch_cached_beatmapset_osz_file_metadata,
+    )
+    monkeypatch.setattr(
+        osz_files,
+        "fetch_mirrored_beatmapset_osz_file_metadata",
+        fetch_mirrored_beatmapset_osz_file_metadata,
+    )
+
+    response = client.head("/public/api/d/1")
+
+    assert response.status_code == 200
+    assert response.headers["Content-Length"] == "54321"
+    assert response.headers["ETag"] == '"abc"'
+
+
+@pytest.mark.anyio
+async def test_mirrored_metadata_is_probed_once_and_stream_closed(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    opened_streams: list[FakeMirrorStream] = []
+
+    async def stream_beatmap_zip_data(beatmapset_id: int) -> FakeMirrorStream:
+        await asyncio.sleep(0.01)
+        mirror_stream = FakeMirrorStream(content_length=12345)
+        opened_streams.append(mirror_stream)
+        return mirror_stream
+
+    monkeypatch.setattr(
+        osu_mirrors,
+        "stream_beatmap_zip_data",
+        stream_beatmap_zip_data,
+    )
+
+    results = await asyncio.gather(
+        *(osz_files.fetch_mirrored_beatmapset_osz_file_metadata(1) for _ in range(3)),
+    )
+
+    assert results == [MirroredOszFileMetadata(content_length=12345)] * 3
+    assert len(opened_streams) == 1
+    assert opened_streams[0].is_closed
+
+
+@pytest.fixture
+def cached_archive(monkeypatch: pytest.MonkeyPatch) -> bytes:
+    """Stand in for s3, with a set's archive in the cache."""
+    archive = bytes(range(256)) * 4
+
+    async def get_object_metadata(key: str) -> S3ObjectMetadata | None:
+        return S3ObjectMetadata(
+            content_length=len(archive),
+            etag="abc",
+            last_modified=1_700_000_000,
+        )
+
+    async def stream_object_data(
+        key: str,
+        *,
+        byte_range: tuple[int, int] | None = None,
+    ) -> S3ObjectStream | None:
+        start, end = byte_range or (0, len(archive) - 1)
+
+        async def chunks() -> AsyncIterator[bytes]:
+            yield archive[start : end + 1]
+
+        return S3ObjectStream(
+            content_length=end - start + 1,
+            content_range=None,
+            content_type="application/octet-stream",
+            chunks=chunks(),
+        )
+
+    monkeypatch.setattr(aws_s3, "get_object_metadata", get_object_metadata)
+    monkeypatch.setattr(aws_s3, "stream_object_data", stream_object_data)
+    return archive
+
+
+@pytest.mark.parametrize(
+    ("range_header", "content_range", "start", "end"),
+    [
+        ("bytes=0-99", "bytes 0-99/1024", 0, 99),
+        ("bytes=1000-", "bytes 1000-1023/1024", 1000, 1023),
+        ("bytes=-24", "bytes 1000-1023/1024", 1000, 1023),
+        ("bytes=1000-5000", "bytes 1000-1023/1024", 1000, 1023),
+    ],
+)
+def test_get_of_cached_beatmapset_serves_ranges(
+    client: TestClient,
+    cached_archive: bytes,
+    range_header: str,
+    content_range: str,
+    start: int,
+    end: int,
+) -> None:
+    response = client.get("/public/api/d/1", headers={"Range": range_header})
+
+    assert response.status_code == 206
+    assert response.headers["Content-Range"] == content_range
+    assert response.content == cached_archive[start : end + 1]
+
+
+@pytest.mark.parametrize("range_header", ["bytes=1024-", "bytes=5000-6000"])
+def test_get_of_cached_beatmapset_rejects_ranges_past_the_end(
+    client: TestClient,
+    cached_archive: bytes,
+    range_header: str,
+) -> None:
+    response = client.get("/public/api/d/1", headers={"Range": range_header})
+
+    assert response.status_code == 416
+    assert response.headers["Content-Range"] == "bytes */1024"
+
+
+@pytest.mark.parametrize("range_header", ["bytes=0-99,200-299", "bytes=abc"])
+def test_get_of_cached_beatmapset_ignores_unsupported_ranges(
+    client: TestClient,
+    cached_archive: bytes,
+    range_header: str,
+) -> None:
+    response = client.get("/public/api/d/1", headers={"Range": range_header})
+
+    assert response.status_code == 200
+    assert response.content == cached_archive
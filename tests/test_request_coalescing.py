@@ -0,0 +1,155 @@
+import asyncio
+from collections.abc import Iterator
+
+import pytest
+
+from app import request_coalescing
+
+
+class UpstreamError(Exception):
+    pass
+
+
+@pytest.fixture(autouse=True)
+def reset_coalescing() -> Iterator[None]:
+    yield
+    request_coalescing.IN_FLIGHT_CALLS.clear()
+    request_coalescing.COALESCING_STATS.clear()
+
+
+@pytest.mark.anyio
+async def test_concurrent_callers_share_one_call() -> None:
+    call_count = 0
+
+    async def fetch() -> str:
+        nonlocal call_count
+        call_count += 1
+        await asyncio.sleep(0.01)
+        return "result"
+
+    results = await asyncio.gather(
+        *(
+            request_coalescing.coalesce(("upstream", "resource", 1), fetch)
+            for _ in range(5)
+        ),
+    )
+
+    assert results == ["result"] * 5
+    assert call_count == 1
+    stats = request_coalescing.get_stats()["upstream"]
+    assert stats.calls == 5
+    assert stats.deduplicated_calls == 4
+    assert request_coalescing.get_in_flight_call_count() == 0
+
+
+@pytest.mark.anyio
+async def test_callers_with_different_keys_do_not_share_calls() -> None:
+    call_count = 0
+
+    async def fetch() -> int:
+        nonlocal call_count
+        call_count += 1
+        await asyncio.sleep(0.01)
+        return call_count
+
+    await asyncio.gather(
+        request_coalescing.coalesce(("upstream", "resource", 1), fetch),
+        request_coalescing.coalesce(("upstream", "resource", 2), fetch),
+        request_coalescing.coalesce(("upstream", "other_resource", 1), fetch),
+    )
+
+    assert call_count == 3
+
+
+@pytest.mark.anyio
+async def test_sequential_callers_make_their_own_calls() -> None:
+    call_count = 0
+
+    async def fetch() -> int:
+        nonlocal call_count
+        call_count += 1
+        return call_count
+
+    key = ("upstream", "resource", 1)
+    assert await request_coalescing.coalesce(key, fetch) == 1
+    assert await request_coalescing.coalesce(key, fetch) == 2
+
+
+@pytest.mark.anyio
+async def test_failure_is_raised_to_every_waiter() -> None:
+    call_count = 0
+
+    async def fetch() -> str:
+        nonlocal call_count
+        call_count += 1
+        await asyncio.sleep(0.01)
+        raise UpstreamError()
+
+    results = await asyncio.gather(
+        *(
+            request_coalescing.coalesce(("upstream", "resource", 1), fetch)
+            for _ in range(3)
+        ),
+        return_exceptions=True,
+    )
+
+    assert call_count == 1
+    assert all(isinstance(result, UpstreamError) for result in results)
+    assert request_coalescing.get_in_flight_call_count() == 0
+
+
+@pytest.mark.anyio
+async def test_cancelling_one_waiter_leaves_the_call_for_the_others() -> None:
+    call_started = asyncio.Event()
+    call_cancelled = False
+
+    async def fetch() -> str:
+        nonlocal call_cancelled
+        call_started.set()
+        try:
+            await asyncio.sleep(0.05)
+        except asyncio.CancelledError:
+            call_cancelled = True
+            raise
+        return "result"
+
+    key = ("upstream", "resource", 1)
+    cancelled_waiter = asyncio.create_task(request_coalescing.coalesce(key, fetch))
+    remaining_waiter = asyncio.create_task(request_coalescing.coalesce(key, fetch))
+    await call_started.wait()
+
+    cancelled_waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await cancelled_waiter
+
+    assert await remaining_waiter == "result"
+    assert not call_cancelled
+
+
+@pytest.mark.anyio
+async def test_cancelling_every_waiter_cancels_the_call() -> None:
+    call_started = asyncio.Event()
+    call_cancelled = asyncio.Event()
+
+    async def fetch() -> str:
+        call_started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            call_cancelled.set()
+            raise
+        return "result"
+
+    key = ("upstream", "resource", 1)
+    waiters = [
+        asyncio.create_task(request_coalescing.coalesce(key, fetch)) for _ in range(2)
+    ]
+    await call_started.wait()
+
+    for waiter in waiters:
+        waiter.cancel()
+    await asyncio.gather(*waiters, return_exceptions=True)
+
+    await asyncio.wait_for(call_cancelled.wait(), timeout=1)
+    # and new callers aren't joined to the dying call
+    assert request_coalescing.get_in_flight_call_count() == 0
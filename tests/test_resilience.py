@@ -0,0 +1,159 @@
+import asyncio
+
+import pytest
+
+from app.adapters.osu_mirrors import resilience
+from app.adapters.osu_mirrors.resilience import Histogram
+from app.adapters.osu_mirrors.resilience import TokenBucket
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> FakeClock:
+    clock = FakeClock()
+    monkeypatch.setattr(resilience, "time", clock)
+    return clock
+
+
+def test_try_acquire_allows_bursts_up_to_the_bucket_size(clock: FakeClock) -> None:
+    token_bucket = TokenBucket(tokens_per_second=10, bucket_size=3)
+
+    assert [token_bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+
+
+def test_tokens_regenerate_at_the_rate_up_to_the_bucket_size(
+    clock: FakeClock,
+) -> None:
+    token_bucket = TokenBucket(tokens_per_second=10, bucket_size=3)
+    for _ in range(3):
+        assert token_bucket.try_acquire()
+
+    clock.now += 0.1
+    assert token_bucket.try_acquire()
+    assert not token_bucket.try_acquire()
+
+    clock.now += 60
+    assert token_bucket.time_until_available(3) == 0
+    assert token_bucket.time_until_available(4) == pytest.approx(0.1)
+
+
+@pytest.mark.anyio
+async def test_acquire_reserves_tokens_so_later_callers_queue_behind(
+    clock: FakeClock,
+) -> None:
+    token_bucket = TokenBucket(tokens_per_second=10, bucket_size=1)
+    assert await token_bucket.acquire()
+
+    waiter = asyncio.create_task(token_bucket.acquire(timeout=1))
+    await asyncio.sleep(0)
+
+    # the waiter's token is owed, so the next caller waits behind it
+    assert token_bucket.tokens == pytest.approx(-1)
+    assert token_bucket.time_until_available() == pytest.approx(0.2)
+    assert await waiter
+
+
+@pytest.mark.anyio
+async def test_acquire_gives_up_without_reserving_when_the_wait_is_too_long(
+    clock: FakeClock,
+) -> None:
+    token_bucket = TokenBucket(tokens_per_second=10, bucket_size=1)
+    assert await token_bucket.acquire()
+
+    assert not await token_bucket.acquire()
+    assert not await token_bucket.acquire(timeout=0.05)
+    assert not await token_bucket.acquire(2, timeout=0.15)
+    assert token_bucket.tokens == pytest.approx(0)
+
+
+@pytest.mark.anyio
+async def test_cancelled_acquire_refunds_its_reserved_tokens(
+    clock: FakeClock,
+) -> None:
+    token_bucket = TokenBucket(tokens_per_second=10, bucket_size=1)
+    assert await token_bucket.acquire()
+
+    waiter = asyncio.create_task(token_bucket.acquire(timeout=10))
+    await asyncio.sleep(0)
+    assert token_bucket.tokens == pytest.approx(-1)
+
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    assert token_bucket.tokens == pytest.approx(0)
+    assert token_bucket.time_until_available() == pytest.approx(0.1)
+
+
+def test_refund_does_not_exceed_the_bucket_size(clock: FakeClock) -> None:
+    token_bucket = TokenBucket(tokens_per_second=10, bucket_size=2)
+
+    token_bucket._refund(5)
+
+    assert token_bucket.tokens == 2
+
+
+def test_set_rate_keeps_tokens_owed(clock: FakeClock) -> None:
+    token_bucket = TokenBucket(tokens_per_second=10, bucket_size=1)
+    token_bucket.tokens = -1
+
+    token_bucket.set_rate(tokens_per_second=1, bucket_size=5)
+
+    assert token_bucket.tokens == -1
+    assert token_bucket.time_until_available() == pytest.approx(2)
+
+
+def test_histogram_percentile_is_none_without_observations() -> None:
+    histogram = Histogram(min_value=1, max_value=1000)
+
+    assert histogram.percentile(0.5) is None
+
+
+def test_histogram_percentiles_are_bucket_upper_bounds() -> None:
+    histogram = Histogram(min_value=1, max_value=1000, bucket_growth_factor=2)
+    for value in range(1, 101):
+        histogram.record(value)
+
+    # buckets are bounded by 1, 2, 4, ..., 512, 1000
+    assert histogram.percentile(0.01) == 1
+    assert histogram.percentile(0.5) == 64
+    assert histogram.percentile(0.64) == 64
+    assert histogram.percentile(0.65) == 128
+    assert histogram.percentile(1.0) == 128
+
+
+def test_histogram_clamps_values_beyond_its_range() -> None:
+    histogram = Histogram(min_value=1, max_value=1000, bucket_growth_factor=2)
+    histogram.record(0.001)
+    histogram.record(1_000_000)
+
+    assert histogram.percentile(0.5) == 1
+    assert histogram.percentile(1.0) == 1000
+    assert histogram.total_count == 2
+
+
+def test_histogram_decay_favours_recent_observations() -> None:
+    histogram = Histogram(
+        min_value=1,
+        max_value=1000,
+        bucket_growth_factor=2,
+        observations_per_decay=4,
+    )
+    for _ in range(4):
+        histogram.record(1)
+    # halved on every 4th observation
+    assert histogram.total_count == 2
+
+    for _ in range(4):
+        histogram.record(1000)
+
+    # without decay, half of the observations would be small
+    assert histogram.total_count == 3
+    assert histogram.percentile(0.5) == 1000
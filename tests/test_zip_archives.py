@@ -0,0 +1,231 @@
+import io
+import struct
+import zipfile
+
+import pytest
+
+from app import zip_archives
+from app.zip_archives import ZipMember
+
+OSU_FILE_DATA = b"osu file format v14\n\n[General]\nAudioFilename: audio.mp3\n" * 50
+
+
+def _create_archive(
+    members: dict[str, bytes],
+    *,
+    compression: int = zipfile.ZIP_DEFLATED,
+    comment: bytes = b"",
+) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=compression) as archive:
+        for file_name, data in members.items():
+            archive.writestr(file_name, data)
+        archive.comment = comment
+    return buffer.getvalue()
+
+
+def _read_members(archive: bytes) -> list[ZipMember]:
+    location = zip_archives.find_central_directory(
+        archive[-zip_archives.MAX_END_OF_CENTRAL_DIRECTORY_SIZE :],
+    )
+    assert location is not None
+    central_directory = archive[location.offset : location.offset + location.size]
+    members = zip_archives.parse_central_directory(central_directory)
+    assert members is not None
+    assert len(members) == location.entry_count
+    return members
+
+
+def _read_member(archive: bytes, member: ZipMember) -> bytes | None:
+    local_header_size = zip_archives.get_local_header_size(
+        archive[member.local_header_offset :],
+    )
+    assert local_header_size is not None
+    data_offset = member.local_header_offset + local_header_size
+    return zip_archives.decompress_member(
+        member,
+        archive[data_offset : data_offset + member.compressed_size],
+    )
+
+
+@pytest.mark.parametrize(
+    "compression",
+    [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED],
+)
+def test_members_are_read_from_their_offsets(compression: int) -> None:
+    members = {
+        "Artist - Title (Creator) [Easy].osu": OSU_FILE_DATA,
+        "Artist - Title (Creator) [Hard].osu": OSU_FILE_DATA + b"hard",
+        "audio.mp3": b"ID3" + bytes(range(256)) * 16,
+    }
+    archive = _create_archive(members, compression=compression)
+
+    zip_members = _read_members(archive)
+
+    assert [member.file_name for member in zip_members] == list(members)
+    for member in zip_members:
+        assert member.is_supported
+        assert member.compression_method == compression
+        assert _read_member(archive, member) == members[member.file_name]
+
+
+def test_utf8_file_names_are_decoded() -> None:
+    archive = _create_archive({"アーティスト - タイトル [Normal].osu": OSU_FILE_DATA})
+
+    (member,) = _read_members(archive)
+
+    assert member.file_name == "アーティスト - タイトル [Normal].osu"
+
+
+def test_local_header_size_includes_its_own_extra_field() -> None:
+    local_header = zip_archives.LOCAL_FILE_HEADER_STRUCT.pack(
+        zip_archives.LOCAL_FILE_HEADER_SIGNATURE,
+        20,
+        0,
+        zip_archives.COMPRESSION_METHOD_DEFLATED,
+        0,
+        0,
+        0,
+        0,
+        0,
+        len(b"map.osu"),
+        12,
+    )
+
+    assert (
+        zip_archives.get_local_header_size(local_header + b"map.osu" + b"\x00" * 12)
+        == zip_archives.LOCAL_FILE_HEADER_STRUCT.size + len(b"map.osu") + 12
+    )
+
+
+def test_members_with_extra_fields_are_read() -> None:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as zip_file:
+        zip_info = zipfile.ZipInfo("map.osu")
+        zip_info.compress_type = zipfile.ZIP_DEFLATED
+        zip_info.extra = struct.pack("<2H", 0xCAFE, 8) + b"\x00" * 8
+        zip_file.writestr(zip_info, OSU_FILE_DATA)
+    archive = buffer.getvalue()
+
+    (member,) = _read_members(archive)
+
+    assert _read_member(archive, member) == OSU_FILE_DATA
+
+
+@pytest.mark.parametrize(
+    "comment",
+    [
+        b"a short comment",
+        b"x" * zip_archives.MAX_ARCHIVE_COMMENT_SIZE,
+        # which looks like the start of an end of central directory record
+        b"PK\x05\x06" + b"\x00" * 30,
+    ],
+)
+def test_central_directory_is_found_before_an_archive_comment(comment: bytes) -> None:
+    archive = _create_archive({"map.osu": OSU_FILE_DATA}, comment=comment)
+
+    (member,) = _read_members(archive)
+
+    assert _read_member(archive, member) == OSU_FILE_DATA
+
+
+def test_central_directory_is_found_in_an_archive_smaller_than_the_tail() -> None:
+    archive = _create_archive({"map.osu": OSU_FILE_DATA})
+    assert len(archive) < zip_archives.MAX_END_OF_CENTRAL_DIRECTORY_SIZE
+
+    location = zip_archives.find_central_directory(archive)
+
+    assert location is not None
+    assert location.entry_count == 1
+
+
+@pytest.mark.parametrize(
+    "archive_tail",
+    [b"", b"not a zip archive", b"PK\x05\x06truncated"],
+)
+def test_central_directory_is_not_found_in_other_data(archive_tail: bytes) -> None:
+    assert zip_archives.find_central_directory(archive_tail) is None
+
+
+def test_zip64_archives_are_rejected() -> None:
+    archive = bytearray(_create_archive({"map.osu": OSU_FILE_DATA}))
+    # (offset of the central directory's offset within the end record)
+    central_directory_offset_position = len(archive) - 6
+    struct.pack_into(
+        "<L",
+        archive,
+        central_directory_offset_position,
+        zip_archives.ZIP64_PLACEHOLDER_SIZE,
+    )
+
+    assert zip_archives.find_central_directory(bytes(archive)) is None
+
+
+def test_malformed_central_directories_are_rejected() -> None:
+    archive = _create_archive({"map.osu": OSU_FILE_DATA})
+    location = zip_archives.find_central_directory(archive)
+    assert location is not None
+    central_directory = archive[location.offset : location.offset + location.size]
+
+    assert zip_archives.parse_central_directory(central_directory[:20]) is None
+    assert zip_archives.parse_central_directory(b"XX" + central_directory[2:]) is None
+
+
+def test_local_header_is_rejected_if_truncated_or_not_a_local_header() -> None:
+    archive = _create_archive({"map.osu": OSU_FILE_DATA})
+
+    assert zip_archives.get_local_header_size(archive[:10]) is None
+    assert zip_archives.get_local_header_size(b"XX" + archive[2:]) is None
+
+
+@pytest.mark.parametrize(
+    "compression",
+    [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED],
+)
+def test_members_failing_their_checksum_are_rejected(compression: int) -> None:
+    archive = _create_archive({"map.osu": OSU_FILE_DATA}, compression=compression)
+    (member,) = _read_members(archive)
+    corrupted_member = ZipMember(
+        file_name=member.file_name,
+        compression_method=member.compression_method,
+        crc32=member.crc32 ^ 1,
+        compressed_size=member.compressed_size,
+        uncompressed_size=member.uncompressed_size,
+        local_header_offset=member.local_header_offset,
+        flags=member.flags,
+    )
+
+    assert _read_member(archive, corrupted_member) is None
+
+
+def test_stored_members_with_changed_data_fail_their_checksum() -> None:
+    archive = bytearray(
+        _create_archive({"map.osu": OSU_FILE_DATA}, compression=zipfile.ZIP_STORED),
+    )
+    (member,) = _read_members(bytes(archive))
+    local_header_size = zip_archives.get_local_header_size(
+        bytes(archive[member.local_header_offset :]),
+    )
+    assert local_header_size is not None
+    archive[member.local_header_offset + local_header_size] ^= 0xFF
+
+    assert _read_member(bytes(archive), member) is None
+
+
+def test_members_with_corrupt_data_are_rejected() -> None:
+    archive = _create_archive({"map.osu": OSU_FILE_DATA})
+    (member,) = _read_members(archive)
+
+    assert (
+        zip_archives.decompress_member(member, b"\xff" * member.compressed_size) is None
+    )
+    # or data of the wrong length
+    assert zip_archives.decompress_member(member, b"") is None
+
+
+def test_unsupported_members_are_not_decompressed() -> None:
+    archive = _create_archive({"map.osu": OSU_FILE_DATA}, compression=zipfile.ZIP_BZIP2)
+    (member,) = _read_members(archive)
+
+    assert not member.is_supported
+    assert _read_member(archive, member) is None